@@ -1,13 +1,26 @@
 from django.contrib import admin
 
+from common.admin_tools import EstimatedCountPaginator, PrefixSearchMixin
+
 from .models import Attendee, Badge
 
 
 @admin.register(Attendee)
-class AttendeeAdmin(admin.ModelAdmin):
-    pass
+class AttendeeAdmin(PrefixSearchMixin, admin.ModelAdmin):
+    list_display = ("name", "email", "company_name", "conference", "created")
+    list_filter = ("created",)
+    list_select_related = ("conference",)
+    autocomplete_fields = ("conference",)
+    search_fields = ("^email", "^name")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Badge)
-class BadgeAdmin(admin.ModelAdmin):
-    pass
+class BadgeAdmin(PrefixSearchMixin, admin.ModelAdmin):
+    list_display = ("attendee", "created")
+    list_select_related = ("attendee",)
+    raw_id_fields = ("attendee",)
+    search_fields = ("^attendee__email",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -1,8 +1,28 @@
+from django.conf import settings
 from django.urls import path
 
-from .api_views import api_list_attendees, api_show_attendee
+from .api_views import (
+    api_list_attendees,
+    api_list_attendees_async,
+    api_show_attendee,
+    api_show_attendee_async,
+    api_show_registration,
+)
+
+if settings.ASYNC_API_VIEWS:
+    api_list_attendees = api_list_attendees_async
+    api_show_attendee = api_show_attendee_async
 
 urlpatterns = [
-    path("conferences/<int:conference_id>/attendees/", api_list_attendees, name="api_list_attendees",),
+    path(
+        "conferences/<int:conference_id>/attendees/",
+        api_list_attendees,
+        name="api_list_attendees",
+    ),
     path("attendees/<int:id>/", api_show_attendee, name="api_show_attendee"),
+    path(
+        "registrations/<str:id>/",
+        api_show_registration,
+        name="api_show_registration",
+    ),
 ]
@@ -1,11 +1,14 @@
-from django.http import JsonResponse
-
-from .models import Attendee
+from .models import Attendee, Badge
+from . import journal
 from events.models import Conference
 
+from django.conf import settings
 from django.views.decorators.http import require_http_methods
 import json
+from asgiref.sync import sync_to_async
 from django.urls import reverse
+from common import batch, updates
+from common.formats import ApiResponse
 from common.json import ModelEncoder
 
 
@@ -22,10 +25,10 @@ class AttendeeListEncoder(ModelEncoder):
         data = {
             "name": obj.name,
             "email": obj.email,
-            "href": reverse('attendee_detail', kwargs={'attendee_id': obj.id})
+            "href": reverse("attendee_detail", kwargs={"attendee_id": obj.id}),
         }
         return super(AttendeeListEncoder, self).encode(data)
-    
+
 
 class AttendeeDetailEncoder(ModelEncoder):
     model = Attendee
@@ -41,6 +44,13 @@ class AttendeeDetailEncoder(ModelEncoder):
             }
         return extra_data
 
+
+class BadgeEncoder(ModelEncoder):
+    model = Badge
+    properties = ["created", "attendee"]
+    encoders = {"attendee": AttendeeListEncoder}
+
+
 # def api_list_attendees(request, conference_id):
 #     """
 #     Lists the attendees names and the link to the attendee
@@ -63,36 +73,73 @@ class AttendeeDetailEncoder(ModelEncoder):
 #     """
 #     return JsonResponse({})
 
+
+@batch.shared_lookup(Attendee, "conference_id")
 @require_http_methods(["GET", "POST"])
 def api_list_attendees(request, conference_id):
     if request.method == "GET":
         # Retrieve attendees as model instances
-        attendees = Attendee.objects.filter(conference=conference_id)
+        attendees = batch.filter_objects(Attendee, conference_id=conference_id)
         # Serialize using the encoder, which expects model instances
-        return JsonResponse(
+        return ApiResponse(
             {"attendees": list(attendees)},  # Convert queryset to list
             encoder=AttendeeListEncoder,
             safe=False,
         )
+    elif settings.REGISTRATION_WRITE_BEHIND:
+        return _register_later(request, conference_id)
     else:  # POST
         content = json.loads(request.body)
         try:
             conference = Conference.objects.get(id=conference_id)
             content["conference"] = conference
         except Conference.DoesNotExist:
-            return JsonResponse(
+            return ApiResponse(
                 {"message": "Invalid conference id"},
                 status=400,
             )
 
         attendee = Attendee.objects.create(**content)
-        return JsonResponse(
+        return ApiResponse(
             attendee,
             encoder=AttendeeDetailEncoder,
             safe=False,
         )
 
 
+def _register_later(request, conference_id):
+    # Journals the registration; the attendee is created in the next
+    # flush, or rejected there if the conference is full
+    try:
+        content = updates.read_body(request, Attendee)
+        entry = journal.accept(conference_id, content)
+    except updates.PatchError as e:
+        return e.response()
+    except journal.InvalidRegistration as e:
+        return ApiResponse({"message": e.message, **e.details}, status=400)
+    href = reverse("api_show_registration", kwargs={"id": entry["id"]})
+    response = ApiResponse(
+        {"id": entry["id"], "status": "pending", "href": href},
+        status=202,
+    )
+    response["Location"] = href
+    return response
+
+
+@require_http_methods(["GET"])
+def api_show_registration(request, id):
+    """
+    What became of a write-behind registration:
+
+    {"id": ..., "status": "pending"}
+    {"id": ..., "status": "registered", "attendee": URL to the attendee}
+    {"id": ..., "status": "rejected", "message": why}
+    """
+    registration = journal.lookup(id)
+    if registration is None:
+        return ApiResponse({"message": "Registration not found"}, status=404)
+    return ApiResponse(registration)
+
 
 # def api_show_attendee(request, id):
 #     """
@@ -116,26 +163,87 @@ def api_list_attendees(request, conference_id):
 #     """
 #     return JsonResponse({})
 
-@require_http_methods(["GET", "PUT", "DELETE"])
+
+def _patch_attendee(request, id):
+    try:
+        content = updates.read_body(request, Attendee)
+        attendee = updates.patch(request, Attendee, id, content)
+    except updates.PatchError as e:
+        return e.response()
+    return updates.with_etag(
+        ApiResponse(attendee, encoder=AttendeeDetailEncoder, safe=False),
+        attendee,
+    )
+
+
+@batch.shared_lookup(Attendee, "id", select_related=["conference"])
+@require_http_methods(["GET", "PUT", "PATCH", "DELETE"])
 def api_show_attendee(request, id):  # Changed attendee_id to id
+    if request.method == "PATCH":
+        # One UPDATE, without loading the attendee first
+        return _patch_attendee(request, id)
+
     try:
-        attendee = Attendee.objects.get(id=id)
+        attendee = batch.get_object(Attendee, id=id)
     except Attendee.DoesNotExist:
-        return JsonResponse({"message": "Attendee not found"}, status=404)
+        return ApiResponse({"message": "Attendee not found"}, status=404)
 
     if request.method == "GET":
-        return JsonResponse(attendee, encoder=AttendeeDetailEncoder, safe=False)
+        return updates.with_etag(
+            ApiResponse(attendee, encoder=AttendeeDetailEncoder, safe=False),
+            attendee,
+        )
 
     elif request.method == "PUT":
         content = json.loads(request.body)
+        try:
+            updates.check_writable(Attendee, content)
+        except updates.PatchError as e:
+            return e.response()
         for key, value in content.items():
             setattr(attendee, key, value)
         attendee.save()
-        return JsonResponse(attendee, encoder=AttendeeDetailEncoder, safe=False)
+        return ApiResponse(attendee, encoder=AttendeeDetailEncoder, safe=False)
 
     elif request.method == "DELETE":
         attendee.delete()
-        return JsonResponse({"deleted": True})
+        return ApiResponse({"deleted": True})
 
     else:
-        return JsonResponse({"message": "Method not allowed"}, status=405)
+        return ApiResponse({"message": "Method not allowed"}, status=405)
+
+
+# Async versions of the read endpoints, used when settings.ASYNC_API_VIEWS
+# is on. Writes are handed to the sync views above.
+
+
+@require_http_methods(["GET", "POST"])
+async def api_list_attendees_async(request, conference_id):
+    if request.method != "GET":
+        return await sync_to_async(api_list_attendees)(request, conference_id)
+    attendees = [
+        attendee
+        async for attendee in Attendee.objects.filter(conference=conference_id)
+    ]
+    return ApiResponse(
+        {"attendees": attendees},
+        encoder=AttendeeListEncoder,
+        safe=False,
+    )
+
+
+@require_http_methods(["GET", "PUT", "PATCH", "DELETE"])
+async def api_show_attendee_async(request, id):
+    if request.method != "GET":
+        return await sync_to_async(api_show_attendee)(request, id)
+    try:
+        # The encoder reads the conference name
+        attendee = await Attendee.objects.select_related("conference").aget(
+            id=id
+        )
+    except Attendee.DoesNotExist:
+        return ApiResponse({"message": "Attendee not found"}, status=404)
+    return updates.with_etag(
+        ApiResponse(attendee, encoder=AttendeeDetailEncoder, safe=False),
+        attendee,
+    )
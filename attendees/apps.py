@@ -2,5 +2,9 @@ from django.apps import AppConfig
 
 
 class AttendeesConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'attendees'
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "attendees"
+
+    def ready(self):
+        # Connect the signal handlers
+        from . import signals  # noqa: F401
@@ -0,0 +1,437 @@
+"""
+Write-behind registrations for ticket drops.
+
+When a popular conference opens registration, thousands of POSTs each
+want SQLite's write lock for a one-row INSERT, and most of them time
+out waiting. With settings.REGISTRATION_WRITE_BEHIND on, a
+registration is checked (its fields and that the conference exists,
+both without writing) and appended to a journal file in
+settings.REGISTRATION_JOURNAL_DIR, fsynced, and answered at once with
+202 and a provisional id.
+
+A flusher thread in each worker writes the journal to the database a
+batch of up to settings.REGISTRATION_FLUSH_BATCH_SIZE entries per
+transaction, with each attendee's badge, so a burst costs one write
+lock per batch instead of one per registration. Only one process
+flushes at a time (an flock on flush.lock). Capacity is enforced
+then: entries are taken in journal order while the conference has
+room, and the rest are rejected. A rejection is stored as a
+RejectedRegistration in the batch's transaction and then listed in
+rejected.log for operators. The flusher is the only writer of
+registrations in this mode, so the counts it reads before its
+transaction stay true. post_save is sent for every row written, so
+the stats rollups, the change feed and the live feed see them as they
+would a plain create().
+
+How far the journal has been written is kept in
+registrations.offset, moved after each batch commits. After a crash
+the flusher starts from there; entries that were committed but not
+yet checkpointed, as attendees or as rejections, are recognized by
+their registration_id and skipped. Once every entry is written the
+journal is emptied and rejected.log is rotated to rejected.log.1.
+Workers resume a left-over journal when they warm up, and the
+flush_registrations command does the same by hand.
+
+Looking up a registration is an indexed query on each table, and a
+read of only the entries not yet written when it is still pending.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models import Count
+from django.db.models.signals import post_save
+
+from common import metrics
+from events.models import Conference
+
+from .models import Attendee, Badge, RejectedRegistration
+
+logger = logging.getLogger(__name__)
+
+JOURNAL = "registrations.log"
+CHECKPOINT = "registrations.offset"
+REJECTED = "rejected.log"
+FLUSH_LOCK = "flush.lock"
+
+_lock = threading.Lock()
+_running = False
+_again = False
+_pid = None
+
+
+class InvalidRegistration(Exception):
+    def __init__(self, message, **details):
+        super().__init__(message)
+        self.message = message
+        self.details = details
+
+
+def _path(name):
+    return Path(settings.REGISTRATION_JOURNAL_DIR) / name
+
+
+def _open(name, flags):
+    path = _path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return os.open(path, flags | os.O_CREAT, 0o644)
+
+
+def _append(name, entries):
+    lines = b"".join(json.dumps(entry).encode() + b"\n" for entry in entries)
+    fd = _open(name, os.O_RDWR | os.O_APPEND)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        size = os.fstat(fd).st_size
+        # A write cut short by a crash leaves a line without its
+        # newline; end it so these entries start on a line of their own
+        if size and os.pread(fd, 1, size - 1) != b"\n":
+            lines = b"\n" + lines
+        os.write(fd, lines)
+        if settings.REGISTRATION_JOURNAL_FSYNC:
+            os.fsync(fd)
+    finally:
+        # Closing releases the flock
+        os.close(fd)
+
+
+def accept(conference_id, content):
+    """
+    Checks a registration and journals it. Returns the journal entry,
+    whose "id" is the registration's provisional id. Raises
+    InvalidRegistration.
+    """
+    if not Conference.objects.filter(id=conference_id).exists():
+        raise InvalidRegistration("Invalid conference id")
+    attendee = Attendee(conference_id=conference_id, **content)
+    try:
+        attendee.full_clean(exclude=["conference"], validate_unique=False)
+    except ValidationError as error:
+        raise InvalidRegistration("Invalid values", errors=error.message_dict)
+    entry = {
+        "id": uuid.uuid4().hex,
+        "conference_id": conference_id,
+        "email": attendee.email,
+        "name": attendee.name,
+        "company_name": attendee.company_name,
+    }
+    _append(JOURNAL, [entry])
+    metrics.inc("registrations_total", {"result": "journaled"})
+    schedule()
+    return entry
+
+
+def _read_checkpoint():
+    try:
+        return int(_path(CHECKPOINT).read_text())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _write_checkpoint(offset):
+    path = _path(CHECKPOINT)
+    temporary = path.with_suffix(".tmp")
+    with open(temporary, "w") as checkpoint:
+        checkpoint.write(str(offset))
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+    os.replace(temporary, path)
+
+
+def _entries(name, offset=0):
+    # Yields (entry, offset after it) for the whole lines from offset
+    try:
+        journal = open(_path(name), "rb")
+    except FileNotFoundError:
+        return
+    with journal:
+        journal.seek(offset)
+        for line in journal:
+            if not line.endswith(b"\n"):
+                # Still being appended
+                return
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.warning(
+                    "Skipped a damaged line in %s at byte %s",
+                    name,
+                    offset - len(line),
+                )
+                continue
+            yield entry, offset
+
+
+def _read_batch(offset):
+    entries = []
+    for entry, offset in _entries(JOURNAL, offset):
+        entries.append(entry)
+        if len(entries) >= settings.REGISTRATION_FLUSH_BATCH_SIZE:
+            break
+    return entries, offset
+
+
+def _room(db, conference_ids):
+    # conference id -> registrations it can still take; deleted
+    # conferences are left out
+    capacity = dict(
+        Conference.objects.using(db)
+        .filter(id__in=conference_ids)
+        .values_list("id", "max_attendees")
+    )
+    taken = (
+        Attendee.objects.using(db)
+        .filter(conference_id__in=capacity)
+        .order_by()
+        .values("conference_id")
+        .annotate(count=Count("id"))
+        .values_list("conference_id", "count")
+    )
+    room = dict(capacity)
+    for conference_id, count in taken:
+        room[conference_id] -= count
+    return room
+
+
+def _write(entries):
+    # Writes one batch and returns the entries it rejected
+    db = router.db_for_write(Attendee)
+    ids = [entry["id"] for entry in entries]
+    # Including attendees of conferences deleted since, or the entry
+    # would be written again
+    written = set(
+        Attendee.all_objects.using(db)
+        .filter(registration_id__in=ids)
+        .values_list("registration_id", flat=True)
+    )
+    written.update(
+        RejectedRegistration.objects.using(db)
+        .filter(registration_id__in=ids)
+        .values_list("registration_id", flat=True)
+    )
+    room = _room(db, {entry["conference_id"] for entry in entries})
+    attendees = []
+    rejected = []
+    for entry in entries:
+        registration_id = uuid.UUID(entry["id"])
+        if registration_id in written:
+            continue
+        conference_id = entry["conference_id"]
+        if conference_id not in room:
+            rejected.append({**entry, "message": "Invalid conference id"})
+        elif room[conference_id] <= 0:
+            rejected.append({**entry, "message": "Conference is full"})
+        else:
+            room[conference_id] -= 1
+            attendees.append(
+                Attendee(
+                    registration_id=registration_id,
+                    conference_id=conference_id,
+                    email=entry["email"],
+                    name=entry["name"],
+                    company_name=entry["company_name"],
+                )
+            )
+
+    with transaction.atomic(using=db):
+        Attendee.objects.using(db).bulk_create(attendees)
+        badges = Badge.objects.using(db).bulk_create(
+            [Badge(attendee=attendee) for attendee in attendees]
+        )
+        RejectedRegistration.objects.using(db).bulk_create(
+            [
+                RejectedRegistration(
+                    registration_id=uuid.UUID(entry["id"]),
+                    conference_id=entry["conference_id"],
+                    email=entry["email"],
+                    name=entry["name"],
+                    message=entry["message"],
+                )
+                for entry in rejected
+            ]
+        )
+        for model, instances in [(Attendee, attendees), (Badge, badges)]:
+            for instance in instances:
+                post_save.send(
+                    sender=model,
+                    instance=instance,
+                    created=True,
+                    update_fields=None,
+                    raw=False,
+                    using=db,
+                )
+    metrics.inc(
+        "registrations_total", {"result": "registered"}, len(attendees)
+    )
+    if rejected:
+        # Only after the commit, and entries are rejected once, so
+        # each is listed once
+        _append(REJECTED, rejected)
+        metrics.inc(
+            "registrations_total", {"result": "rejected"}, len(rejected)
+        )
+    return rejected
+
+
+def _rotate_rejected():
+    path = _path(REJECTED)
+    try:
+        os.replace(path, path.with_name(f"{REJECTED}.1"))
+    except FileNotFoundError:
+        pass
+
+
+def _start_over(offset):
+    # Empties the journal once everything in it is written, and starts
+    # a new rejected.log with it. The checkpoint goes back first: after
+    # a crash in between, the entries are read again and skipped as
+    # already written.
+    try:
+        fd = os.open(_path(JOURNAL), os.O_RDWR)
+    except FileNotFoundError:
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        size = os.fstat(fd).st_size
+        if size == 0 or size > offset:
+            return
+        _write_checkpoint(0)
+        os.ftruncate(fd, 0)
+        _rotate_rejected()
+    finally:
+        os.close(fd)
+
+
+def flush():
+    """
+    Writes every journaled registration to the database and returns
+    how many entries that was. Returns None at once when another
+    process is flushing.
+    """
+    fd = _open(FLUSH_LOCK, os.O_RDWR)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        flushed = 0
+        offset = _read_checkpoint()
+        while True:
+            entries, end = _read_batch(offset)
+            if end == offset:
+                break
+            if entries:
+                rejected = _write(entries)
+                for entry in rejected:
+                    logger.info(
+                        "Rejected registration %s: %s",
+                        entry["id"],
+                        entry["message"],
+                    )
+            _write_checkpoint(end)
+            flushed += len(entries)
+            offset = end
+        _start_over(offset)
+        return flushed
+    finally:
+        os.close(fd)
+
+
+def lookup(registration_id):
+    """
+    Returns what became of a registration: a dict with its "status"
+    (pending, registered or rejected), or None for an unknown id.
+    """
+    try:
+        registration_id = uuid.UUID(registration_id)
+    except ValueError:
+        return None
+    written = _lookup_written(registration_id)
+    if written is not None:
+        return written
+    for entry, _ in _entries(JOURNAL, _read_checkpoint()):
+        if entry.get("id") == registration_id.hex:
+            return {"id": registration_id.hex, "status": "pending"}
+    # Written, and gone from the journal, since the first look
+    return _lookup_written(registration_id)
+
+
+def _lookup_written(registration_id):
+    # The primary, so a registration written a moment ago is not
+    # reported pending or unknown by a lagging replica
+    db = router.db_for_write(Attendee)
+    attendee = (
+        Attendee.objects.using(db)
+        .filter(registration_id=registration_id)
+        .first()
+    )
+    if attendee is not None:
+        return {
+            "id": registration_id.hex,
+            "status": "registered",
+            "attendee": attendee.get_api_url(),
+        }
+    rejected = (
+        RejectedRegistration.objects.using(db)
+        .filter(registration_id=registration_id)
+        .first()
+    )
+    if rejected is not None:
+        return {
+            "id": registration_id.hex,
+            "status": "rejected",
+            "message": rejected.message,
+        }
+    return None
+
+
+def _run():
+    global _running, _again
+    try:
+        while True:
+            time.sleep(settings.REGISTRATION_FLUSH_INTERVAL_SECONDS)
+            try:
+                flushed = flush()
+            except Exception:
+                # Kept in the journal for the next round
+                logger.exception("Flushing registrations failed")
+                flushed = None
+            # None means another process is flushing or the flush
+            # failed; try again after the interval
+            if flushed == 0:
+                with _lock:
+                    if not _again:
+                        _running = False
+                        return
+                    _again = False
+    finally:
+        connections.close_all()
+
+
+def schedule():
+    """
+    Starts this process's flusher thread, or has the running one go
+    round again before it stops.
+    """
+    global _running, _again, _pid
+    with _lock:
+        # A forked worker has its parent's flags but not its thread
+        if _running and _pid == os.getpid():
+            _again = True
+            return
+        _running = True
+        _again = False
+        _pid = os.getpid()
+    threading.Thread(target=_run, daemon=True).start()
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from attendees.journal import flush
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the registrations waiting in the write-behind journal to "
+        "the database, e.g. after a crash left some behind."
+    )
+
+    def handle(self, *args, **options):
+        flushed = flush()
+        if flushed is None:
+            raise CommandError("Another process is flushing the journal.")
+        self.stdout.write(f"Flushed {flushed} journaled registrations.")
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("attendees", "0001_initial"),
+        ("events", "0005_location_coordinates"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="attendee",
+            index=models.Index(fields=["email"], name="attendee_email_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="attendee",
+            index=models.Index(fields=["name"], name="attendee_name_idx"),
+        ),
+    ]
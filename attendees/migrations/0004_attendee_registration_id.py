@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("attendees", "0003_attendee_updated"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attendee",
+            name="registration_id",
+            field=models.UUIDField(
+                blank=True, editable=False, null=True, unique=True
+            ),
+        ),
+    ]
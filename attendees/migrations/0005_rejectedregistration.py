@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-19 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("attendees", "0004_attendee_registration_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RejectedRegistration",
+            fields=[
+                (
+                    "registration_id",
+                    models.UUIDField(
+                        editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                ("conference_id", models.PositiveIntegerField()),
+                ("email", models.EmailField(max_length=254)),
+                ("name", models.CharField(max_length=200)),
+                ("message", models.CharField(max_length=200)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
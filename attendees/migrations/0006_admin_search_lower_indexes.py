@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-19 19:36
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("attendees", "0005_rejectedregistration"),
+        ("events", "0010_admin_search_lower_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="attendee",
+            name="attendee_email_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="attendee",
+            name="attendee_name_idx",
+        ),
+        migrations.AddIndex(
+            model_name="attendee",
+            index=models.Index(
+                django.db.models.functions.text.Lower("email"),
+                name="attendee_email_lower_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="attendee",
+            index=models.Index(
+                django.db.models.functions.text.Lower("name"),
+                name="attendee_name_lower_idx",
+            ),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.urls import reverse
 from django.core.exceptions import ObjectDoesNotExist
 
+from events.models import LiveConferenceManager
 
 
 class Attendee(models.Model):
@@ -14,6 +16,12 @@ class Attendee(models.Model):
     name = models.CharField(max_length=200)
     company_name = models.CharField(max_length=200, null=True, blank=True)
     created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    # The provisional id of a write-behind registration (see
+    # attendees.journal)
+    registration_id = models.UUIDField(
+        null=True, blank=True, unique=True, editable=False
+    )
 
     conference = models.ForeignKey(
         "events.Conference",
@@ -21,9 +29,15 @@ class Attendee(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = LiveConferenceManager()
+    all_objects = models.Manager()
+
+    # Fields clients may change through the API (see common.updates)
+    api_writable_fields = {"email", "name", "company_name"}
+
     def __str__(self):
         return self.name
-    
+
     def create_badge(self):
         try:
             self.badge
@@ -33,6 +47,13 @@ class Attendee(models.Model):
     def get_api_url(self):
         return reverse("api_show_attendee", kwargs={"id": self.id})
 
+    class Meta:
+        indexes = [
+            # Admin searches match these by prefix, ignoring case
+            models.Index(Lower("email"), name="attendee_email_lower_idx"),
+            models.Index(Lower("name"), name="attendee_name_lower_idx"),
+        ]
+
 
 class Badge(models.Model):
     """
@@ -51,3 +72,22 @@ class Badge(models.Model):
         on_delete=models.CASCADE,
         primary_key=True,
     )
+
+    objects = LiveConferenceManager("attendee__conference")
+    all_objects = models.Manager()
+
+
+class RejectedRegistration(models.Model):
+    """
+    A write-behind registration that could not be written, e.g. because
+    its conference was full (see attendees.journal). Kept so its client
+    can look up why.
+    """
+
+    registration_id = models.UUIDField(primary_key=True, editable=False)
+    # Not a foreign key: the conference may not exist
+    conference_id = models.PositiveIntegerField()
+    email = models.EmailField()
+    name = models.CharField(max_length=200)
+    message = models.CharField(max_length=200)
+    created = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,92 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from events import live, stats
+
+from .models import Attendee, Badge
+
+# The fields the stats rollup counts attendees by
+STATS_FIELDS = {"conference", "created", "company_name"}
+
+
+def _changes_stats(update_fields):
+    return update_fields is None or not STATS_FIELDS.isdisjoint(update_fields)
+
+
+@receiver(pre_save, sender=Attendee)
+def remember_previous_attendee(sender, instance, update_fields, **kwargs):
+    # Keep the stored values so an update can be moved in the rollup
+    instance._previous = None
+    instance._change_id = None
+    if instance.pk is not None and _changes_stats(update_fields):
+        instance._previous = (
+            Attendee.objects.filter(pk=instance.pk)
+            .values("conference_id", "created", "company_name")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Attendee)
+def update_stats_for_attendee(
+    sender, instance, created, update_fields, **kwargs
+):
+    if not _changes_stats(update_fields):
+        return
+    previous = getattr(instance, "_previous", None)
+    if previous == {
+        "conference_id": instance.conference_id,
+        "created": instance.created,
+        "company_name": instance.company_name,
+    }:
+        # Counted the same way as before; no need to move it
+        return
+    if previous is not None:
+        stats.record_attendee(
+            previous["conference_id"],
+            previous["created"],
+            previous["company_name"],
+            -1,
+        )
+    # For the live event, which is published by the next handler
+    instance._change_id = stats.record_attendee(
+        instance.conference_id,
+        instance.created,
+        instance.company_name,
+        1,
+    )
+
+
+@receiver(post_delete, sender=Attendee)
+def remove_attendee_from_stats(sender, instance, **kwargs):
+    stats.record_attendee(
+        instance.conference_id,
+        instance.created,
+        instance.company_name,
+        -1,
+    )
+
+
+def _attendee(attendee):
+    return {"name": attendee.name, "href": attendee.get_api_url()}
+
+
+@receiver(post_save, sender=Attendee)
+def publish_attendee_registered(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        live.publish(
+            instance.conference_id,
+            "attendee-registered",
+            {"attendee": _attendee(instance)},
+            change_id=getattr(instance, "_change_id", None),
+        )
+
+
+@receiver(post_save, sender=Badge)
+def publish_badge_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        attendee = instance.attendee
+        live.publish(
+            attendee.conference_id,
+            "badge-created",
+            {"attendee": _attendee(attendee)},
+        )
@@ -0,0 +1,271 @@
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from events.models import Conference, Location, State
+
+from . import journal
+from .models import Attendee, Badge, RejectedRegistration
+
+
+class Crash(Exception):
+    pass
+
+
+def _crash_on_call(function, call):
+    # Runs function as usual, except that the given call (counted from
+    # 1) raises Crash instead, as if the process had died there
+    calls = 0
+
+    def crashing(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == call:
+            raise Crash
+        return function(*args, **kwargs)
+
+    return crashing
+
+
+@override_settings(
+    SNAPSHOTS_ENABLED=False,
+    RATE_LIMIT_ENABLED=False,
+    DATABASE_REPLICAS=[],
+    METRICS_ENABLED=False,
+    REGISTRATION_JOURNAL_FSYNC=False,
+    REGISTRATION_FLUSH_BATCH_SIZE=2,
+)
+class JournalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(name="Illinois", abbreviation="IL")
+        location = Location.objects.create(
+            name="Hall", city="Chicago", room_count=10, state=state
+        )
+        starts = timezone.now()
+        cls.conference = Conference.objects.create(
+            name="Conference",
+            description="",
+            starts=starts,
+            ends=starts + timedelta(days=1),
+            max_presentations=100,
+            max_attendees=100,
+            location=location,
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(
+            REGISTRATION_JOURNAL_DIR=self.directory
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # The tests flush by hand, in this thread
+        patcher = mock.patch.object(journal, "schedule")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def accept(self, count):
+        return [
+            journal.accept(
+                self.conference.id,
+                {"email": f"person{n}@example.com", "name": f"Person {n}"},
+            )["id"]
+            for n in range(count)
+        ]
+
+    def lines(self, name):
+        try:
+            text = (self.directory / name).read_text()
+        except FileNotFoundError:
+            return []
+        return [json.loads(line) for line in text.splitlines()]
+
+    def assertRegisteredOnce(self, ids):
+        registered = [
+            registration_id.hex
+            for registration_id in Attendee.objects.values_list(
+                "registration_id", flat=True
+            )
+        ]
+        self.assertEqual(sorted(registered), sorted(ids))
+        self.assertEqual(
+            Badge.objects.filter(attendee__registration_id__in=ids).count(),
+            len(ids),
+        )
+
+    def assertNoneRejected(self):
+        self.assertFalse(RejectedRegistration.objects.exists())
+        self.assertEqual(self.lines(f"{journal.REJECTED}.1"), [])
+
+    def limit_attendees(self, max_attendees):
+        self.conference.max_attendees = max_attendees
+        self.conference.save()
+
+    def assertStartedOver(self):
+        self.assertEqual((self.directory / journal.JOURNAL).read_bytes(), b"")
+        self.assertEqual(journal._read_checkpoint(), 0)
+
+    def test_flush_writes_every_registration(self):
+        ids = self.accept(3)
+        self.assertEqual(
+            [journal.lookup(id)["status"] for id in ids], ["pending"] * 3
+        )
+
+        self.assertEqual(journal.flush(), 3)
+
+        self.assertRegisteredOnce(ids)
+        self.assertEqual(
+            [journal.lookup(id)["status"] for id in ids], ["registered"] * 3
+        )
+        self.assertStartedOver()
+
+    def test_restart_writes_nothing_twice(self):
+        ids = self.accept(3)
+        journal.flush()
+
+        # A new process has only the files and the database to go on
+        self.assertEqual(journal.flush(), 0)
+
+        self.assertRegisteredOnce(ids)
+        self.assertNoneRejected()
+
+    def test_replay_after_crash_before_checkpoint(self):
+        ids = self.accept(3)
+        journaled = (self.directory / journal.JOURNAL).read_bytes()
+        first_batch = sum(map(len, journaled.splitlines(keepends=True)[:2]))
+        crashing = _crash_on_call(journal._write_checkpoint, 2)
+
+        # The second batch commits, then the process dies before
+        # recording it
+        with mock.patch.object(journal, "_write_checkpoint", crashing):
+            with self.assertRaises(Crash):
+                journal.flush()
+
+        self.assertEqual(journal._read_checkpoint(), first_batch)
+        self.assertRegisteredOnce(ids)
+
+        # The restarted flusher reads the last batch again and skips it
+        self.assertEqual(journal.flush(), 1)
+
+        self.assertRegisteredOnce(ids)
+        self.assertNoneRejected()
+        self.assertStartedOver()
+
+    def test_replay_after_crash_while_starting_over(self):
+        ids = self.accept(3)
+
+        # The checkpoint is back at 0 but the journal is not emptied
+        with mock.patch.object(journal.os, "ftruncate", side_effect=Crash):
+            with self.assertRaises(Crash):
+                journal.flush()
+
+        self.assertEqual(journal._read_checkpoint(), 0)
+        self.assertEqual(len(self.lines(journal.JOURNAL)), 3)
+
+        # Every entry is read again from the start, and none is written
+        self.assertEqual(journal.flush(), 3)
+
+        self.assertRegisteredOnce(ids)
+        self.assertNoneRejected()
+        self.assertStartedOver()
+
+    def test_new_entries_are_kept_until_written(self):
+        ids = self.accept(2)
+        journal.flush()
+        ids += self.accept(1)
+
+        # Nothing is truncated while an entry is still unwritten
+        journal._start_over(journal._read_checkpoint())
+
+        self.assertEqual(len(self.lines(journal.JOURNAL)), 1)
+        self.assertEqual(journal.flush(), 1)
+        self.assertRegisteredOnce(ids)
+        self.assertNoneRejected()
+
+    def test_full_conference_rejects_the_rest(self):
+        self.limit_attendees(3)
+        ids = self.accept(5)
+
+        self.assertEqual(journal.flush(), 5)
+
+        self.assertRegisteredOnce(ids[:3])
+        rejected = RejectedRegistration.objects.order_by("email")
+        self.assertEqual(
+            [(r.registration_id.hex, r.message) for r in rejected],
+            [(id, "Conference is full") for id in ids[3:]],
+        )
+        self.assertEqual(
+            journal.lookup(ids[4]),
+            {
+                "id": ids[4],
+                "status": "rejected",
+                "message": "Conference is full",
+            },
+        )
+        # Listed once, and rotated with the journal
+        self.assertFalse((self.directory / journal.REJECTED).exists())
+        self.assertEqual(
+            [entry["id"] for entry in self.lines(f"{journal.REJECTED}.1")],
+            ids[3:],
+        )
+
+    def test_rejections_are_not_replayed(self):
+        self.limit_attendees(3)
+        ids = self.accept(5)
+        crashing = _crash_on_call(journal._write_checkpoint, 3)
+
+        # The last batch, a rejection, commits, then the process dies
+        with mock.patch.object(journal, "_write_checkpoint", crashing):
+            with self.assertRaises(Crash):
+                journal.flush()
+        self.assertEqual(
+            [entry["id"] for entry in self.lines(journal.REJECTED)], ids[3:]
+        )
+
+        journal.flush()
+
+        self.assertRegisteredOnce(ids[:3])
+        self.assertEqual(RejectedRegistration.objects.count(), 2)
+        self.assertEqual(
+            [entry["id"] for entry in self.lines(f"{journal.REJECTED}.1")],
+            ids[3:],
+        )
+
+    def test_rejected_log_rotation_keeps_one_round(self):
+        self.limit_attendees(0)
+        self.accept(1)
+        journal.flush()
+        second = self.accept(2)
+
+        journal.flush()
+
+        self.assertEqual(
+            [entry["id"] for entry in self.lines(f"{journal.REJECTED}.1")],
+            second,
+        )
+        self.assertEqual(RejectedRegistration.objects.count(), 3)
+
+    def test_deleted_conference_rejects_its_registrations(self):
+        ids = self.accept(1)
+        Conference.objects.filter(id=self.conference.id).update(
+            deleted=timezone.now()
+        )
+
+        journal.flush()
+
+        self.assertEqual(
+            journal.lookup(ids[0]),
+            {
+                "id": ids[0],
+                "status": "rejected",
+                "message": "Invalid conference id",
+            },
+        )
@@ -0,0 +1,89 @@
+"""
+Structured access log that never blocks a request.
+
+The request thread only puts the record on a bounded queue; a
+QueueListener thread formats it as JSON and writes it to
+settings.ACCESS_LOG_FILE (stderr when None). When the queue is full
+the record is dropped and counted, and the count is written with the
+next record that gets through and exported as the
+access_log_dropped_total metric.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+from . import metrics
+
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread
+        return record
+
+    def enqueue(self, record):
+        if self.dropped:
+            record.dropped = self.dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc("access_log_dropped_total")
+        else:
+            self.dropped = 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = dict(record.msg)
+        dropped = getattr(record, "dropped", 0)
+        if dropped:
+            entry["dropped_before"] = dropped
+        return json.dumps(entry)
+
+
+_lock = threading.Lock()
+_pid = None
+_logger = logging.getLogger("common.access")
+_logger.propagate = False
+
+
+def _start():
+    global _pid
+    log_queue = queue.Queue(maxsize=settings.ACCESS_LOG_QUEUE_SIZE)
+    if settings.ACCESS_LOG_FILE:
+        target = logging.FileHandler(settings.ACCESS_LOG_FILE)
+    else:
+        target = logging.StreamHandler(sys.stderr)
+    target.setFormatter(JsonFormatter())
+
+    listener = QueueListener(log_queue, target)
+    listener.start()
+    atexit.register(listener.stop)
+
+    # A forked worker gets a copy of the handler but not the thread
+    for handler in list(_logger.handlers):
+        _logger.removeHandler(handler)
+    _logger.addHandler(DroppingQueueHandler(log_queue))
+    _logger.setLevel(logging.INFO)
+    _pid = os.getpid()
+
+
+def log(entry):
+    """Queues one access log entry (a dict)."""
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                _start()
+    _logger.info(entry)
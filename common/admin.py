@@ -0,0 +1,34 @@
+from django.contrib import admin
+
+from .models import SlowQuery, SlowQueryShape
+
+
+@admin.register(SlowQueryShape)
+class SlowQueryShapeAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "calls", "total_ms", "max_ms", "last_seen")
+    readonly_fields = (
+        "fingerprint",
+        "sql",
+        "calls",
+        "total_ms",
+        "max_ms",
+        "first_seen",
+        "last_seen",
+    )
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "duration_ms", "view", "created")
+    list_filter = ("view",)
+    list_select_related = ("shape",)
+    readonly_fields = (
+        "shape",
+        "sql",
+        "params",
+        "duration_ms",
+        "view",
+        "stack_frame",
+        "query_plan",
+        "created",
+    )
@@ -0,0 +1,116 @@
+"""
+Admin helpers for tables too big to scan.
+
+EstimatedCountPaginator: an unfiltered changelist gets its total from
+the database's own row estimate (pg_class on PostgreSQL,
+information_schema on MySQL, the largest primary key elsewhere). Only
+the default manager's own filter, such as LiveManager's, counts as
+unfiltered; the estimate includes the few rows that filter hides. A
+filtered one counts at most exact_count_limit rows, so pages past
+that are not offered; narrow the search to reach them.
+
+PrefixSearchMixin: "^field" search fields are matched, ignoring case
+like Django's own "^" searches, with a range on LOWER(field) instead
+of LIKE, so an index on Lower(field) is used.
+"""
+
+import string
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q, QuerySet
+from django.db.models.functions import Lower
+from django.utils.functional import cached_property
+
+
+def estimated_row_count(model, using):
+    """
+    Returns the database's estimate of the rows in the model's table,
+    or None when it has none.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql = (
+            "SELECT reltuples::bigint FROM pg_class "
+            "WHERE oid = %s::regclass"
+        )
+    elif connection.vendor == "mysql":
+        sql = (
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s"
+        )
+    else:
+        if model._meta.pk.get_internal_type() not in (
+            "AutoField",
+            "BigAutoField",
+            "OneToOneField",
+        ):
+            return None
+        # Counts deleted rows too, but is one index lookup
+        return (
+            model._base_manager.using(using).aggregate(last=Max("pk"))["last"]
+            or 0
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        if self._is_unfiltered(queryset):
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.exact_count_limit:
+                return estimate
+        return queryset.order_by()[: self.exact_count_limit].count()
+
+    @staticmethod
+    def _is_unfiltered(queryset):
+        # Filtered by nothing but the default manager
+        default = queryset.model._default_manager.get_queryset()
+        return queryset.query.where == default.query.where
+
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+class PrefixSearchMixin:
+    """
+    For ModelAdmins whose search_fields are all "^field" prefix
+    searches. The whole search term is matched as a prefix of any of
+    the fields, ignoring case; each field needs an index on
+    Lower(field). SQLite's LOWER() only folds ASCII letters, so there
+    other letters must match in case, as with Django's own searches.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if connections[queryset.db].vendor == "sqlite":
+            term = term.translate(_ASCII_LOWER)
+        else:
+            term = term.lower()
+        prefixed = all(field.startswith("^") for field in self.search_fields)
+        if not term or not prefixed:
+            return super().get_search_results(request, queryset, search_term)
+        fields = [field[1:] for field in self.search_fields]
+        # Every string starting with the term sorts inside this range
+        end = term + "\U0010ffff"
+        aliases = {}
+        q = Q()
+        for number, field in enumerate(fields):
+            alias = f"_search_{number}"
+            aliases[alias] = Lower(field)
+            q |= Q(**{f"{alias}__gte": term, f"{alias}__lt": end})
+        may_have_duplicates = any("__" in field for field in fields)
+        return queryset.alias(**aliases).filter(q), may_have_duplicates
@@ -0,0 +1,257 @@
+"""
+Batch endpoint: several GET requests to the API in one round trip.
+
+POST /api/batch/ with
+
+    {"requests": [{"path": "/api/conferences/1/"}, ...]}
+
+runs each request's view directly (without the middleware, which
+only runs once for the batch) inside one transaction on the primary,
+so all of them read the same snapshot, and returns
+
+    {"responses": [{"status": 200, "body": ...}, ...]}
+
+in the same order. Each request is charged to its own route's rate
+limit, as if it had been sent alone, and gets a 429 when that is used
+up. A request whose view raises gets a 500 of its own; the others
+still run.
+
+Views decorated with shared_lookup() read their object through
+get_object() or filter_objects(). Before a batch runs, the values of
+the decorated views' URL argument are gathered across the batch and
+fetched in a single "<field>__in" query per view. The views then find
+their rows already loaded, so ten conferences cost one query instead
+of ten. Outside a batch the helpers are plain get() and filter().
+"""
+
+import json
+import logging
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.db import transaction
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    QueryDict,
+)
+from django.urls import Resolver404, resolve
+from django.views.decorators.http import require_http_methods
+
+from . import metrics, ratelimit, routers
+
+logger = logging.getLogger(__name__)
+
+# Sub-responses are embedded as JSON, never as a compressed file
+_DROPPED_HEADERS = {"CONTENT_LENGTH", "CONTENT_TYPE", "HTTP_ACCEPT_ENCODING"}
+
+# (model, field) -> {value: [rows]}, set while a batch runs
+_lookups = ContextVar("batch_lookups", default=None)
+
+
+def shared_lookup(model, field, select_related=()):
+    """
+    Marks a view whose URL argument `field` selects rows of `model`,
+    read with get_object(model, field=...) or filter_objects().
+    """
+
+    def decorator(view):
+        view.batch_lookup = (model, field, tuple(select_related))
+        return view
+
+    return decorator
+
+
+def _cached(model, lookup):
+    lookups = _lookups.get()
+    if lookups is None or len(lookup) != 1:
+        return None
+    [(field, value)] = lookup.items()
+    rows = lookups.get((model, field))
+    if rows is None or value not in rows:
+        return None
+    return rows[value]
+
+
+def get_object(model, **lookup):
+    rows = _cached(model, lookup)
+    if rows is None:
+        return model.objects.get(**lookup)
+    if not rows:
+        raise model.DoesNotExist(
+            f"{model._meta.object_name} matching query does not exist."
+        )
+    return rows[0]
+
+
+def filter_objects(model, select_related=(), **lookup):
+    # select_related is for the plain filter(); in a batch the view's
+    # shared_lookup() loaded the rows with its own
+    rows = _cached(model, lookup)
+    if rows is None:
+        queryset = model.objects.filter(**lookup)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        return queryset
+    return rows
+
+
+def _prefetch(resolved):
+    # (model, field) -> (values, related fields)
+    wanted = {}
+    for match in resolved:
+        spec = getattr(match, "func", None)
+        spec = getattr(spec, "batch_lookup", None)
+        if spec is None or spec[1] not in match.kwargs:
+            continue
+        model, field, select_related = spec
+        values, related = wanted.setdefault((model, field), (set(), set()))
+        values.add(match.kwargs[field])
+        related.update(select_related)
+
+    lookups = {}
+    for (model, field), (values, related) in wanted.items():
+        rows = {value: [] for value in values}
+        queryset = model.objects.filter(**{f"{field}__in": values})
+        if related:
+            queryset = queryset.select_related(*related)
+        for row in queryset:
+            rows[getattr(row, field)].append(row)
+        lookups[(model, field)] = rows
+    return lookups
+
+
+def _resolve(item):
+    if not isinstance(item, dict) or not isinstance(item.get("path"), str):
+        return None
+    path = urlsplit(item["path"]).path
+    if not path.startswith("/api/"):
+        return None
+    try:
+        return resolve(path)
+    except Resolver404:
+        return None
+
+
+def _subrequest(request, item, match):
+    url = urlsplit(item["path"])
+    subrequest = HttpRequest()
+    subrequest.method = "GET"
+    subrequest.path = subrequest.path_info = url.path
+    subrequest.META = {
+        key: value
+        for key, value in request.META.items()
+        if key not in _DROPPED_HEADERS
+    }
+    subrequest.META["REQUEST_METHOD"] = "GET"
+    subrequest.META["QUERY_STRING"] = url.query
+    subrequest.GET = QueryDict(url.query)
+    subrequest.COOKIES = request.COOKIES
+    subrequest.resolver_match = match
+    if hasattr(request, "user"):
+        subrequest.user = request.user
+    return subrequest
+
+
+def _rate_limited(request, match):
+    # Returns the 429 entry for a request over its route's limit
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    wait = ratelimit.take(request, match.view_name)
+    if not wait:
+        return None
+    metrics.inc("rate_limited_total", {"route": match.view_name})
+    return 429, json.dumps(
+        {
+            "message": "Too many requests",
+            "retry_after": ratelimit.retry_after(wait),
+        }
+    )
+
+
+def _run(request, item, match):
+    # Returns (status, body as JSON text)
+    if match is None:
+        return 404, '{"message": "Not found"}'
+    if str(item.get("method", "GET")).upper() != "GET":
+        return 405, '{"message": "Only GET requests can be batched"}'
+    limited = _rate_limited(request, match)
+    if limited is not None:
+        return limited
+    view = match.func
+    if iscoroutinefunction(view):
+        view = async_to_sync(view)
+    try:
+        # A savepoint, so a failed query leaves the batch's
+        # transaction usable for the requests after it
+        with transaction.atomic():
+            response = view(
+                _subrequest(request, item, match),
+                *match.args,
+                **match.kwargs,
+            )
+    except Http404:
+        return 404, '{"message": "Not found"}'
+    except Exception:
+        logger.exception("Batched request for %s failed", item["path"])
+        return 500, '{"message": "Internal server error"}'
+    if response.streaming:
+        body = b"".join(response.streaming_content)
+        response.close()
+    else:
+        body = response.content
+    if not response.get("Content-Type", "").startswith("application/json"):
+        return response.status_code, json.dumps(body.decode())
+    return response.status_code, body.decode() or "null"
+
+
+@require_http_methods(["POST"])
+def batch_view(request):
+    """
+    Runs up to settings.BATCH_MAX_REQUESTS GET requests; see the
+    module docstring for the format. Each request has a "path" (with
+    an optional query string) and an optional "method", which must be
+    GET.
+    """
+    try:
+        items = json.loads(request.body)["requests"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"message": "Invalid batch"}, status=400)
+    if not isinstance(items, list):
+        return JsonResponse({"message": "Invalid batch"}, status=400)
+    if len(items) > settings.BATCH_MAX_REQUESTS:
+        return JsonResponse(
+            {
+                "message": "Too many requests in the batch",
+                "max_requests": settings.BATCH_MAX_REQUESTS,
+            },
+            status=400,
+        )
+
+    resolved = [_resolve(item) for item in items]
+    token = routers.pin_to_primary()
+    try:
+        with transaction.atomic():
+            lookups = _lookups.set(_prefetch(resolved))
+            try:
+                results = [
+                    _run(request, item, match)
+                    for item, match in zip(items, resolved)
+                ]
+            finally:
+                _lookups.reset(lookups)
+    finally:
+        routers.unpin(token)
+
+    # The bodies are JSON already, so they are joined as they are
+    entries = [
+        f'{{"status": {status}, "body": {body}}}' for status, body in results
+    ]
+    return HttpResponse(
+        f'{{"responses": [{", ".join(entries)}]}}',
+        content_type="application/json",
+    )
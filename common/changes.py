@@ -0,0 +1,169 @@
+"""
+Change feed for clients that keep a copy of the data in sync.
+
+Saving or deleting a row of a model in settings.CHANGE_FEED_MODELS
+replaces that row's entry in the Change table with a new one, so the
+table holds at most one entry per row: its latest change, or a
+tombstone if it was deleted. The /api/changes/ view returns the
+entries after the client's cursor (the id of the last entry it saw)
+with the current data of the changed rows, so a sync costs work in
+proportion to what changed since the last one.
+
+bulk_create(), QuerySet.update() and QuerySet.delete() without
+signals bypass the feed; the backfill_change_log command adds entries
+for rows that have none, and code deleting rows in bulk calls
+record_deleted(). Ids are handed out in commit order on
+SQLite, which runs one write transaction at a time; with concurrent
+writers a client could skip an entry committed after it read later
+ones.
+"""
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse, JsonResponse
+from django.utils.module_loading import import_string
+from django.views.decorators.http import require_http_methods
+
+from .json import ModelEncoder
+
+
+def tracked_models():
+    """Returns {model class: encoder class} for the tracked models."""
+    return {
+        apps.get_model(label): import_string(encoder)
+        for label, encoder in settings.CHANGE_FEED_MODELS.items()
+    }
+
+
+def record(instance, action):
+    # Imported here because models can't be imported before the
+    # app registry is ready
+    from .models import Change
+
+    label = instance._meta.label_lower
+    with transaction.atomic():
+        Change.objects.filter(label=label, object_id=instance.pk).delete()
+        Change.objects.create(
+            label=label, object_id=instance.pk, action=action
+        )
+
+
+def record_deleted(model, ids):
+    """Records deletes of rows removed without signals."""
+    from .models import Change
+
+    if model not in tracked_models() or not ids:
+        return
+    label = model._meta.label_lower
+    with transaction.atomic():
+        Change.objects.filter(label=label, object_id__in=ids).delete()
+        Change.objects.bulk_create(
+            Change(label=label, object_id=object_id, action=Change.DELETE)
+            for object_id in ids
+        )
+
+
+def _on_save(sender, instance, **kwargs):
+    from .models import Change
+
+    record(instance, Change.UPSERT)
+
+
+def _on_delete(sender, instance, **kwargs):
+    from .models import Change
+
+    record(instance, Change.DELETE)
+
+
+def connect():
+    for model in tracked_models():
+        uid = f"common.changes.{model._meta.label_lower}"
+        post_save.connect(_on_save, sender=model, dispatch_uid=uid)
+        post_delete.connect(_on_delete, sender=model, dispatch_uid=uid)
+
+
+def _related(model, encoder):
+    # Foreign keys the encoder reads, fetched in the same query
+    return [
+        field.name
+        for field in model._meta.fields
+        if field.is_relation and field.name in encoder.properties
+    ]
+
+
+@require_http_methods(["GET"])
+def changes_view(request):
+    """
+    Returns the changes after the "since" cursor (default 0, for
+    everything), oldest first and at most CHANGE_FEED_PAGE_SIZE of
+    them. Ask again with the returned cursor while "more" is true.
+
+    {
+        "changes": [
+            {
+                "cursor": the change's cursor,
+                "model": e.g. "events.conference",
+                "id": the row's primary key,
+                "action": "upsert" or "delete",
+                "data": the row as its detail endpoint shows it,
+                    or null when deleted,
+            },
+            ...
+        ],
+        "cursor": cursor to pass as "since" next time,
+        "more": whether more changes are waiting,
+    }
+    """
+    from .models import Change
+
+    try:
+        since = int(request.GET.get("since", 0))
+    except ValueError:
+        return JsonResponse({"message": "Invalid cursor"}, status=400)
+
+    page_size = settings.CHANGE_FEED_PAGE_SIZE
+    changes = list(Change.objects.filter(id__gt=since)[: page_size + 1])
+    more = len(changes) > page_size
+    changes = changes[:page_size]
+
+    # One query per model for the rows that still exist
+    models = {
+        model._meta.label_lower: (model, encoder)
+        for model, encoder in tracked_models().items()
+    }
+    upserted = {}
+    for change in changes:
+        if change.action == Change.UPSERT and change.label in models:
+            upserted.setdefault(change.label, []).append(change.object_id)
+    rows = {}
+    for label, ids in upserted.items():
+        model, encoder = models[label]
+        queryset = model.objects.filter(pk__in=ids).select_related(
+            *_related(model, encoder)
+        )
+        rows[label] = {row.pk: row for row in queryset}
+
+    # Each row is encoded by its own model's encoder, so the entries
+    # are encoded one by one and joined
+    entries = []
+    for change in changes:
+        row = rows.get(change.label, {}).get(change.object_id)
+        entry = {
+            "cursor": change.id,
+            "model": change.label,
+            "id": change.object_id,
+            # Deleted since the change was read
+            "action": Change.UPSERT if row is not None else Change.DELETE,
+            "data": row,
+        }
+        encoder = models[change.label][1] if row is not None else ModelEncoder
+        entries.append(encoder().encode(entry))
+
+    cursor = changes[-1].id if changes else since
+    body = (
+        f'{{"changes": [{", ".join(entries)}], '
+        f'"cursor": {cursor}, "more": {"true" if more else "false"}}}'
+    )
+    return HttpResponse(body, content_type="application/json")
@@ -0,0 +1,185 @@
+"""
+Response formats for the API, chosen by the request's Accept header.
+
+API views return an ApiResponse, which takes the same arguments as
+JsonResponse but encodes its data only when Django renders the
+response. ContentNegotiationMiddleware picks the format first:
+
+- application/json, the default: what JsonResponse would send.
+- application/vnd.conference-go.columnar+json: every list of model
+  objects becomes {"columns": [...], "rows": [[...], ...]}, so each
+  key is sent once per list instead of once per row. The columns are
+  the ones the encoder produces (its properties, "href" and extras).
+- application/x-ndjson: one JSON document per line, one per object
+  of a list response, so clients can parse as the rows arrive.
+- application/msgpack: the JSON structure as MessagePack.
+
+Dates are sent as ISO 8601 strings in every format. The encoders'
+default() builds each object's fields, so every format shows the
+same fields as the JSON one.
+"""
+
+import json
+import time
+
+import msgpack
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, QuerySet
+from django.http import HttpResponse
+
+from . import instrumentation
+
+JSON = "application/json"
+COLUMNAR = "application/vnd.conference-go.columnar+json"
+NDJSON = "application/x-ndjson"
+MSGPACK = "application/msgpack"
+
+# Alternative names clients send for the same formats
+ALIASES = {"application/x-msgpack": MSGPACK}
+
+
+def supported():
+    """The media types offered, in order of preference."""
+    return [JSON, COLUMNAR, NDJSON, MSGPACK]
+
+
+def negotiate(request):
+    """
+    Returns the offered media type the Accept header ranks highest,
+    the earliest listed among equals. Anything else gets JSON.
+    """
+    offered = supported()
+    best, best_quality = JSON, 0.0
+    for item in request.headers.get("Accept", "").split(","):
+        media_type, *params = item.strip().split(";")
+        media_type = ALIASES.get(media_type.strip().lower(), media_type)
+        if media_type not in offered:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def _rows(data):
+    # The list a list response is made of, if it is one: a bare list
+    # or a dict with a single list in it, e.g. {"locations": [...]}
+    if isinstance(data, (list, QuerySet)):
+        return data
+    if isinstance(data, dict) and len(data) == 1:
+        [value] = data.values()
+        if isinstance(value, (list, QuerySet)):
+            return value
+    return None
+
+
+def _columnar(data, encoder):
+    if isinstance(data, dict):
+        return {key: _columnar(value, encoder) for key, value in data.items()}
+    if not isinstance(data, (list, QuerySet)):
+        return data
+    objects = list(data)
+    if not objects or not all(isinstance(o, Model) for o in objects):
+        return [_columnar(value, encoder) for value in objects]
+    rows = [encoder.default(o) for o in objects]
+    columns = list(rows[0])
+    return {
+        "columns": columns,
+        "rows": [[row.get(column) for column in columns] for row in rows],
+    }
+
+
+def _plain_encode(encoder, value):
+    # Skips ModelEncoder.encode's timing; render() times the whole
+    # rendering instead
+    return json.JSONEncoder.encode(encoder, value)
+
+
+def render_json(data, encoder):
+    return _plain_encode(encoder, data).encode()
+
+
+def render_columnar(data, encoder):
+    return _plain_encode(encoder, _columnar(data, encoder)).encode()
+
+
+def render_ndjson(data, encoder):
+    rows = _rows(data)
+    if rows is None:
+        rows = [data]
+    return "".join(_plain_encode(encoder, row) + "\n" for row in rows).encode()
+
+
+def render_msgpack(data, encoder):
+    return msgpack.packb(data, default=encoder.default, use_bin_type=True)
+
+
+RENDERERS = {
+    JSON: render_json,
+    COLUMNAR: render_columnar,
+    NDJSON: render_ndjson,
+    MSGPACK: render_msgpack,
+}
+
+
+class ApiResponse(HttpResponse):
+    """
+    A JsonResponse whose data is encoded when the response is
+    rendered, in the format set in media_type (JSON unless
+    ContentNegotiationMiddleware chose another). Reading content
+    renders it first.
+    """
+
+    def __init__(
+        self,
+        data,
+        encoder=DjangoJSONEncoder,
+        safe=True,
+        json_dumps_params=None,
+        **kwargs,
+    ):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set "
+                "the safe parameter to False."
+            )
+        kwargs.setdefault("content_type", JSON)
+        super().__init__(**kwargs)
+        self.data = data
+        self.encoder = encoder
+        self.json_dumps_params = json_dumps_params or {}
+        self.media_type = JSON
+        self.is_rendered = False
+
+    def render(self):
+        if self.is_rendered:
+            return self
+        encoder = self.encoder(**self.json_dumps_params)
+        metrics = instrumentation.current()
+        started = time.perf_counter()
+        self.content = RENDERERS[self.media_type](self.data, encoder)
+        if metrics is not None:
+            metrics.encode_time += time.perf_counter() - started
+            if metrics.memory is not None:
+                metrics.memory.mark_encoded()
+        if self.media_type != JSON:
+            self["Content-Type"] = self.media_type
+        return self
+
+    @property
+    def content(self):
+        if not self.is_rendered:
+            self.render()
+        return HttpResponse.content.fget(self)
+
+    @content.setter
+    def content(self, value):
+        HttpResponse.content.fset(self, value)
+        self.is_rendered = True
@@ -0,0 +1,204 @@
+"""
+Per-request measurements shared by the instrumentation middleware.
+
+A RequestMetrics object is made current for the length of a request.
+Every database connection gets an execute wrapper that adds its
+queries to the current object, and ModelEncoder adds its encoding
+time. When no request is being measured, both checks are a single
+context variable lookup.
+
+When memory accounting is on, RequestMetrics.memory holds a
+MemoryUsage built from tracemalloc. When the slow query log is on,
+queries slower than slow_query_threshold are kept, with the stack
+they ran from, in RequestMetrics.slow_queries.
+"""
+
+import time
+import traceback
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_current = ContextVar("request_metrics", default=None)
+
+# Seconds; set by SlowQueryLogMiddleware, None while it is off
+slow_query_threshold = None
+
+
+class RequestMetrics:
+    __slots__ = (
+        "started",
+        "query_count",
+        "db_time",
+        "encode_time",
+        "query_shapes",
+        "memory",
+        "slow_queries",
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.encode_time = 0.0
+        # SQL text (with placeholders) -> times it ran
+        self.query_shapes = {}
+        self.memory = None
+        # (connection alias, sql, params, seconds, stack)
+        self.slow_queries = []
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def repeated_queries(self, threshold):
+        """
+        Returns the queries that ran at least threshold times. The
+        same statement running once per row is the mark of an N+1.
+        """
+        return {
+            sql: count
+            for sql, count in self.query_shapes.items()
+            if count >= threshold
+        }
+
+
+class MemoryUsage:
+    """
+    Peak and net bytes allocated while a request runs, and the code
+    lines that allocated the most.
+
+    tracemalloc counts allocations from every thread, so the numbers
+    are only exact for a worker serving one request at a time.
+    """
+
+    def __init__(self):
+        self._start_snapshot = _snapshot()
+        self._encode_snapshot = None
+        self._encode_peak = 0
+        self._snapshot_overhead = 0
+        self._start_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        self.peak = 0
+        self.net = 0
+        self.top_sites = []
+
+    def mark_encoded(self):
+        """
+        Takes the snapshot for the top allocation sites at the end of
+        encoding, when the model instances and the JSON string are
+        both still alive. Only the first call counts.
+        """
+        if self._encode_snapshot is not None:
+            return
+        size, self._encode_peak = tracemalloc.get_traced_memory()
+        self._encode_snapshot = _snapshot()
+        self._snapshot_overhead = tracemalloc.get_traced_memory()[0] - size
+        tracemalloc.reset_peak()
+
+    def finish(self, top_sites):
+        size, peak = tracemalloc.get_traced_memory()
+        # The snapshot taken in mark_encoded is still alive; leave it out
+        peak = max(self._encode_peak, peak - self._snapshot_overhead)
+        self.peak = max(peak - self._start_size, 0)
+        self.net = size - self._snapshot_overhead - self._start_size
+
+        later = self._encode_snapshot or _snapshot()
+        stats = later.compare_to(self._start_snapshot, "lineno")
+        grown = [stat for stat in stats if stat.size_diff > 0]
+        self.top_sites = [
+            {
+                "site": f"{stat.traceback[0].filename}"
+                f":{stat.traceback[0].lineno}",
+                "bytes": stat.size_diff,
+                "blocks": stat.count_diff,
+            }
+            for stat in grown[:top_sites]
+        ]
+        self._start_snapshot = self._encode_snapshot = None
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)]
+    )
+
+
+def start():
+    """
+    Makes a new RequestMetrics current, unless an outer middleware
+    already did. Pass the result to stop() when the request is done.
+    """
+    if _current.get() is not None:
+        return None
+    return _current.set(RequestMetrics())
+
+
+def stop(token):
+    if token is not None:
+        _current.reset(token)
+
+
+@contextmanager
+def paused():
+    """Runs the block without counting its queries."""
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper that feeds the current metrics."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.db_time += elapsed
+        metrics.query_count += 1
+        metrics.query_shapes[sql] = metrics.query_shapes.get(sql, 0) + 1
+        if (
+            slow_query_threshold is not None
+            and elapsed >= slow_query_threshold
+        ):
+            metrics.slow_queries.append(
+                (
+                    context["connection"].alias,
+                    sql,
+                    params,
+                    elapsed,
+                    traceback.extract_stack(),
+                )
+            )
+
+
+def _install_on(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _install_on(connection)
+
+
+def install():
+    """
+    Adds record_query to every database connection, including the
+    ones this thread already has open.
+    """
+    connection_created.connect(
+        _on_connection_created, dispatch_uid="common.instrumentation"
+    )
+    for connection in connections.all(initialized_only=True):
+        _install_on(connection)
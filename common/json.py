@@ -1,6 +1,9 @@
 from json import JSONEncoder
 from django.db.models import QuerySet
 from datetime import date, datetime
+import time
+
+from . import instrumentation
 
 
 class DateEncoder(JSONEncoder):
@@ -10,7 +13,8 @@ class DateEncoder(JSONEncoder):
             return o.isoformat()
         # For all other types, use the standard JSON encoding
         return super().default(o)
-    
+
+
 class QuerySetEncoder(JSONEncoder):
     def default(self, o):
         if isinstance(o, QuerySet):
@@ -18,9 +22,23 @@ class QuerySetEncoder(JSONEncoder):
         else:
             return super().default(o)
 
+
 class ModelEncoder(DateEncoder, QuerySetEncoder, JSONEncoder):
     encoders = {}
 
+    def encode(self, o):
+        # Count the encoding time against the request being measured
+        metrics = instrumentation.current()
+        if metrics is None:
+            return super().encode(o)
+        started = time.perf_counter()
+        try:
+            return super().encode(o)
+        finally:
+            metrics.encode_time += time.perf_counter() - started
+            if metrics.memory is not None:
+                metrics.memory.mark_encoded()
+
     def default(self, o):
         if isinstance(o, self.model):
             d = {}
@@ -38,4 +56,4 @@ class ModelEncoder(DateEncoder, QuerySetEncoder, JSONEncoder):
             return super().default(o)
 
     def get_extra_data(self, o):
-        return {}
\ No newline at end of file
+        return {}
@@ -0,0 +1,349 @@
+"""
+Prometheus metrics that add up across pre-forked worker processes.
+
+Every process writes its samples to its own mmap'd file in
+settings.METRICS_DIR, so recording a sample is a dict lookup and an
+in-place float update under an uncontended lock. The /metrics view
+reads all the files and sums samples with the same name and labels.
+
+When it does, the files of processes that have exited are added into
+metrics_exited.db and removed, so counters survive worker recycling
+without the directory growing with every worker that ever ran. Empty
+METRICS_DIR when the server (not a worker) starts.
+"""
+
+import fcntl
+import mmap
+import os
+import re
+import struct
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+
+# name -> (type, help)
+METRICS = {
+    "http_requests_total": (
+        "counter",
+        "Requests handled, by route, method and status.",
+    ),
+    "http_request_duration_seconds": (
+        "histogram",
+        "Time spent handling requests, by route.",
+    ),
+    "http_request_db_queries_total": (
+        "counter",
+        "Database queries run while handling requests, by route.",
+    ),
+    "cache_requests_total": (
+        "counter",
+        "Cache lookups, by cache and result (hit or miss).",
+    ),
+    "upstream_request_duration_seconds": (
+        "histogram",
+        "Time spent calling external APIs, by service.",
+    ),
+    "upstream_errors_total": (
+        "counter",
+        "Failed calls to external APIs, by service.",
+    ),
+    "access_log_dropped_total": (
+        "counter",
+        "Access log records dropped because the log queue was full.",
+    ),
+    "rate_limited_total": (
+        "counter",
+        "Requests rejected by the rate limiter, by route.",
+    ),
+    "registrations_total": (
+        "counter",
+        "Write-behind registrations, by result (journaled, registered "
+        "or rejected).",
+    ),
+}
+
+BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+_HEADER = struct.Struct("<I4x")
+_KEY_LENGTH = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+_INITIAL_SIZE = 64 * 1024
+
+
+class _SampleFile:
+    """
+    An mmap'd file of (sample key, float) entries with one writer
+    process.
+
+    Layout: an 8 byte header holding the number of bytes in use, then
+    entries of a 4 byte key length, the key padded to 8 bytes and an
+    8 byte value. New entries are written before the header is moved
+    past them, so a reader never sees a half-written entry.
+    """
+
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size < _INITIAL_SIZE:
+            os.ftruncate(self._fd, _INITIAL_SIZE)
+            size = _INITIAL_SIZE
+        self._map = mmap.mmap(self._fd, size)
+        self._offsets = {}
+        used = _HEADER.unpack_from(self._map)[0]
+        # A pid can be reused; pick up where the old process left off
+        for key, offset in _entries(self._map, used):
+            self._offsets[key] = offset
+        self._used = max(used, _HEADER.size)
+        self._lock = threading.Lock()
+
+    def add(self, key, amount):
+        with self._lock:
+            offset = self._offsets.get(key)
+            if offset is None:
+                offset = self._append(key)
+            value = _VALUE.unpack_from(self._map, offset)[0]
+            _VALUE.pack_into(self._map, offset, value + amount)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def _append(self, key):
+        encoded = key.encode()
+        padded = _padded(_KEY_LENGTH.size + len(encoded))
+        needed = self._used + padded + _VALUE.size
+        if needed > len(self._map):
+            self._grow(needed)
+        _KEY_LENGTH.pack_into(self._map, self._used, len(encoded))
+        start = self._used + _KEY_LENGTH.size
+        self._map[start : start + len(encoded)] = encoded
+        offset = self._used + padded
+        _VALUE.pack_into(self._map, offset, 0.0)
+        self._used = offset + _VALUE.size
+        _HEADER.pack_into(self._map, 0, self._used)
+        self._offsets[key] = offset
+        return offset
+
+    def _grow(self, needed):
+        size = len(self._map)
+        while size < needed:
+            size *= 2
+        self._map.close()
+        os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+
+def _padded(length):
+    return (length + 7) // 8 * 8
+
+
+def _entries(buffer, used):
+    position = _HEADER.size
+    while position < used:
+        length = _KEY_LENGTH.unpack_from(buffer, position)[0]
+        start = position + _KEY_LENGTH.size
+        key = bytes(buffer[start : start + length]).decode()
+        offset = position + _padded(_KEY_LENGTH.size + length)
+        yield key, offset
+        position = offset + _VALUE.size
+
+
+def _samples(data):
+    # (key, value) for each entry of a sample file's bytes
+    if len(data) < _HEADER.size:
+        return
+    used = _HEADER.unpack_from(data)[0]
+    for key, offset in _entries(data, min(used, len(data))):
+        yield key, _VALUE.unpack_from(data, offset)[0]
+
+
+_file = None
+_file_pid = None
+_file_lock = threading.Lock()
+
+EXITED = "metrics_exited.db"
+
+
+def _sample_file():
+    global _file, _file_pid
+    # A forked worker must not keep writing to its parent's file
+    if _file is None or _file_pid != os.getpid():
+        with _file_lock:
+            if _file is None or _file_pid != os.getpid():
+                directory = Path(settings.METRICS_DIR)
+                directory.mkdir(parents=True, exist_ok=True)
+                pid = os.getpid()
+                _file = _SampleFile(directory / f"metrics_{pid}.db")
+                _file_pid = pid
+    return _file
+
+
+def _pid(path):
+    # The pid in a process's file name; None for metrics_exited.db
+    try:
+        return int(path.stem.split("_")[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _has_exited(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def _fold_exited(directory):
+    """
+    Adds the samples of processes that have exited into EXITED and
+    removes their files.
+    """
+    exited = [
+        path
+        for path in directory.glob("metrics_*.db")
+        if _pid(path) is not None and _has_exited(_pid(path))
+    ]
+    if not exited:
+        return
+    # Held while EXITED is open, so two scrapes never write it at once
+    lock = os.open(
+        directory / "metrics_exited.lock", os.O_RDWR | os.O_CREAT, 0o644
+    )
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive = _SampleFile(directory / EXITED)
+        try:
+            for path in exited:
+                try:
+                    data = path.read_bytes()
+                except FileNotFoundError:
+                    # Folded by another scrape
+                    continue
+                for key, value in _samples(data):
+                    archive.add(key, value)
+                path.unlink()
+        finally:
+            archive.close()
+    finally:
+        os.close(lock)
+
+
+def _label_value(value):
+    return (
+        str(value)
+        .replace("\\", r"\\")
+        .replace("\n", r"\n")
+        .replace('"', r"\"")
+    )
+
+
+def _key(name, labels):
+    if not labels:
+        return name
+    pairs = ",".join(
+        f'{label}="{_label_value(value)}"'
+        for label, value in sorted(labels.items())
+    )
+    return f"{name}{{{pairs}}}"
+
+
+def inc(name, labels=None, amount=1):
+    """Adds to a counter."""
+    if settings.METRICS_ENABLED:
+        _sample_file().add(_key(name, labels), amount)
+
+
+def observe(name, value, labels=None):
+    """Records a value in a histogram."""
+    if not settings.METRICS_ENABLED:
+        return
+    labels = labels or {}
+    sample_file = _sample_file()
+    for bucket in BUCKETS:
+        if value <= bucket:
+            sample_file.add(
+                _key(f"{name}_bucket", {**labels, "le": str(bucket)}), 1
+            )
+    sample_file.add(_key(f"{name}_bucket", {**labels, "le": "+Inf"}), 1)
+    sample_file.add(_key(f"{name}_sum", labels), value)
+    sample_file.add(_key(f"{name}_count", labels), 1)
+
+
+def collect():
+    """Sums the samples from every process's files."""
+    totals = defaultdict(float)
+    directory = Path(settings.METRICS_DIR)
+    if directory.is_dir():
+        _fold_exited(directory)
+    for path in directory.glob("metrics_*.db"):
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            continue
+        for key, value in _samples(data):
+            totals[key] += value
+    return totals
+
+
+_SAMPLE_NAME = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)")
+_LE_LABEL = re.compile(r'le="([^"]*)"')
+
+
+def _metric_name(key):
+    name = _SAMPLE_NAME.match(key).group(1)
+    for suffix in ("_bucket", "_sum", "_count"):
+        base = name[: -len(suffix)]
+        kind = METRICS.get(base, ("untyped",))[0]
+        if name.endswith(suffix) and kind == "histogram":
+            return base
+    return name
+
+
+def _sort_key(key):
+    # Buckets in numeric order of their upper bound, "+Inf" last
+    match = _LE_LABEL.search(key)
+    bound = float(match.group(1)) if match else 0.0
+    return _LE_LABEL.sub("", key), bound
+
+
+def render(totals):
+    """Formats samples in the Prometheus text exposition format."""
+    by_metric = defaultdict(list)
+    for key in totals:
+        by_metric[_metric_name(key)].append(key)
+
+    lines = []
+    for name in sorted(by_metric):
+        kind, help_text = METRICS.get(name, ("untyped", ""))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key in sorted(by_metric[name], key=_sort_key):
+            # repr() is the shortest text that reads back as the same
+            # float; :g would round counters past a million
+            lines.append(f"{key} {float(totals[key])!r}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    return HttpResponse(
+        render(collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,611 @@
+import json
+import logging
+import random
+import threading
+import tracemalloc
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from . import (
+    access_log,
+    formats,
+    instrumentation,
+    metrics,
+    profiling,
+    ratelimit,
+    routers,
+)
+
+logger = logging.getLogger(__name__)
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Base for this project's middleware, which runs in both handler
+    chains: handle() under WSGI and ahandle() under ASGI, where it
+    awaits the rest of the chain instead of having Django run the
+    whole chain on one thread with sync_to_async.
+
+    The process_view() and process_template_response() hooks of an
+    async instance are replaced with their aprocess_*() versions when
+    a subclass has them, for the same reason, so the two versions
+    share a helper rather than call each other.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            for hook in ("process_view", "process_template_response"):
+                async_hook = getattr(self, f"a{hook}", None)
+                if async_hook is not None:
+                    setattr(self, hook, async_hook)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.ahandle(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        return self.get_response(request)
+
+    async def ahandle(self, request):
+        return await self.get_response(request)
+
+
+class ReplicaPinningMiddleware(SyncAndAsyncMiddleware):
+    """
+    Pins a request to the primary database when it is a write, or
+    when the client wrote recently, so replica lag never shows a
+    client stale data. Recent writers are remembered with a
+    short-lived cookie and, for clients that don't keep cookies, in
+    the cache under their address (see ratelimit.client_key). Other
+    requests read from one replica picked for the whole request.
+    """
+
+    cookie_name = "db_pinned"
+
+    def _cache_key(self, request):
+        return f"db_pinned:{ratelimit.client_key(request)}"
+
+    def _is_write(self, request):
+        return request.method not in SAFE_METHODS
+
+    def _check_cache(self, request):
+        # Only clients without other reasons to be pinned are looked
+        # up, and only when there are replicas to avoid
+        return (
+            not self._is_write(request)
+            and self.cookie_name not in request.COOKIES
+            and bool(settings.DATABASE_REPLICAS)
+        )
+
+    def _pin(self, request, wrote_recently):
+        # Always set (and reset) the pin and the replica so one
+        # request's choices never leak into the next request served
+        # by the same thread
+        pinned = (
+            self._is_write(request)
+            or self.cookie_name in request.COOKIES
+            or wrote_recently
+        )
+        return (
+            routers.pin_to_primary(pinned),
+            routers.use_replica(routers.choose_replica()),
+        )
+
+    def _unpin(self, tokens):
+        token, replica_token = tokens
+        routers.release_replica(replica_token)
+        routers.unpin(token)
+
+    def _set_cookie(self, response):
+        response.set_cookie(
+            self.cookie_name,
+            "1",
+            max_age=settings.REPLICA_PIN_SECONDS,
+            httponly=True,
+            samesite="Lax",
+        )
+
+    def handle(self, request):
+        wrote_recently = self._check_cache(request) and bool(
+            cache.get(self._cache_key(request))
+        )
+        tokens = self._pin(request, wrote_recently)
+        try:
+            response = self.get_response(request)
+        finally:
+            self._unpin(tokens)
+        if self._is_write(request):
+            if settings.DATABASE_REPLICAS:
+                cache.set(
+                    self._cache_key(request),
+                    1,
+                    settings.REPLICA_PIN_SECONDS,
+                )
+            self._set_cookie(response)
+        return response
+
+    async def ahandle(self, request):
+        wrote_recently = self._check_cache(request) and bool(
+            await cache.aget(self._cache_key(request))
+        )
+        tokens = self._pin(request, wrote_recently)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._unpin(tokens)
+        if self._is_write(request):
+            if settings.DATABASE_REPLICAS:
+                await cache.aset(
+                    self._cache_key(request),
+                    1,
+                    settings.REPLICA_PIN_SECONDS,
+                )
+            self._set_cookie(response)
+        return response
+
+
+class ServerTimingMiddleware(SyncAndAsyncMiddleware):
+    """
+    Measures each request's query count, database time, encoding
+    time and total time, and reports them in a Server-Timing header.
+    Requests that run the same query many times are logged as N+1
+    suspects in a JSON warning. Other requests are logged at DEBUG
+    only, since AccessLogMiddleware already records every API
+    request's latency and query count off the request thread.
+
+    Turned off entirely (not even installed in the handler chain)
+    when settings.SERVER_TIMING_ENABLED is False.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        instrumentation.install()
+
+    def handle(self, request):
+        token = instrumentation.start()
+        try:
+            response = self.get_response(request)
+            request_metrics = instrumentation.current()
+            total = request_metrics.elapsed()
+        finally:
+            instrumentation.stop(token)
+        return self._report(request, response, request_metrics, total)
+
+    async def ahandle(self, request):
+        token = instrumentation.start()
+        try:
+            response = await self.get_response(request)
+            request_metrics = instrumentation.current()
+            total = request_metrics.elapsed()
+        finally:
+            instrumentation.stop(token)
+        return self._report(request, response, request_metrics, total)
+
+    def _report(self, request, response, request_metrics, total):
+        response["Server-Timing"] = ", ".join(
+            [
+                f"db;dur={request_metrics.db_time * 1000:.2f};"
+                f'desc="{request_metrics.query_count} queries"',
+                f"encode;dur={request_metrics.encode_time * 1000:.2f}",
+                f"view;dur={total * 1000:.2f}",
+            ]
+        )
+
+        if request_metrics.memory is not None:
+            response["Server-Timing"] += (
+                f', mem;desc="peak={request_metrics.memory.peak}B'
+                f' net={request_metrics.memory.net}B"'
+            )
+
+        repeated = request_metrics.repeated_queries(
+            settings.SERVER_TIMING_REPEATED_QUERY_THRESHOLD
+        )
+        if not repeated and not logger.isEnabledFor(logging.DEBUG):
+            return response
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": request_metrics.query_count,
+            "db_ms": round(request_metrics.db_time * 1000, 2),
+            "encode_ms": round(request_metrics.encode_time * 1000, 2),
+            "view_ms": round(total * 1000, 2),
+        }
+        if request_metrics.memory is not None:
+            record["peak_bytes"] = request_metrics.memory.peak
+            record["net_bytes"] = request_metrics.memory.net
+        if repeated:
+            record["n_plus_one_suspects"] = repeated
+            logger.warning(json.dumps(record))
+        else:
+            logger.debug(json.dumps(record))
+        return response
+
+
+class ProfilingMiddleware(SyncAndAsyncMiddleware):
+    """
+    Records a sampled stack profile of a request when a staff user
+    asks for one (X-Profile header or ?profile=1), or at random for
+    settings.PROFILER_SAMPLE_RATE of all requests. Profiles are listed
+    at /admin/profiles/.
+
+    The thread handling the request is sampled. Under ASGI that is the
+    event loop's, so async views are profiled but the work of sync
+    views, which runs on a worker thread, is not.
+
+    Must come after AuthenticationMiddleware.
+    """
+
+    header = "HTTP_X_PROFILE"
+    query_parameter = "profile"
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def handle(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        sampler = self._start_sampler()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        response["X-Profile-Id"] = profiling.save_profile(request, sampler)
+        return response
+
+    async def ahandle(self, request):
+        if not await self.ashould_profile(request):
+            return await self.get_response(request)
+
+        sampler = self._start_sampler()
+        try:
+            response = await self.get_response(request)
+        finally:
+            sampler.stop()
+        # Only files, so no need for the thread the ORM runs on
+        response["X-Profile-Id"] = await sync_to_async(
+            profiling.save_profile, thread_sensitive=False
+        )(request, sampler)
+        return response
+
+    def _start_sampler(self):
+        sampler = profiling.StackSampler(
+            threading.get_ident(), settings.PROFILER_INTERVAL
+        )
+        sampler.start()
+        return sampler
+
+    def _requested(self, request):
+        return (
+            self.header in request.META or self.query_parameter in request.GET
+        )
+
+    def _sampled(self):
+        rate = settings.PROFILER_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def should_profile(self, request):
+        if self._requested(request) and request.user.is_staff:
+            return True
+        return self._sampled()
+
+    async def ashould_profile(self, request):
+        if self._requested(request) and (await request.auser()).is_staff:
+            return True
+        return self._sampled()
+
+
+class MemoryAccountingMiddleware(SyncAndAsyncMiddleware):
+    """
+    Traces allocations with tracemalloc and records each request's
+    peak and net allocated bytes and its top allocation sites. The
+    numbers are added to the Server-Timing header and log line, and a
+    warning with the top sites is logged for requests whose peak
+    reaches settings.MEMORY_ACCOUNTING_THRESHOLD bytes.
+
+    tracemalloc slows Python down noticeably, so this is a diagnostic
+    mode, off unless settings.MEMORY_ACCOUNTING_ENABLED is True. It
+    should come right after ServerTimingMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if not settings.MEMORY_ACCOUNTING_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _start(self):
+        token = instrumentation.start()
+        usage = instrumentation.current().memory = (
+            instrumentation.MemoryUsage()
+        )
+        return token, usage
+
+    def handle(self, request):
+        token, usage = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            usage.finish(settings.MEMORY_ACCOUNTING_TOP_SITES)
+            instrumentation.stop(token)
+        return self._report(request, response, usage)
+
+    async def ahandle(self, request):
+        # tracemalloc counts the whole process, so requests that
+        # overlap in the event loop are counted in each other's numbers
+        token, usage = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            usage.finish(settings.MEMORY_ACCOUNTING_TOP_SITES)
+            instrumentation.stop(token)
+        return self._report(request, response, usage)
+
+    def _report(self, request, response, usage):
+        if usage.peak >= settings.MEMORY_ACCOUNTING_THRESHOLD:
+            match = request.resolver_match
+            logger.warning(
+                json.dumps(
+                    {
+                        "method": request.method,
+                        "path": request.path,
+                        "view": match.view_name if match else None,
+                        "peak_bytes": usage.peak,
+                        "net_bytes": usage.net,
+                        "top_sites": usage.top_sites,
+                    }
+                )
+            )
+        return response
+
+
+class PrometheusMetricsMiddleware(SyncAndAsyncMiddleware):
+    """
+    Counts requests and their database queries and times them, per
+    route, for the /metrics endpoint. Off when settings.METRICS_ENABLED
+    is False.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        instrumentation.install()
+
+    def handle(self, request):
+        token = instrumentation.start()
+        request_metrics = instrumentation.current()
+        try:
+            response = self.get_response(request)
+            elapsed = request_metrics.elapsed()
+        finally:
+            instrumentation.stop(token)
+        return self._record(request, response, request_metrics, elapsed)
+
+    async def ahandle(self, request):
+        token = instrumentation.start()
+        request_metrics = instrumentation.current()
+        try:
+            response = await self.get_response(request)
+            elapsed = request_metrics.elapsed()
+        finally:
+            instrumentation.stop(token)
+        return self._record(request, response, request_metrics, elapsed)
+
+    def _record(self, request, response, request_metrics, elapsed):
+        match = request.resolver_match
+        route = match.view_name if match else "unmatched"
+        metrics.inc(
+            "http_requests_total",
+            {
+                "route": route,
+                "method": request.method,
+                "status": response.status_code,
+            },
+        )
+        metrics.observe(
+            "http_request_duration_seconds", elapsed, {"route": route}
+        )
+        metrics.inc(
+            "http_request_db_queries_total",
+            {"route": route},
+            request_metrics.query_count,
+        )
+        return response
+
+
+class SlowQueryLogMiddleware(SyncAndAsyncMiddleware):
+    """
+    Sends the queries that took at least settings.SLOW_QUERY_THRESHOLD_MS
+    to the slow query log (see common.slow_queries), which saves them
+    on its own thread. Off unless settings.SLOW_QUERY_LOG_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_LOG_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        instrumentation.slow_query_threshold = (
+            settings.SLOW_QUERY_THRESHOLD_MS / 1000
+        )
+        instrumentation.install()
+
+    def handle(self, request):
+        token = instrumentation.start()
+        request_metrics = instrumentation.current()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+        return self._send(request, response, request_metrics)
+
+    async def ahandle(self, request):
+        token = instrumentation.start()
+        request_metrics = instrumentation.current()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+        return self._send(request, response, request_metrics)
+
+    def _send(self, request, response, request_metrics):
+        if request_metrics.slow_queries:
+            # Imported here because it needs the app registry
+            from . import slow_queries
+
+            match = request.resolver_match
+            slow_queries.enqueue(
+                request_metrics.slow_queries,
+                match.view_name if match else None,
+            )
+            request_metrics.slow_queries = []
+        return response
+
+
+class AccessLogMiddleware(SyncAndAsyncMiddleware):
+    """
+    Writes a JSON access log entry for every /api/ request through
+    common.access_log, which only enqueues on the request thread. Off
+    when settings.ACCESS_LOG_ENABLED is False.
+    """
+
+    prefix = "/api/"
+
+    def __init__(self, get_response):
+        if not settings.ACCESS_LOG_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        instrumentation.install()
+
+    def handle(self, request):
+        if not request.path.startswith(self.prefix):
+            return self.get_response(request)
+
+        token = instrumentation.start()
+        request_metrics = instrumentation.current()
+        try:
+            response = self.get_response(request)
+            elapsed = request_metrics.elapsed()
+        finally:
+            instrumentation.stop(token)
+        return self._log(request, response, request_metrics, elapsed)
+
+    async def ahandle(self, request):
+        if not request.path.startswith(self.prefix):
+            return await self.get_response(request)
+
+        token = instrumentation.start()
+        request_metrics = instrumentation.current()
+        try:
+            response = await self.get_response(request)
+            elapsed = request_metrics.elapsed()
+        finally:
+            instrumentation.stop(token)
+        return self._log(request, response, request_metrics, elapsed)
+
+    def _log(self, request, response, request_metrics, elapsed):
+        if response.streaming:
+            size = response.get("Content-Length")
+            size = int(size) if size is not None else None
+        else:
+            size = len(response.content)
+        match = request.resolver_match
+        access_log.log(
+            {
+                "method": request.method,
+                "path": request.path,
+                "route": match.view_name if match else None,
+                "status": response.status_code,
+                "latency_ms": round(elapsed * 1000, 2),
+                "bytes": size,
+                "queries": request_metrics.query_count,
+            }
+        )
+        return response
+
+
+class RateLimitMiddleware(SyncAndAsyncMiddleware):
+    """
+    Rejects requests with 429 once their client has used up the token
+    bucket for the route, as set per URL name in settings.RATE_LIMITS.
+    Paths under settings.RATE_LIMIT_EXEMPT_PATHS are let through. The
+    buckets are shared by all worker processes (see common.ratelimit).
+    Off when settings.RATE_LIMIT_ENABLED is False.
+    """
+
+    def __init__(self, get_response):
+        if not settings.RATE_LIMIT_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        return self._limit(request)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        # The bucket is an flock and a few bytes of an mmap; cheaper
+        # than a trip to a worker thread
+        return self._limit(request)
+
+    def _limit(self, request):
+        if request.path.startswith(tuple(settings.RATE_LIMIT_EXEMPT_PATHS)):
+            return None
+        route = request.resolver_match.view_name
+        wait = ratelimit.take(request, route)
+        if not wait:
+            return None
+
+        metrics.inc("rate_limited_total", {"route": route})
+        response = JsonResponse({"message": "Too many requests"}, status=429)
+        response["Retry-After"] = str(ratelimit.retry_after(wait))
+        return response
+
+
+class ContentNegotiationMiddleware(SyncAndAsyncMiddleware):
+    """
+    Has API responses rendered in the format the request's Accept
+    header asks for (see common.formats). Off when
+    settings.CONTENT_NEGOTIATION_ENABLED is False, which leaves every
+    response JSON.
+    """
+
+    def __init__(self, get_response):
+        if not settings.CONTENT_NEGOTIATION_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_template_response(self, request, response):
+        return self._negotiate(request, response)
+
+    async def aprocess_template_response(self, request, response):
+        return self._negotiate(request, response)
+
+    def _negotiate(self, request, response):
+        if isinstance(response, formats.ApiResponse):
+            response.media_type = formats.negotiate(request)
+            patch_vary_headers(response, ["Accept"])
+        return response
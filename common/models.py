@@ -0,0 +1,78 @@
+from django.db import models
+
+
+class SlowQueryShape(models.Model):
+    """
+    The SlowQueryShape model groups slow queries that only differ in
+    their parameters, and keeps running totals for the group.
+    """
+
+    fingerprint = models.CharField(max_length=40, unique=True)
+    sql = models.TextField()
+    calls = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.sql[:100]
+
+    class Meta:
+        ordering = ("-total_ms",)
+
+
+class SlowQuery(models.Model):
+    """
+    The SlowQuery model is one query that ran longer than
+    settings.SLOW_QUERY_THRESHOLD_MS. Only the newest
+    settings.SLOW_QUERY_LOG_MAX_ENTRIES are kept.
+    """
+
+    shape = models.ForeignKey(
+        SlowQueryShape,
+        related_name="queries",
+        on_delete=models.CASCADE,
+    )
+    sql = models.TextField()
+    params = models.TextField(blank=True)
+    duration_ms = models.FloatField()
+    view = models.CharField(max_length=200, blank=True)
+    stack_frame = models.CharField(max_length=500, blank=True)
+    query_plan = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.duration_ms:.0f} ms: {self.sql[:80]}"
+
+    class Meta:
+        ordering = ("-id",)
+        verbose_name_plural = "slow queries"
+
+
+class Change(models.Model):
+    """
+    The Change model is one entry in the change feed (see
+    common.changes): the latest create, update or delete of one row
+    of a tracked model. Its id is the feed cursor.
+    """
+
+    UPSERT = "upsert"
+    DELETE = "delete"
+    ACTIONS = [(UPSERT, "Created or updated"), (DELETE, "Deleted")]
+
+    label = models.CharField(max_length=100)  # e.g. "events.conference"
+    object_id = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTIONS)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.id}: {self.action} {self.label} {self.object_id}"
+
+    class Meta:
+        ordering = ("id",)
+        indexes = [
+            models.Index(
+                fields=["label", "object_id"], name="change_object_idx"
+            ),
+        ]
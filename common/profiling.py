@@ -0,0 +1,121 @@
+"""
+Statistical stack profiling of single requests.
+
+A StackSampler thread looks at the stack of the thread serving the
+request every few milliseconds and counts each distinct stack. The
+result is written in collapsed-stack format ("a;b;c count" per line,
+the input format of flamegraph.pl and speedscope) to a directory that
+keeps only the newest settings.PROFILER_MAX_FILES profiles.
+"""
+
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+
+class StackSampler:
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_collapse(frame)] += 1
+
+    def collapsed(self):
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.samples.most_common()
+        )
+
+
+def _short_path(filename):
+    # Drop the longest sys.path prefix, so frames read like module paths
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1 :]
+    return filename
+
+
+def _collapse(frame):
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(
+            f"{code.co_name} ({_short_path(code.co_filename)}"
+            f":{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    # Collapsed stacks list the outermost frame first
+    return ";".join(reversed(frames))
+
+
+def profile_dir():
+    return Path(settings.PROFILER_DIR)
+
+
+def save_profile(request, sampler):
+    """
+    Writes the profile to the ring buffer directory, drops the oldest
+    profiles beyond PROFILER_MAX_FILES and returns the new file name.
+    """
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%f")
+    path = re.sub(r"[^A-Za-z0-9]+", "_", request.path).strip("_")
+    name = f"{stamp}_{request.method}_{path}.folded"
+    (directory / name).write_text(sampler.collapsed())
+
+    profiles = sorted(directory.glob("*.folded"))
+    for old in profiles[: -settings.PROFILER_MAX_FILES]:
+        old.unlink(missing_ok=True)
+    return name
+
+
+def list_profiles():
+    directory = profile_dir()
+    if not directory.exists():
+        return []
+    return sorted(
+        (path.name for path in directory.glob("*.folded")), reverse=True
+    )
+
+
+def profile_list(request):
+    """Admin page listing the stored profiles, newest first."""
+    links = "".join(
+        f'<li><a href="{name}">{name}</a></li>' for name in list_profiles()
+    )
+    return HttpResponse(
+        "<h1>Request profiles</h1>"
+        "<p>Collapsed stacks, ready for flamegraph.pl or speedscope.</p>"
+        f"<ul>{links}</ul>"
+    )
+
+
+def profile_detail(request, name):
+    """Admin page returning one stored profile as plain text."""
+    if name not in list_profiles():
+        raise Http404("Profile not found")
+    return HttpResponse(
+        (profile_dir() / name).read_text(),
+        content_type="text/plain; charset=utf-8",
+    )
@@ -0,0 +1,139 @@
+"""
+Token buckets shared by every worker process on a host.
+
+The buckets live in a fixed-size hash table in an mmap'd file
+(settings.RATE_LIMIT_FILE), so taking a token is a hash, an flock and
+a few struct reads and writes, without a database or a cache server.
+Each slot holds a 64 bit key hash, the tokens left and the time they
+were counted.
+
+When every slot a key can probe is taken, the slot touched longest
+ago is reused. A bucket idle for that long has usually refilled, so
+starting it over full loses little.
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+_SLOT = struct.Struct("<Qdd")
+_PROBES = 8
+
+
+class BucketTable:
+    def __init__(self, path, slots):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.slots = slots
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = slots * _SLOT.size
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        # flock keeps other processes out, the lock other threads
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now=None):
+        """
+        Takes a token from the bucket for key, which refills at rate
+        tokens a second up to burst. Returns 0 when a token was taken,
+        otherwise the seconds until one will be available.
+        """
+        if now is None:
+            now = time.time()
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        # 0 marks an empty slot
+        key_hash = int.from_bytes(digest, "little") | 1
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset, tokens, counted = self._find(key_hash)
+                if tokens is None:
+                    tokens = burst
+                else:
+                    tokens = min(burst, tokens + (now - counted) * rate)
+                if tokens >= 1:
+                    tokens -= 1
+                    wait = 0
+                else:
+                    wait = (1 - tokens) / rate
+                _SLOT.pack_into(self._map, offset, key_hash, tokens, now)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return wait
+
+    def _find(self, key_hash):
+        """
+        Returns the offset of the slot for key_hash and its tokens and
+        time, or None for both when the bucket is new.
+        """
+        start = key_hash % self.slots
+        oldest = oldest_time = None
+        for probe in range(_PROBES):
+            offset = (start + probe) % self.slots * _SLOT.size
+            slot_hash, tokens, counted = _SLOT.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                return offset, tokens, counted
+            if slot_hash == 0:
+                return offset, None, None
+            if oldest is None or counted < oldest_time:
+                oldest, oldest_time = offset, counted
+        return oldest, None, None
+
+
+_table = None
+_table_pid = None
+
+
+def table():
+    global _table, _table_pid
+    # A forked worker needs its own descriptor, or flock would treat
+    # it and its parent as one holder
+    if _table is None or _table_pid != os.getpid():
+        _table = BucketTable(
+            settings.RATE_LIMIT_FILE, settings.RATE_LIMIT_SLOTS
+        )
+        _table_pid = os.getpid()
+    return _table
+
+
+def limit_for(route):
+    """Returns the (rate, burst) limit for a URL name, or None."""
+    limit = settings.RATE_LIMITS.get(route, settings.RATE_LIMIT_DEFAULT)
+    if limit is None:
+        return None
+    return limit["rate"], limit["burst"]
+
+
+def client_key(request):
+    """Identifies the client by address, from a proxy header if set."""
+    header = settings.RATE_LIMIT_CLIENT_HEADER
+    if header:
+        forwarded = request.META.get(header)
+        if forwarded:
+            return forwarded.split(",", 1)[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def take(request, route):
+    """
+    Takes a token from the request's client's bucket for the URL name.
+    Returns 0 when it may go ahead, otherwise the seconds to wait.
+    """
+    limit = limit_for(route)
+    if limit is None:
+        return 0
+    return table().take(f"{route}|{client_key(request)}", *limit)
+
+
+def retry_after(wait):
+    """Whole seconds for a Retry-After header, at least 1."""
+    return max(1, math.ceil(wait))
@@ -0,0 +1,82 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+ROUTED_APP_LABELS = {"events", "attendees", "presentations"}
+
+# Set for the rest of a request once it has written to the primary,
+# so later reads in the same request see that write.
+_pinned = ContextVar("pinned_to_primary", default=False)
+
+# The replica a request reads from, so all its reads see one snapshot
+_replica = ContextVar("replica", default=None)
+
+
+def pin_to_primary(pinned=True):
+    return _pinned.set(pinned)
+
+
+def unpin(token):
+    _pinned.reset(token)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+def choose_replica():
+    """Picks a replica for a new request; None when there are none."""
+    replicas = settings.DATABASE_REPLICAS
+    return random.choice(replicas) if replicas else None
+
+
+def use_replica(alias):
+    return _replica.set(alias)
+
+
+def release_replica(token):
+    _replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Sends reads for the conference apps to one of the databases
+    named in settings.DATABASE_REPLICAS and writes to "default".
+
+    Every read in a request goes to the same replica, chosen by
+    ReplicaPinningMiddleware (or by the first read, outside a
+    request). A request is pinned to the primary after its first
+    write, and the middleware keeps a client pinned for a while after
+    it sends a write so replica lag never hides its own changes.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            model._meta.app_label not in ROUTED_APP_LABELS
+            or not replicas
+            or is_pinned()
+        ):
+            return "default"
+        replica = _replica.get()
+        if replica not in replicas:
+            replica = choose_replica()
+            use_replica(replica)
+        return replica
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,172 @@
+"""
+Storage for the slow query log.
+
+Slow queries are collected while a request runs (see
+common.instrumentation) and handed to a writer thread by
+SlowQueryLogMiddleware, so the request that was already slow doesn't
+also wait for the EXPLAIN and the inserts. Each is saved with its
+EXPLAIN output, the view and the line of project code that ran it.
+Queries that only differ in their parameters share a fingerprint and
+are totalled in SlowQueryShape. When the writer falls
+settings.SLOW_QUERY_LOG_QUEUE_SIZE requests behind, new ones are
+dropped and logged.
+"""
+
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import (
+    IntegrityError,
+    close_old_connections,
+    connections,
+    transaction,
+)
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import SlowQuery, SlowQueryShape
+
+logger = logging.getLogger(__name__)
+
+_queue = None
+_pid = None
+_lock = threading.Lock()
+
+_IN_LIST = re.compile(r"\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)", re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s")
+
+
+def normalize(sql):
+    """
+    Returns the SQL with every value replaced by "?", and IN lists
+    of any length collapsed to "IN (...)".
+    """
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _PLACEHOLDER.sub("?", sql)
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()
+
+
+def _origin(stack):
+    # The innermost frame in project code, skipping the instrumentation
+    base_dir = str(settings.BASE_DIR)
+    this_package = str(Path(__file__).parent)
+    for frame in reversed(stack):
+        filename = frame.filename
+        if (
+            filename.startswith(base_dir)
+            and not filename.startswith(this_package)
+            and "site-packages" not in filename
+        ):
+            path = filename[len(base_dir) + 1 :]
+            return f"{path}:{frame.lineno} in {frame.name}"
+    return ""
+
+
+def _query_plan(alias, sql, params):
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return ""
+    connection = connections[alias]
+    prefix = (
+        "EXPLAIN QUERY PLAN" if connection.vendor == "sqlite" else "EXPLAIN"
+    )
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}", params)
+            return "\n".join(
+                " ".join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+    except Exception as error:
+        return f"EXPLAIN failed: {error}"
+
+
+def _record_shape(key, sql, duration_ms):
+    shapes = SlowQueryShape.objects.filter(fingerprint=key)
+    changes = {
+        "calls": F("calls") + 1,
+        "total_ms": F("total_ms") + duration_ms,
+        "max_ms": Greatest(F("max_ms"), duration_ms),
+        "last_seen": timezone.now(),
+    }
+    if not shapes.update(**changes):
+        try:
+            with transaction.atomic():
+                SlowQueryShape.objects.create(
+                    fingerprint=key,
+                    sql=normalize(sql),
+                    calls=1,
+                    total_ms=duration_ms,
+                    max_ms=duration_ms,
+                )
+        except IntegrityError:
+            shapes.update(**changes)
+    return shapes.values_list("pk", flat=True).get()
+
+
+def save(slow_queries, view):
+    """Saves the slow queries of one request and trims the log."""
+    newest = None
+    for alias, sql, params, seconds, stack in slow_queries:
+        duration_ms = seconds * 1000
+        shape_id = _record_shape(fingerprint(sql), sql, duration_ms)
+        newest = SlowQuery.objects.create(
+            shape_id=shape_id,
+            sql=sql,
+            params=repr(params)[:2000],
+            duration_ms=duration_ms,
+            view=view or "",
+            stack_frame=_origin(stack)[:500],
+            query_plan=_query_plan(alias, sql, params),
+        )
+    if newest is not None:
+        SlowQuery.objects.filter(
+            id__lte=newest.id - settings.SLOW_QUERY_LOG_MAX_ENTRIES
+        ).delete()
+
+
+def _run(work):
+    while True:
+        slow_queries, view = work.get()
+        try:
+            save(slow_queries, view)
+        except Exception:
+            logger.exception("Saving slow queries failed")
+        finally:
+            # Honors CONN_MAX_AGE as the end of a request would
+            close_old_connections()
+
+
+def enqueue(slow_queries, view):
+    """Hands one request's slow queries to the writer thread."""
+    global _queue, _pid
+    # A forked worker gets a copy of the queue but not the thread
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                _queue = queue.Queue(
+                    maxsize=settings.SLOW_QUERY_LOG_QUEUE_SIZE
+                )
+                threading.Thread(
+                    target=_run, args=(_queue,), daemon=True
+                ).start()
+                _pid = os.getpid()
+    try:
+        _queue.put_nowait((slow_queries, view))
+    except queue.Full:
+        logger.warning(
+            "Dropped %s slow queries from %s", len(slow_queries), view
+        )
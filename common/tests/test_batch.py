@@ -0,0 +1,155 @@
+"""
+The batch endpoint: answers in request order, a failing request that
+leaves the rest of the batch alone, and rate limits charged per
+request. The failing views are routed by this module, which serves
+as the URLconf in front of the project's own.
+"""
+
+import tempfile
+from pathlib import Path
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+
+from common import ratelimit
+from events.models import Location, State
+
+
+def failing_view(request):
+    raise RuntimeError("broken view")
+
+
+def failing_query_view(request):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT * FROM no_such_table")
+
+
+urlpatterns = [
+    path("api/failing/", failing_view, name="api_failing"),
+    path("api/failing-query/", failing_query_view, name="api_failing_query"),
+    path("", include("conference_go.urls")),
+]
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    SNAPSHOTS_ENABLED=False,
+    RATE_LIMIT_ENABLED=False,
+    DATABASE_REPLICAS=[],
+)
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(name="Illinois", abbreviation="IL")
+        cls.locations = [
+            Location.objects.create(
+                name=f"Hall {n}", city="Chicago", room_count=10, state=state
+            )
+            for n in range(3)
+        ]
+
+    def batch(self, paths, **request):
+        response = self.client.post(
+            "/api/batch/",
+            {"requests": [{"path": path, **request} for path in paths]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["responses"]
+
+    def statuses(self, responses):
+        return [response["status"] for response in responses]
+
+    def test_responses_in_request_order(self):
+        paths = [
+            f"/api/locations/{location.id}/"
+            for location in reversed(self.locations)
+        ]
+
+        responses = self.batch(paths + ["/api/locations/0/", "/api/nothing/"])
+
+        self.assertEqual(self.statuses(responses), [200, 200, 200, 404, 404])
+        self.assertEqual(
+            [response["body"]["name"] for response in responses[:3]],
+            ["Hall 2", "Hall 1", "Hall 0"],
+        )
+
+    def test_shared_lookup_reads_the_rows_once(self):
+        paths = [
+            f"/api/locations/{location.id}/" for location in self.locations
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            responses = self.batch(paths)
+
+        self.assertEqual(self.statuses(responses), [200, 200, 200])
+        selects = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith("SELECT")
+        ]
+        self.assertEqual(len(selects), 1, selects)
+
+    def test_only_get_requests(self):
+        location = self.locations[0]
+
+        responses = self.batch(
+            [f"/api/locations/{location.id}/"], method="DELETE"
+        )
+
+        self.assertEqual(self.statuses(responses), [405])
+        self.assertTrue(Location.objects.filter(id=location.id).exists())
+
+    def test_failing_request_does_not_fail_the_others(self):
+        location = self.locations[0]
+        paths = [
+            "/api/failing/",
+            f"/api/locations/{location.id}/",
+            "/api/failing-query/",
+            f"/api/locations/{location.id}/",
+        ]
+
+        with self.assertLogs("common.batch", "ERROR") as logs:
+            responses = self.batch(paths)
+
+        self.assertEqual(self.statuses(responses), [500, 200, 500, 200])
+        self.assertEqual(
+            responses[0]["body"], {"message": "Internal server error"}
+        )
+        self.assertEqual(len(logs.records), 2)
+
+    def test_too_many_requests(self):
+        with override_settings(BATCH_MAX_REQUESTS=2):
+            response = self.client.post(
+                "/api/batch/",
+                {"requests": [{"path": "/api/locations/"}] * 3},
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["max_requests"], 2)
+
+    def test_each_request_is_charged_to_its_route(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # The table is opened once per process; open the test's own
+        ratelimit._table = None
+        self.addCleanup(setattr, ratelimit, "_table", None)
+        location = self.locations[0]
+        paths = [f"/api/locations/{location.id}/"] * 3 + ["/api/locations/"]
+
+        with override_settings(
+            RATE_LIMIT_ENABLED=True,
+            RATE_LIMITS={"api_show_location": {"rate": 0.001, "burst": 2}},
+            RATE_LIMIT_DEFAULT=None,
+            RATE_LIMIT_FILE=Path(directory.name) / "ratelimit.bin",
+        ):
+            responses = self.batch(paths)
+
+        self.assertEqual(self.statuses(responses)[:3], [200, 200, 429])
+        self.assertEqual(responses[2]["body"]["message"], "Too many requests")
+        self.assertGreaterEqual(responses[2]["body"]["retry_after"], 1)
+        # Other routes have their own buckets
+        self.assertNotEqual(responses[3]["status"], 429)
@@ -0,0 +1,147 @@
+"""
+What each response format makes of the same list of model objects:
+the JSON one, its columnar form, one document per line, and
+MessagePack. The objects are not saved; the encoders only read their
+fields.
+"""
+
+import json
+from datetime import datetime, timezone
+
+import msgpack
+from django.test import SimpleTestCase
+
+from common import formats
+from events.api_views import LocationListEncoder, NearbyConferenceEncoder
+from events.models import Conference, Location
+
+STARTS = datetime(2026, 5, 1, 9, tzinfo=timezone.utc)
+ENDS = datetime(2026, 5, 3, 17, tzinfo=timezone.utc)
+
+
+class RendererTests(SimpleTestCase):
+    def setUp(self):
+        self.locations = [
+            Location(id=1, name="Hall A"),
+            Location(id=2, name="Hall B"),
+        ]
+        self.conference = Conference(
+            id=7,
+            name="PyCon",
+            starts=STARTS,
+            ends=ENDS,
+            location=self.locations[0],
+        )
+        self.conference.distance_miles = 12.34
+
+    def render(self, media_type, data, encoder=LocationListEncoder):
+        response = formats.ApiResponse(data, encoder=encoder, safe=False)
+        response.media_type = media_type
+        return response.render()
+
+    def test_json(self):
+        response = self.render(formats.JSON, {"locations": self.locations})
+
+        self.assertEqual(response["Content-Type"], formats.JSON)
+        self.assertEqual(
+            json.loads(response.content),
+            {
+                "locations": [
+                    {"href": "/api/locations/1/", "name": "Hall A"},
+                    {"href": "/api/locations/2/", "name": "Hall B"},
+                ]
+            },
+        )
+
+    def test_columnar(self):
+        response = self.render(formats.COLUMNAR, {"locations": self.locations})
+
+        self.assertEqual(response["Content-Type"], formats.COLUMNAR)
+        self.assertEqual(
+            json.loads(response.content),
+            {
+                "locations": {
+                    "columns": ["href", "name"],
+                    "rows": [
+                        ["/api/locations/1/", "Hall A"],
+                        ["/api/locations/2/", "Hall B"],
+                    ],
+                }
+            },
+        )
+
+    def test_columnar_leaves_other_values_alone(self):
+        response = self.render(
+            formats.COLUMNAR, {"locations": [], "names": ["Hall A"]}
+        )
+
+        self.assertEqual(
+            json.loads(response.content),
+            {"locations": [], "names": ["Hall A"]},
+        )
+
+    def test_ndjson_sends_one_object_per_line(self):
+        response = self.render(formats.NDJSON, {"locations": self.locations})
+
+        self.assertEqual(response["Content-Type"], formats.NDJSON)
+        lines = response.content.decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [
+                {"href": "/api/locations/1/", "name": "Hall A"},
+                {"href": "/api/locations/2/", "name": "Hall B"},
+            ],
+        )
+        self.assertTrue(response.content.endswith(b"\n"))
+
+    def test_ndjson_sends_a_detail_as_one_line(self):
+        response = self.render(formats.NDJSON, self.locations[0])
+
+        self.assertEqual(
+            response.content,
+            b'{"href": "/api/locations/1/", "name": "Hall A"}\n',
+        )
+
+    def test_msgpack(self):
+        response = self.render(formats.MSGPACK, {"locations": self.locations})
+
+        self.assertEqual(response["Content-Type"], formats.MSGPACK)
+        self.assertEqual(
+            msgpack.unpackb(response.content),
+            {
+                "locations": [
+                    {"href": "/api/locations/1/", "name": "Hall A"},
+                    {"href": "/api/locations/2/", "name": "Hall B"},
+                ]
+            },
+        )
+
+    def test_every_format_has_the_json_fields(self):
+        expected = {
+            "href": "/api/conferences/7/",
+            "name": "PyCon",
+            "starts": "2026-05-01T09:00:00+00:00",
+            "ends": "2026-05-03T17:00:00+00:00",
+            "location": {"href": "/api/locations/1/", "name": "Hall A"},
+            "distance_miles": 12.3,
+        }
+        data = {"conferences": [self.conference]}
+
+        def rendered(media_type):
+            return self.render(
+                media_type, data, NearbyConferenceEncoder
+            ).content
+
+        self.assertEqual(
+            json.loads(rendered(formats.JSON)), {"conferences": [expected]}
+        )
+        columnar = json.loads(rendered(formats.COLUMNAR))["conferences"]
+        self.assertEqual(
+            [dict(zip(columnar["columns"], row)) for row in columnar["rows"]],
+            [expected],
+        )
+        self.assertEqual(json.loads(rendered(formats.NDJSON)), expected)
+        self.assertEqual(
+            msgpack.unpackb(rendered(formats.MSGPACK)),
+            {"conferences": [expected]},
+        )
@@ -0,0 +1,103 @@
+"""
+Metric samples written by several processes, some of which have
+exited, and the text /metrics renders from them. The processes are
+stood in for by sample files named after pids: this test's own, and
+pids of finished child processes.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, override_settings
+
+from common import metrics
+
+
+def _exited_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _write_samples(directory, pid, samples):
+    sample_file = metrics._SampleFile(directory / f"metrics_{pid}.db")
+    try:
+        for key, value in samples.items():
+            sample_file.add(key, value)
+    finally:
+        sample_file.close()
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(
+            METRICS_ENABLED=True, METRICS_DIR=self.directory
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # This process's file is opened again in the temporary directory
+        metrics._file = None
+        self.addCleanup(setattr, metrics, "_file", None)
+
+    def test_exited_processes_are_folded_into_one_file(self):
+        first, second = _exited_pid(), _exited_pid()
+        _write_samples(
+            self.directory,
+            first,
+            {"rate_limited_total": 2, 'rate_limited_total{route="a"}': 1},
+        )
+        _write_samples(self.directory, second, {"rate_limited_total": 3})
+        metrics.inc("rate_limited_total")
+
+        totals = metrics.collect()
+
+        self.assertEqual(totals["rate_limited_total"], 6)
+        self.assertEqual(totals['rate_limited_total{route="a"}'], 1)
+        self.assertEqual(
+            sorted(path.name for path in self.directory.glob("*.db")),
+            sorted([metrics.EXITED, f"metrics_{os.getpid()}.db"]),
+        )
+
+    def test_counts_survive_later_folds(self):
+        _write_samples(
+            self.directory, _exited_pid(), {"rate_limited_total": 2}
+        )
+        metrics.collect()
+        _write_samples(
+            self.directory, _exited_pid(), {"rate_limited_total": 5}
+        )
+        metrics.inc("rate_limited_total")
+
+        self.assertEqual(metrics.collect()["rate_limited_total"], 8)
+        # Scraping again without new exits adds nothing
+        self.assertEqual(metrics.collect()["rate_limited_total"], 8)
+
+    def test_running_processes_are_not_folded(self):
+        metrics.inc("rate_limited_total", amount=4)
+
+        metrics.collect()
+
+        self.assertFalse((self.directory / metrics.EXITED).exists())
+        self.assertTrue(
+            (self.directory / f"metrics_{os.getpid()}.db").exists()
+        )
+
+    def test_render_keeps_every_digit(self):
+        text = metrics.render(
+            {
+                "rate_limited_total": 1234567.0,
+                "http_request_duration_seconds_sum": 0.1 + 0.2,
+            }
+        )
+
+        self.assertIn("rate_limited_total 1234567.0\n", text)
+        self.assertIn(
+            "http_request_duration_seconds_sum 0.30000000000000004\n", text
+        )
+        self.assertIn("# TYPE http_request_duration_seconds histogram", text)
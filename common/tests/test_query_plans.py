@@ -0,0 +1,160 @@
+"""
+Runs EXPLAIN QUERY PLAN on every query the API's GET endpoints make
+and fails on a full table scan or a temporary sort. The admin's
+prefix searches must find their rows through an index; sorting the
+matches is fine.
+
+The stats rollups are built before the checks: building one
+aggregates the raw tables, which is expected to sort, and only
+happens once per conference. Snapshots are off so the list endpoints
+reach the database.
+"""
+
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.contrib import admin
+from django.db import connections
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+
+from attendees.models import Attendee, Badge
+from events import stats
+from events.models import Conference, Location, State
+from presentations.models import Presentation, Status
+
+# Plan details that mean a query sorts rows that an index should have
+# delivered in order
+BAD_PLAN_STEPS = ("USE TEMP B-TREE",)
+
+
+def _is_full_scan(detail):
+    # "SCAN events_location USING INDEX ..." walks an index in order and
+    # is fine for a full list; a bare "SCAN events_location" is not
+    return detail.startswith("SCAN ") and " USING " not in detail
+
+
+def _capture_queries(function):
+    queries = []
+
+    def make_wrapper(alias):
+        def wrapper(execute, sql, params, many, context):
+            queries.append((alias, sql, params))
+            return execute(sql, params, many, context)
+
+        return wrapper
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(
+                connection.execute_wrapper(make_wrapper(connection.alias))
+            )
+        function()
+    return queries
+
+
+def _query_plan(alias, sql, params):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        # Rows are (id, parent, notused, detail)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@override_settings(
+    SNAPSHOTS_ENABLED=False,
+    RATE_LIMIT_ENABLED=False,
+    DATABASE_REPLICAS=[],
+)
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(name="Illinois", abbreviation="IL")
+        submitted = Status.objects.get_or_create(name="SUBMITTED")[0]
+        starts = timezone.now()
+        for n in range(20):
+            location = Location.objects.create(
+                name=f"Hall {n}", city="Chicago", room_count=10, state=state
+            )
+            conference = Conference.objects.create(
+                name=f"Conference {n}",
+                description="",
+                starts=starts + timedelta(days=n),
+                ends=starts + timedelta(days=n + 1),
+                max_presentations=100,
+                max_attendees=1000,
+                location=location,
+            )
+            for m in range(5):
+                Attendee.objects.create(
+                    email=f"a{n}-{m}@example.com",
+                    name=f"Attendee {m}",
+                    conference=conference,
+                )
+                Presentation.objects.create(
+                    presenter_name=f"Presenter {m}",
+                    presenter_email=f"p{n}-{m}@example.com",
+                    title=f"Talk {m}",
+                    synopsis="",
+                    status=submitted,
+                    conference=conference,
+                )
+        cls.conference = Conference.objects.first()
+        for conference_id in Conference.objects.values_list("id", flat=True):
+            stats.rebuild(conference_id)
+
+    def assertGoodPlans(self, queries, is_bad):
+        failures = []
+        for alias, sql, params in queries:
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            for detail in _query_plan(alias, sql, params):
+                if is_bad(detail):
+                    failures.append(f"{sql}\n  -> {detail}")
+        self.assertFalse(failures, "\n".join(failures))
+
+    def test_api_endpoints(self):
+        conference_id = self.conference.id
+        urls = [
+            "/api/conferences/",
+            f"/api/conferences/{conference_id}/",
+            f"/api/conferences/{conference_id}/stats/",
+            "/api/locations/",
+            f"/api/locations/{self.conference.location_id}/",
+            f"/api/conferences/{conference_id}/attendees/",
+            f"/api/attendees/{Attendee.objects.first().id}/",
+            f"/api/conferences/{conference_id}/presentations/",
+            f"/api/presentations/{Presentation.objects.first().id}/",
+        ]
+        client = Client()
+        for url in urls:
+            with self.subTest(url=url):
+                queries = _capture_queries(lambda: client.get(url))
+                self.assertTrue(queries)
+                self.assertGoodPlans(
+                    queries,
+                    lambda detail: _is_full_scan(detail)
+                    or any(step in detail for step in BAD_PLAN_STEPS),
+                )
+
+    def test_admin_prefix_searches(self):
+        for model in [Location, Conference, Attendee, Badge, Presentation]:
+            model_admin = admin.site._registry[model]
+            with self.subTest(model=model.__name__):
+                queryset, _ = model_admin.get_search_results(
+                    None, model._default_manager.all(), "Con"
+                )
+                queries = _capture_queries(lambda: list(queryset))
+                # Walking a whole index is a full scan too
+                self.assertGoodPlans(
+                    queries, lambda detail: detail.startswith("SCAN ")
+                )
+
+    def test_admin_prefix_searches_ignore_case(self):
+        model_admin = admin.site._registry[Conference]
+        queryset, _ = model_admin.get_search_results(
+            None, Conference.objects.all(), "cONFERENCE 1"
+        )
+        self.assertEqual(
+            {conference.name for conference in queryset},
+            {"Conference 1", *(f"Conference {n}" for n in range(10, 20))},
+        )
@@ -0,0 +1,145 @@
+"""
+ReplicaRouter and ReplicaPinningMiddleware, with SQLite files standing
+in for the replicas. Nothing copies rows from the primary to them, so
+a replica is as stale as replica lag can make it: a read that reaches
+one right after a write would miss the write.
+"""
+
+import contextvars
+import tempfile
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, router
+from django.test import (
+    Client,
+    RequestFactory,
+    TransactionTestCase,
+    override_settings,
+)
+
+from common import routers
+from events import snapshots
+from events.models import Location, State
+
+REPLICAS = ["replica1", "replica2"]
+
+
+@override_settings(RATE_LIMIT_ENABLED=False, SNAPSHOTS_ENABLED=False)
+class ReplicaRouterTests(TransactionTestCase):
+    # The replicas are added once the test database is set up, so the
+    # test runner leaves them alone and they keep their own rows
+    databases = {"default"}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._directory = tempfile.TemporaryDirectory()
+        directory = Path(cls._directory.name)
+        for alias in REPLICAS:
+            connections.settings[alias] = {
+                **connections.settings["default"],
+                "NAME": str(directory / f"{alias}.sqlite3"),
+            }
+            call_command("migrate", database=alias, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in REPLICAS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls._directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        for alias in REPLICAS:
+            Location.all_objects.using(alias).all().delete()
+            State.objects.using(alias).all().delete()
+        # The same location everywhere, each copy named after its
+        # database so a response shows where it was read
+        for alias in ["default", *REPLICAS]:
+            State.objects.using(alias).create(
+                id=1, name="Illinois", abbreviation="IL"
+            )
+            Location.objects.using(alias).create(
+                id=1, name=alias, city="Chicago", room_count=10, state_id=1
+            )
+
+    def read_name(self, client):
+        response = client.get("/api/locations/1/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["name"]
+
+    @override_settings(DATABASE_REPLICAS=REPLICAS)
+    def test_reads_go_to_replicas(self):
+        names = {self.read_name(Client()) for _ in range(20)}
+        self.assertLessEqual(names, set(REPLICAS))
+
+    @override_settings(DATABASE_REPLICAS=REPLICAS)
+    def test_writes_go_to_primary(self):
+        self.assertEqual(router.db_for_write(Location), "default")
+
+    @override_settings(DATABASE_REPLICAS=REPLICAS)
+    def test_one_replica_per_request(self):
+        token = routers.use_replica(routers.choose_replica())
+        try:
+            aliases = {router.db_for_read(Location) for _ in range(50)}
+        finally:
+            routers.release_replica(token)
+        self.assertEqual(len(aliases), 1)
+
+    @override_settings(DATABASE_REPLICAS=REPLICAS)
+    def test_one_replica_outside_requests(self):
+        def read_aliases():
+            return {router.db_for_read(Location) for _ in range(50)}
+
+        self.assertEqual(len(contextvars.Context().run(read_aliases)), 1)
+
+    @override_settings(DATABASE_REPLICAS=REPLICAS)
+    def test_reads_after_write_see_the_write(self):
+        client = Client()
+        response = client.patch(
+            "/api/locations/1/",
+            {"name": "renamed"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        for _ in range(10):
+            self.assertEqual(self.read_name(client), "renamed")
+
+    @override_settings(DATABASE_REPLICAS=REPLICAS)
+    def test_reads_after_write_without_cookies(self):
+        client = Client()
+        client.patch(
+            "/api/locations/1/",
+            {"name": "renamed"},
+            content_type="application/json",
+        )
+        for _ in range(10):
+            client.cookies.clear()
+            self.assertEqual(self.read_name(client), "renamed")
+        # Other clients still read from the replicas
+        other = Client(REMOTE_ADDR="10.0.0.2")
+        self.assertIn(self.read_name(other), REPLICAS)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        self.assertEqual(router.db_for_read(Location), "default")
+        self.assertEqual(self.read_name(Client()), "default")
+
+    @override_settings(DATABASE_REPLICAS=REPLICAS, SNAPSHOTS_ENABLED=True)
+    def test_snapshots_are_built_from_primary(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(SNAPSHOT_DIR=directory):
+                # As on the rebuild timer's thread, outside any request
+                contextvars.Context().run(snapshots.build, "locations")
+                response = snapshots.serve(
+                    RequestFactory().get("/api/locations/"), "locations"
+                )
+                body = b"".join(response.streaming_content)
+                response.close()
+        self.assertIn(b'"name": "default"', body)
+        self.assertNotIn("Content-Disposition", response)
@@ -0,0 +1,224 @@
+"""
+Partial updates for the API's PATCH requests.
+
+A PATCH body names only the fields to change. They are checked
+against the model's api_writable_fields and cleaned like a form
+field, then written with a single UPDATE of just those columns (and
+the auto_now "updated" timestamp). On PostgreSQL and SQLite 3.35+ the
+UPDATE returns the whole row, so the response needs no SELECT. Other
+databases read the row back in the same transaction.
+
+Every response carries the row's "updated" time as its ETag. A PATCH
+with If-Match only applies if the row is unchanged since the client
+read it; the check is part of the UPDATE's WHERE clause, so two
+concurrent edits can't both succeed. Without If-Match the write goes
+through, but only overwrites the fields it names.
+
+pre_save and post_save are sent with update_fields set, so signal
+handlers run as they would for save(update_fields=...). The row is not
+read before the UPDATE, so pre_save's instance has the pk and the new
+values of the fields being written; its other fields hold their
+defaults, not the stored values. post_save's instance is the whole
+updated row.
+"""
+
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models import sql
+from django.db.models.signals import post_save, pre_save
+from django.utils import timezone
+
+from .formats import ApiResponse
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class PatchError(Exception):
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.details = details
+
+    def response(self):
+        return ApiResponse(
+            {"message": self.message, **self.details}, status=self.status
+        )
+
+
+def etag(instance):
+    return f'"{(instance.updated - _EPOCH) // _MICROSECOND}"'
+
+
+def _if_match(request):
+    # None without the header, "*" for any version, else the
+    # "updated" times of the versions the client will accept
+    header = request.headers.get("If-Match")
+    if header is None:
+        return None
+    if header.strip() == "*":
+        return "*"
+    versions = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        # Weak tags never match If-Match
+        if not (tag.startswith('"') and tag.endswith('"')):
+            continue
+        try:
+            versions.append(_EPOCH + int(tag[1:-1]) * _MICROSECOND)
+        except (ValueError, OverflowError):
+            continue
+    return versions
+
+
+def check_writable(model, content):
+    """Raises PatchError if the request body has keys clients can't set."""
+    invalid = sorted(set(content) - model.api_writable_fields)
+    if invalid:
+        raise PatchError("Fields can't be changed", fields=invalid)
+
+
+def with_etag(response, instance):
+    response["ETag"] = etag(instance)
+    return response
+
+
+def read_body(request, model):
+    """
+    Returns the request's JSON object after checking its keys against
+    the model's writable fields. Raises PatchError.
+    """
+    try:
+        content = json.loads(request.body)
+    except ValueError:
+        raise PatchError("Invalid JSON")
+    if not isinstance(content, dict):
+        raise PatchError("Expected a JSON object")
+    check_writable(model, content)
+    return content
+
+
+def _clean(model, values):
+    errors = {}
+    cleaned = {}
+    for name, value in values.items():
+        field = model._meta.get_field(name)
+        if field.is_relation:
+            # Looked up by the view
+            cleaned[name] = value
+            continue
+        try:
+            cleaned[name] = field.clean(value, None)
+        except ValidationError as error:
+            errors[name] = error.messages
+    if errors:
+        raise PatchError("Invalid values", errors=errors)
+    for field in model._meta.concrete_fields:
+        if getattr(field, "auto_now", False):
+            cleaned[field.name] = timezone.now()
+    return cleaned
+
+
+def _returns_updated_rows(connection):
+    # MariaDB returns rows from INSERT and DELETE, but not UPDATE
+    return (
+        connection.vendor in ("postgresql", "sqlite")
+        and connection.features.can_return_columns_from_insert
+    )
+
+
+def _update(queryset, values, db, pk):
+    # Runs the UPDATE and returns the new row's values, in concrete
+    # field order, or None when no row matched
+    model = queryset.model
+    fields = model._meta.concrete_fields
+    connection = connections[db]
+    if not _returns_updated_rows(connection):
+        with transaction.atomic(using=db):
+            if not queryset.update(**values):
+                return None
+            return (
+                model._base_manager.using(db)
+                .values_list(*[field.attname for field in fields])
+                .get(pk=pk)
+            )
+
+    query = queryset.query.chain(sql.UpdateQuery)
+    query.add_update_values(values)
+    query.annotations = {}
+    update_sql, params = query.get_compiler(db).as_sql()
+    columns = ", ".join(
+        connection.ops.quote_name(field.column) for field in fields
+    )
+    with transaction.mark_for_rollback_on_error(using=db):
+        with connection.cursor() as cursor:
+            cursor.execute(f"{update_sql} RETURNING {columns}", params)
+            row = cursor.fetchone()
+    if row is None:
+        return None
+    # The same conversions a SELECT of these columns would get
+    compiler = queryset.query.get_compiler(db)
+    converters = compiler.get_converters(
+        [field.get_col(model._meta.db_table) for field in fields]
+    )
+    if converters:
+        row = next(compiler.apply_converters([row], converters))
+    return row
+
+
+def patch(request, model, pk, values):
+    """
+    Writes the changed fields of one row and returns the updated
+    instance. values maps field names to request values, with any
+    relations already looked up. Raises PatchError.
+    """
+    if not values:
+        raise PatchError("Nothing to update")
+    versions = _if_match(request)
+    if versions is None and settings.PATCH_REQUIRE_IF_MATCH:
+        raise PatchError("If-Match is required", status=428)
+    if versions == []:
+        raise PatchError("The resource has changed", status=412)
+    values = _clean(model, values)
+
+    db = router.db_for_write(model)
+    queryset = model.objects.using(db).filter(pk=pk)
+    if versions != "*" and versions is not None:
+        queryset = queryset.filter(updated__in=versions)
+
+    # The incoming values, as save() would have them; see the module
+    # docstring for the rest of the fields
+    instance = model(pk=pk, **values)
+    instance._state.adding = False
+    instance._state.db = db
+    update_fields = frozenset(values)
+    pre_save.send(
+        sender=model,
+        instance=instance,
+        raw=False,
+        using=db,
+        update_fields=update_fields,
+    )
+    row = _update(queryset, values, db, pk)
+    if row is None:
+        if model.objects.using(db).filter(pk=pk).exists():
+            raise PatchError("The resource has changed", status=412)
+        raise PatchError(
+            f"{model._meta.verbose_name.capitalize()} not found", status=404
+        )
+    for field, value in zip(model._meta.concrete_fields, row):
+        setattr(instance, field.attname, value)
+    post_save.send(
+        sender=model,
+        instance=instance,
+        created=False,
+        update_fields=update_fields,
+        raw=False,
+        using=db,
+    )
+    return instance
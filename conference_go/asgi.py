@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conference_go.settings")
 
 application = get_asgi_application()
+
+# Imported after the application so Django is set up
+from conference_go.warmup import install  # noqa: E402
+
+install()
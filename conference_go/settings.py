@@ -39,6 +39,7 @@ AUTH_USER_MODEL = "accounts.User"
 
 INSTALLED_APPS = [
     "accounts.apps.AccountsConfig",
+    "common.apps.CommonConfig",
     "attendees.apps.AttendeesConfig",
     "events.apps.EventsConfig",
     "presentations.apps.PresentationsConfig",
@@ -51,12 +52,21 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "common.middleware.AccessLogMiddleware",
+    "common.middleware.PrometheusMetricsMiddleware",
+    "common.middleware.ServerTimingMiddleware",
+    "common.middleware.SlowQueryLogMiddleware",
+    "common.middleware.MemoryAccountingMiddleware",
+    "common.middleware.RateLimitMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "common.middleware.ReplicaPinningMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "common.middleware.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "common.middleware.ContentNegotiationMiddleware",
 ]
 
 ROOT_URLCONF = "conference_go.urls"
@@ -78,6 +88,15 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "conference_go.wsgi.application"
+ASGI_APPLICATION = "conference_go.asgi.application"
+
+# Serve the API read endpoints with the async views and the async ORM.
+# Only worth turning on when running under an ASGI server.
+ASYNC_API_VIEWS = False
+
+# Warm each worker up (URL resolver, imports, database connection,
+# value caches) before it takes traffic. See conference_go.warmup.
+WARMUP_ENABLED = True
 
 
 # Database
@@ -87,9 +106,216 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Keep connections open between requests (see conference_go.warmup)
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Read replicas of "default". Add an entry to DATABASES for each one
+# (with "TEST": {"MIRROR": "default"}) and list its alias here, e.g.
+#
+#     DATABASES["replica1"] = {
+#         "ENGINE": "django.db.backends.sqlite3",
+#         "NAME": BASE_DIR / "replica1.sqlite3",
+#         "TEST": {"MIRROR": "default"},
+#     }
+#     DATABASE_REPLICAS = ["replica1"]
+DATABASE_REPLICAS = []
+
+DATABASE_ROUTERS = ["common.routers.ReplicaRouter"]
+
+# How long a client keeps reading from the primary after a write.
+# Clients without cookies are recognized by address through the
+# default cache, which must be shared by every worker (e.g. Redis or
+# memcached) once replicas are in use.
+REPLICA_PIN_SECONDS = 15
+
+
+# Per-request query and timing instrumentation (Server-Timing header,
+# and a JSON log line per request when the common.middleware logger is
+# at DEBUG)
+
+SERVER_TIMING_ENABLED = True
+
+# A query that runs this many times in one request is logged as an
+# N+1 suspect
+SERVER_TIMING_REPEATED_QUERY_THRESHOLD = 10
+
+# Per-request memory accounting with tracemalloc. Slows every request
+# down, so only turn it on while chasing memory problems.
+MEMORY_ACCOUNTING_ENABLED = False
+
+# Requests whose peak allocation reaches this many bytes are logged
+# with their top allocation sites
+MEMORY_ACCOUNTING_THRESHOLD = 50 * 1024 * 1024
+MEMORY_ACCOUNTING_TOP_SITES = 10
+
+
+# Prometheus metrics, served at /metrics. Each worker process writes
+# its samples to files in METRICS_DIR; empty it when the server starts.
+
+METRICS_ENABLED = True
+METRICS_DIR = BASE_DIR / "metrics"
+
+
+# Slow query log, listed in the admin. Queries slower than the
+# threshold are saved with their EXPLAIN output by a background thread;
+# only the newest SLOW_QUERY_LOG_MAX_ENTRIES are kept. Requests that
+# find SLOW_QUERY_LOG_QUEUE_SIZE others waiting to be saved are dropped.
+
+SLOW_QUERY_LOG_ENABLED = True
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG_MAX_ENTRIES = 1000
+SLOW_QUERY_LOG_QUEUE_SIZE = 1000
+
+
+# JSON access log for /api/ requests, written by a background thread.
+# Records are dropped (and counted) when the queue is full.
+
+ACCESS_LOG_ENABLED = True
+ACCESS_LOG_FILE = None  # None logs to stderr
+ACCESS_LOG_QUEUE_SIZE = 10000
+
+
+# Live conference activity over Server-Sent Events (see events.live).
+# A dashboard whose queue fills up is disconnected and reconnects.
+
+LIVE_HEARTBEAT_SECONDS = 15
+LIVE_QUEUE_SIZE = 100
+
+
+# Change feed at /api/changes/ (see common.changes): model -> the
+# encoder its rows are sent with.
+
+CHANGE_FEED_MODELS = {
+    "events.Location": "events.api_views.LocationDetailEncoder",
+    "events.Conference": "events.api_views.ConferenceDetailEncoder",
+    "attendees.Attendee": "attendees.api_views.AttendeeDetailEncoder",
+    "attendees.Badge": "attendees.api_views.BadgeEncoder",
+    "presentations.Presentation": (
+        "presentations.api_views.PresentationDetailEncoder"
+    ),
+}
+CHANGE_FEED_PAGE_SIZE = 1000
+
+
+# Seconds each process keeps its room availability index (see
+# events.availability) before rebuilding it to pick up changes made
+# by other processes. Its own changes show up at once.
+
+AVAILABILITY_INDEX_MAX_AGE = 60
+
+
+# Precompressed snapshots of the location and conference lists (see
+# events.snapshots), rebuilt SNAPSHOT_DEBOUNCE_SECONDS after the
+# first change to a listed model. Brotli files are only written when
+# the brotli package is installed.
+
+SNAPSHOTS_ENABLED = True
+SNAPSHOT_DIR = BASE_DIR / "snapshots"
+SNAPSHOT_DEBOUNCE_SECONDS = 2
+
+
+# Let clients ask for the API's compact formats (columnar JSON, NDJSON
+# and MessagePack) with the Accept header; see common.formats.
+
+CONTENT_NEGOTIATION_ENABLED = True
+
+
+# PATCH requests write only the fields they name (see
+# common.updates). With PATCH_REQUIRE_IF_MATCH a PATCH must also send
+# the ETag it last read, so no edit can overwrite one it hasn't seen.
+
+PATCH_REQUIRE_IF_MATCH = False
+
+
+# Most GET requests one POST to /api/batch/ may carry (see
+# common.batch).
+
+BATCH_MAX_REQUESTS = 20
+
+
+# Deleted locations and conferences are hidden at once and purged in
+# a background thread (see events.purge), PURGE_BATCH_SIZE rows per
+# transaction with a pause between transactions for other writers.
+# Without the thread, run the purge_deleted command from cron.
+
+PURGE_IN_BACKGROUND = True
+PURGE_BATCH_SIZE = 1000
+PURGE_BATCH_PAUSE_SECONDS = 0.05
+
+
+# Locations created or moved through the API without coordinates are
+# geocoded in a background thread (see events.geocoding). Without the
+# thread, run the geocode_locations command from cron.
+
+GEOCODE_IN_BACKGROUND = True
+
+
+# Write-behind registrations for ticket drops (see attendees.journal).
+# Registration POSTs are journaled to REGISTRATION_JOURNAL_DIR and
+# answered with 202 and a provisional id; a flusher thread writes them
+# to the database in batches of REGISTRATION_FLUSH_BATCH_SIZE every
+# REGISTRATION_FLUSH_INTERVAL_SECONDS and enforces max_attendees.
+# Every worker must share the directory, so keep it on local disk.
+
+REGISTRATION_WRITE_BEHIND = False
+REGISTRATION_JOURNAL_DIR = BASE_DIR / "journal"
+REGISTRATION_JOURNAL_FSYNC = True
+REGISTRATION_FLUSH_BATCH_SIZE = 500
+REGISTRATION_FLUSH_INTERVAL_SECONDS = 0.1
+
+
+# Token bucket rate limits per client and URL name, shared by every
+# worker on the host through RATE_LIMIT_FILE. Each limit refills
+# "rate" tokens a second up to "burst"; URL names not in RATE_LIMITS
+# get RATE_LIMIT_DEFAULT (None for no limit). Requests to paths that
+# start with one of RATE_LIMIT_EXEMPT_PATHS are never limited: staff
+# clicking through the admin and Prometheus scraping /metrics would
+# otherwise share the API's default budget. Clients are told apart
+# by REMOTE_ADDR, or by RATE_LIMIT_CLIENT_HEADER when behind a proxy
+# that sets it (e.g. "HTTP_X_FORWARDED_FOR").
+
+RATE_LIMIT_ENABLED = True
+RATE_LIMITS = {
+    "api_list_conferences": {"rate": 5, "burst": 20},
+    "api_list_locations": {"rate": 5, "burst": 20},
+}
+RATE_LIMIT_DEFAULT = {"rate": 20, "burst": 100}
+RATE_LIMIT_EXEMPT_PATHS = ("/admin/", "/metrics")
+RATE_LIMIT_CLIENT_HEADER = None
+RATE_LIMIT_FILE = BASE_DIR / "ratelimit.bin"
+RATE_LIMIT_SLOTS = 65536
+
+
+# Sampling profiler for single requests. Staff users can ask for a
+# profile with an X-Profile header or ?profile=1; PROFILER_SAMPLE_RATE
+# profiles that fraction of all requests as well.
+
+PROFILER_ENABLED = True
+PROFILER_SAMPLE_RATE = 0.0
+PROFILER_INTERVAL = 0.001  # seconds between stack samples
+PROFILER_DIR = BASE_DIR / "profiles"
+PROFILER_MAX_FILES = 200
+
+
+# Logging
+# https://docs.djangoproject.com/en/4.0/topics/logging/
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "common": {"handlers": ["console"], "level": "INFO"},
+        "conference_go": {"handlers": ["console"], "level": "INFO"},
+        "events": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
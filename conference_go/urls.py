@@ -13,11 +13,27 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+
 from django.contrib import admin
 from django.urls import path, include
 
+from common import batch, changes, metrics, profiling
+
 urlpatterns = [
+    path(
+        "admin/profiles/",
+        admin.site.admin_view(profiling.profile_list),
+        name="profile_list",
+    ),
+    path(
+        "admin/profiles/<str:name>",
+        admin.site.admin_view(profiling.profile_detail),
+        name="profile_detail",
+    ),
     path("admin/", admin.site.urls),
+    path("metrics", metrics.metrics_view, name="metrics"),
+    path("api/changes/", changes.changes_view, name="api_changes"),
+    path("api/batch/", batch.batch_view, name="api_batch"),
     path("api/", include("attendees.api_urls")),
     path("api/", include("events.api_urls")),
     path("api/", include("presentations.api_urls")),
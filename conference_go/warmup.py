@@ -0,0 +1,165 @@
+"""
+Per-worker warmup, run from wsgi.py and asgi.py before the worker
+takes traffic.
+
+It builds the URL resolver, imports the view modules, opens the
+database connections (kept open by CONN_MAX_AGE), loads the State
+and Status caches and resumes flushing any journaled registrations.
+That leaves the first real request as fast as later ones. The time
+each step took, and the latency of the first request, are logged.
+
+Every step is best-effort: one that fails (say, on a database that is
+not migrated yet) is logged and the rest still run, and the worker
+serves requests as it would without warmup. Management commands that
+load the application, such as runserver, skip the warmup.
+"""
+
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.urls import get_resolver, reverse
+
+logger = logging.getLogger(__name__)
+
+VIEW_MODULES = [
+    "events.api_views",
+    "attendees.api_views",
+    "presentations.api_views",
+    "common.metrics",
+    "common.profiling",
+    "common.slow_queries",
+]
+
+# Reset in each forked worker
+_process_started = time.perf_counter()
+_first_request = {}
+
+
+def _populate_urls():
+    get_resolver().urlconf_module
+    # Reversing compiles every route's regular expression
+    reverse("api_show_conference", kwargs={"id": 1})
+    reverse("api_list_attendees", kwargs={"conference_id": 1})
+
+
+def _import_views():
+    for name in VIEW_MODULES:
+        importlib.import_module(name)
+
+
+def _connect():
+    for alias in ["default", *settings.DATABASE_REPLICAS]:
+        connections[alias].ensure_connection()
+
+
+def _load_caches():
+    from events.models import State
+    from presentations.models import Status
+
+    State.load_cache()
+    Status.load_cache()
+
+
+def _resume_registrations():
+    # Picks up registrations journaled before a crash or restart
+    if settings.REGISTRATION_WRITE_BEHIND:
+        from attendees import journal
+
+        journal.schedule()
+
+
+STEPS = [
+    ("urls", _populate_urls),
+    ("views", _import_views),
+    ("database", _connect),
+    ("caches", _load_caches),
+    ("registrations", _resume_registrations),
+]
+
+
+def _on_first_request_started(sender, **kwargs):
+    request_started.disconnect(_on_first_request_started)
+    _first_request["started"] = time.perf_counter()
+
+
+def _on_first_request_finished(sender, **kwargs):
+    request_finished.disconnect(_on_first_request_finished)
+    finished = time.perf_counter()
+    started = _first_request.get("started", finished)
+    logger.info(
+        json.dumps(
+            {
+                "event": "first_request",
+                "pid": os.getpid(),
+                "latency_ms": round((finished - started) * 1000, 2),
+                "since_start_ms": round(
+                    (finished - _process_started) * 1000, 2
+                ),
+            }
+        )
+    )
+
+
+def _after_fork():
+    global _process_started
+    _process_started = time.perf_counter()
+    # Connections opened before a fork must not be shared with the
+    # parent; start over in the child
+    for connection in connections.all(initialized_only=True):
+        connection.connection = None
+    try:
+        warm_up()
+    except Exception:
+        # An exception here would be printed by the interpreter and
+        # otherwise ignored; log it like a failed step instead
+        logger.exception("Warmup failed in a forked worker")
+
+
+def warm_up():
+    """Runs every warmup step once in this process and logs timings."""
+    if not settings.WARMUP_ENABLED:
+        return
+    timings = {}
+    failed = []
+    started = time.perf_counter()
+    for name, step in STEPS:
+        step_started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception("Warmup step %s failed", name)
+            failed.append(name)
+        timings[f"{name}_ms"] = round(
+            (time.perf_counter() - step_started) * 1000, 2
+        )
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    if failed:
+        timings["failed"] = failed
+
+    request_started.connect(_on_first_request_started)
+    request_finished.connect(_on_first_request_finished)
+    logger.info(json.dumps({"event": "warmup", "pid": os.getpid(), **timings}))
+
+
+def _in_management_command():
+    return os.path.basename(sys.argv[0]) in ("manage.py", "django-admin")
+
+
+def install():
+    """
+    Warms up this process now and any worker forked from it later
+    (for servers that load the application before forking). Does
+    nothing inside a management command.
+    """
+    if _in_management_command():
+        return
+    warm_up()
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_after_fork)
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conference_go.settings")
 
 application = get_wsgi_application()
+
+# Imported after the application so Django is set up
+from conference_go.warmup import install  # noqa: E402
+
+install()
@@ -1,11 +1,16 @@
 from django.contrib import admin
 
-from .models import Conference, Location, State
+from common.admin_tools import EstimatedCountPaginator, PrefixSearchMixin
+
+from .models import Conference, ConferenceStats, Location, State
 
 
 @admin.register(Location)
-class LocationAdmin(admin.ModelAdmin):
-    pass
+class LocationAdmin(PrefixSearchMixin, admin.ModelAdmin):
+    list_display = ("name", "city", "state", "room_count")
+    list_filter = ("state",)
+    list_select_related = ("state",)
+    search_fields = ("^name", "^city")
 
 
 @admin.register(State)
@@ -14,5 +19,20 @@ class StateAdmin(admin.ModelAdmin):
 
 
 @admin.register(Conference)
-class ConferenceAdmin(admin.ModelAdmin):
-    pass
+class ConferenceAdmin(PrefixSearchMixin, admin.ModelAdmin):
+    list_display = ("name", "starts", "ends", "location")
+    list_filter = ("starts",)
+    list_select_related = ("location",)
+    autocomplete_fields = ("location",)
+    search_fields = ("^name",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(ConferenceStats)
+class ConferenceStatsAdmin(admin.ModelAdmin):
+    list_display = ("conference", "attendee_count", "presentation_count")
+    list_select_related = ("conference",)
+    raw_id_fields = ("conference",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
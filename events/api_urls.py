@@ -1,20 +1,55 @@
+from django.conf import settings
 from django.urls import path
 
 from .api_views import (
+    api_available_locations,
+    api_conference_live,
     api_list_conferences,
+    api_list_conferences_async,
     api_list_locations,
+    api_list_locations_async,
+    api_nearby_conferences,
     api_show_conference,
+    api_show_conference_async,
+    api_show_conference_stats,
     api_show_location,
+    api_show_location_async,
 )
 
+if settings.ASYNC_API_VIEWS:
+    api_list_conferences = api_list_conferences_async
+    api_show_conference = api_show_conference_async
+    api_list_locations = api_list_locations_async
+    api_show_location = api_show_location_async
+
 
 urlpatterns = [
     path("conferences/", api_list_conferences, name="api_list_conferences"),
+    path(
+        "conferences/nearby/",
+        api_nearby_conferences,
+        name="api_nearby_conferences",
+    ),
     path(
         "conferences/<int:id>/",
         api_show_conference,
         name="api_show_conference",
     ),
+    path(
+        "conferences/<int:id>/stats/",
+        api_show_conference_stats,
+        name="api_show_conference_stats",
+    ),
+    path(
+        "conferences/<int:id>/live/",
+        api_conference_live,
+        name="api_conference_live",
+    ),
     path("locations/", api_list_locations, name="api_list_locations"),
+    path(
+        "locations/available/",
+        api_available_locations,
+        name="api_available_locations",
+    ),
     path("locations/<int:id>/", api_show_location, name="api_show_location"),
 ]
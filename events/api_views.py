@@ -1,9 +1,18 @@
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 
-from .models import Conference, Location, State
+from .models import Conference, ConferenceStats, Location, State
+from . import availability, geo, geocoding, live, purge, snapshots, stats
 
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.http import require_http_methods
 import json
+from datetime import datetime, time
+from asgiref.sync import sync_to_async
+from common import batch, updates
+from common.formats import ApiResponse
 from common.json import ModelEncoder
 
 
@@ -20,24 +29,40 @@ class LocationDetailEncoder(ModelEncoder):
         "room_count",
         "created",
         "updated",
+        "latitude",
+        "longitude",
         "state",  # This is a reference to a State object
     ]
 
     def default(self, o):
         # Override the default method to handle State objects specifically
         if isinstance(o, State):
-            return {
-                "name": o.name, 
-                "abbreviation": o.abbreviation
-            }
+            return {"name": o.name, "abbreviation": o.abbreviation}
         return super(LocationDetailEncoder, self).default(o)
-    
+
+
+class LocationAvailabilityEncoder(ModelEncoder):
+    model = Location
+    properties = ["name", "room_count"]
+
+    def get_extra_data(self, o):
+        return {"rooms_available": o.rooms_available}
+
 
 class ConferenceListEncoder(ModelEncoder):
     model = Conference
     properties = ["name"]
 
 
+class NearbyConferenceEncoder(ModelEncoder):
+    model = Conference
+    properties = ["name", "starts", "ends", "location"]
+    encoders = {"location": LocationListEncoder}
+
+    def get_extra_data(self, o):
+        return {"distance_miles": round(o.distance_miles, 1)}
+
+
 class ConferenceDetailEncoder(ModelEncoder):
     model = Conference
     properties = [
@@ -55,6 +80,38 @@ class ConferenceDetailEncoder(ModelEncoder):
         "location": LocationListEncoder,  # Refer to the class, not an instance
     }
 
+
+class ConferenceStatsEncoder(ModelEncoder):
+    model = ConferenceStats
+    properties = [
+        "attendee_count",
+        "presentation_count",
+        "registrations_by_day",
+        "presentations_by_status",
+        "updated",
+    ]
+
+    def get_extra_data(self, o):
+        conference = o.conference
+        return {
+            "conference": {
+                "name": conference.name,
+                "href": conference.get_api_url(),
+            },
+            "capacity": {
+                "max_attendees": conference.max_attendees,
+                "max_presentations": conference.max_presentations,
+                "attendees": stats.utilization(
+                    o.attendee_count, conference.max_attendees
+                ),
+                "presentations": stats.utilization(
+                    o.presentation_count, conference.max_presentations
+                ),
+            },
+            "top_companies": stats.top_companies(o),
+        }
+
+
 # def api_list_locations(request):
 #     """
 #     Lists the location names and the link to the location.
@@ -76,12 +133,16 @@ class ConferenceDetailEncoder(ModelEncoder):
 #     """
 #     return JsonResponse({})
 
+
 @require_http_methods(["GET", "POST", "PUT", "DELETE"])
 def api_list_locations(request, id=None):
     if request.method == "GET":
+        snapshot = snapshots.serve(request, "locations")
+        if snapshot is not None:
+            return snapshot
         # List all locations
         locations = Location.objects.all()
-        return JsonResponse(
+        return ApiResponse(
             {"locations": locations},
             encoder=LocationListEncoder,
             safe=False,
@@ -92,15 +153,17 @@ def api_list_locations(request, id=None):
         content = json.loads(request.body)
         try:
             # Convert state abbreviation to State object
-            state = State.objects.get(abbreviation=content["state"])
+            state = State.get_by_abbreviation(content["state"])
             content["state"] = state
         except State.DoesNotExist:
-            return JsonResponse(
+            return ApiResponse(
                 {"message": "Invalid state abbreviation"},
                 status=400,
             )
         location = Location.objects.create(**content)
-        return JsonResponse(
+        if geocoding.needs_geocoding(content, created=True):
+            geocoding.schedule(location.id)
+        return ApiResponse(
             location,
             encoder=LocationDetailEncoder,
             safe=False,
@@ -109,20 +172,26 @@ def api_list_locations(request, id=None):
     elif request.method == "PUT":
         # Update an existing location
         if id is None:
-            return JsonResponse({"message": "Missing location ID"}, status=400)
+            return ApiResponse({"message": "Missing location ID"}, status=400)
         content = json.loads(request.body)
+        try:
+            updates.check_writable(Location, content)
+        except updates.PatchError as e:
+            return e.response()
         try:
             if "state" in content:
-                state = State.objects.get(abbreviation=content["state"])
+                state = State.get_by_abbreviation(content["state"])
                 content["state"] = state
         except State.DoesNotExist:
-            return JsonResponse(
+            return ApiResponse(
                 {"message": "Invalid state abbreviation"},
                 status=400,
             )
         Location.objects.filter(id=id).update(**content)
+        if geocoding.needs_geocoding(content):
+            geocoding.schedule(id)
         location = Location.objects.get(id=id)
-        return JsonResponse(
+        return ApiResponse(
             location,
             encoder=LocationDetailEncoder,
             safe=False,
@@ -131,19 +200,19 @@ def api_list_locations(request, id=None):
     elif request.method == "DELETE":
         # Delete a location
         if id is None:
-            return JsonResponse({"message": "Missing location ID"}, status=400)
-        count, _ = Location.objects.filter(id=id).delete()
-        return JsonResponse({"deleted": count > 0})
+            return ApiResponse({"message": "Missing location ID"}, status=400)
+        # Hidden now, purged in the background
+        deleted = purge.soft_delete_location(id)
+        return ApiResponse({"deleted": deleted})
 
     else:
         # HTTP method not allowed
-        return JsonResponse(
+        return ApiResponse(
             {"message": "Method not allowed"},
             status=405,
         )
 
 
-
 # def api_show_location(request, id):
 #     """
 #     Returns the details for the Location model specified
@@ -164,43 +233,92 @@ def api_list_locations(request, id=None):
 #     return JsonResponse({})
 
 
-@require_http_methods(["GET", "PUT", "DELETE"])
+def _patch_location(request, id):
+    try:
+        content = updates.read_body(request, Location)
+        if "state" in content:
+            try:
+                content["state"] = State.get_by_abbreviation(content["state"])
+            except State.DoesNotExist:
+                raise updates.PatchError("Invalid state abbreviation")
+        if ("latitude" in content) != ("longitude" in content):
+            raise updates.PatchError(
+                "Latitude and longitude must be changed together"
+            )
+        if "latitude" in content:
+            try:
+                content["geohash"] = Location.geohash_for(
+                    *(
+                        None if content[name] is None else float(content[name])
+                        for name in ("latitude", "longitude")
+                    )
+                )
+            except (TypeError, ValueError):
+                raise updates.PatchError("Invalid coordinates")
+        location = updates.patch(request, Location, id, content)
+    except updates.PatchError as e:
+        return e.response()
+    if geocoding.needs_geocoding(content):
+        geocoding.schedule(location.id)
+    return updates.with_etag(
+        ApiResponse(location, encoder=LocationDetailEncoder, safe=False),
+        location,
+    )
+
+
+@batch.shared_lookup(Location, "id", select_related=["state"])
+@require_http_methods(["GET", "PUT", "PATCH", "DELETE"])
 def api_show_location(request, id):
+    if request.method == "PATCH":
+        # One UPDATE, without loading the location first
+        return _patch_location(request, id)
+
     # Try to get the location, or return a 404 if not found
     try:
-        location = Location.objects.get(id=id)
+        location = batch.get_object(Location, id=id)
     except Location.DoesNotExist:
-        return JsonResponse({"message": "Location not found"}, status=404)
+        return ApiResponse({"message": "Location not found"}, status=404)
 
     if request.method == "GET":
         # Return the location details
-        return JsonResponse(location, encoder=LocationDetailEncoder, safe=False)
+        return updates.with_etag(
+            ApiResponse(location, encoder=LocationDetailEncoder, safe=False),
+            location,
+        )
 
     elif request.method == "PUT":
         # Update the location
         content = json.loads(request.body)
+        try:
+            updates.check_writable(Location, content)
+        except updates.PatchError as e:
+            return e.response()
         try:
             # Handle state conversion if included
             if "state" in content:
-                state = State.objects.get(abbreviation=content["state"])
+                state = State.get_by_abbreviation(content["state"])
                 content["state"] = state
         except State.DoesNotExist:
-            return JsonResponse({"message": "Invalid state abbreviation"}, status=400)
+            return ApiResponse(
+                {"message": "Invalid state abbreviation"}, status=400
+            )
 
         for key, value in content.items():
             setattr(location, key, value)
         location.save()
-        return JsonResponse(location, encoder=LocationDetailEncoder, safe=False)
+        if geocoding.needs_geocoding(content):
+            geocoding.schedule(location.id)
+        return ApiResponse(location, encoder=LocationDetailEncoder, safe=False)
 
     elif request.method == "DELETE":
-        # Delete the location
-        location.delete()
-        return JsonResponse({"deleted": True})
+        # Hide the location; it is purged in the background
+        purge.soft_delete_location(location.id)
+        return ApiResponse({"deleted": True})
 
     else:
         # HTTP method not allowed
-        return JsonResponse({"message": "Method not allowed"}, status=405)
-    
+        return ApiResponse({"message": "Method not allowed"}, status=405)
+
 
 # def api_list_conferences(request):
 #     """
@@ -221,12 +339,16 @@ def api_show_location(request, id):
 #         ]
 #     }
 #     """
-    
+
+
 @require_http_methods(["GET", "POST"])
 def api_list_conferences(request):
     if request.method == "GET":
+        snapshot = snapshots.serve(request, "conferences")
+        if snapshot is not None:
+            return snapshot
         conferences = Conference.objects.all()
-        return JsonResponse(
+        return ApiResponse(
             {"conferences": conferences},
             encoder=ConferenceListEncoder,
             safe=False,
@@ -237,19 +359,24 @@ def api_list_conferences(request):
             location = Location.objects.get(id=content["location"])
             content["location"] = location
         except Location.DoesNotExist:
-            return JsonResponse(
+            return ApiResponse(
                 {"message": "Invalid location id"},
                 status=400,
             )
 
-        conference = Conference.objects.create(**content)
-        return JsonResponse(
+        try:
+            with transaction.atomic():
+                conference = Conference.objects.create(**content)
+                availability.check_booking(conference)
+        except availability.Overbooked as e:
+            return _overbooked_response(e)
+        except availability.InvalidPeriod:
+            return _invalid_period_response()
+        return ApiResponse(
             conference,
             encoder=ConferenceDetailEncoder,
             safe=False,
         )
-    
-
 
 
 # def api_show_conference(request, id):
@@ -279,36 +406,376 @@ def api_list_conferences(request):
 #     """
 
 
-@require_http_methods(["GET", "PUT", "DELETE"])
+@batch.shared_lookup(Conference, "id", select_related=["location"])
+@require_http_methods(["GET", "PUT", "PATCH", "DELETE"])
 def api_show_conference(request, id):
+    if request.method == "PATCH":
+        # One UPDATE, without loading the conference first
+        return _patch_conference(request, id)
+
     try:
-        conference = Conference.objects.get(id=id)
+        conference = batch.get_object(Conference, id=id)
     except Conference.DoesNotExist:
-        return JsonResponse({"message": "Conference not found"}, status=404)
+        return ApiResponse({"message": "Conference not found"}, status=404)
 
     if request.method == "GET":
-        return JsonResponse(conference, encoder=ConferenceDetailEncoder, safe=False)
+        return updates.with_etag(
+            ApiResponse(
+                conference, encoder=ConferenceDetailEncoder, safe=False
+            ),
+            conference,
+        )
 
     elif request.method == "PUT":
         content = json.loads(request.body)
+        try:
+            updates.check_writable(Conference, content)
+        except updates.PatchError as e:
+            return e.response()
         if "location" in content:
             try:
                 location = Location.objects.get(id=content["location"])
                 content["location"] = location
             except Location.DoesNotExist:
-                return JsonResponse({"message": "Invalid location id"}, status=400)
-        
+                return ApiResponse(
+                    {"message": "Invalid location id"}, status=400
+                )
+
         for key, value in content.items():
             setattr(conference, key, value)
-        conference.save()
-        return JsonResponse(conference, encoder=ConferenceDetailEncoder, safe=False)
+        try:
+            with transaction.atomic():
+                conference.save()
+                availability.check_booking(conference)
+        except availability.Overbooked as e:
+            return _overbooked_response(e)
+        except availability.InvalidPeriod:
+            return _invalid_period_response()
+        return ApiResponse(
+            conference, encoder=ConferenceDetailEncoder, safe=False
+        )
 
     elif request.method == "DELETE":
-        conference.delete()
-        return JsonResponse({"deleted": True})
+        purge.soft_delete_conference(conference.id)
+        return ApiResponse({"deleted": True})
 
     else:
-        return JsonResponse({"message": "Method not allowed"}, status=405)
+        return ApiResponse({"message": "Method not allowed"}, status=405)
+
+
+# Changes to these fields can overbook the location
+BOOKING_FIELDS = {"starts", "ends", "rooms", "location"}
+
 
+def _patch_conference(request, id):
+    try:
+        content = updates.read_body(request, Conference)
+        if "location" in content:
+            try:
+                content["location"] = Location.objects.get(
+                    id=content["location"]
+                )
+            except (Location.DoesNotExist, TypeError, ValueError):
+                raise updates.PatchError("Invalid location id")
+        with transaction.atomic():
+            conference = updates.patch(request, Conference, id, content)
+            if not BOOKING_FIELDS.isdisjoint(content):
+                availability.check_booking(conference)
+    except updates.PatchError as e:
+        return e.response()
+    except availability.Overbooked as e:
+        return _overbooked_response(e)
+    except availability.InvalidPeriod:
+        return _invalid_period_response()
+    return updates.with_etag(
+        ApiResponse(conference, encoder=ConferenceDetailEncoder, safe=False),
+        conference,
+    )
+
+
+def _overbooked_response(error):
+    return ApiResponse(
+        {
+            "message": "Not enough rooms at the location",
+            "rooms_booked": error.booked,
+            "room_count": error.room_count,
+        },
+        status=400,
+    )
+
+
+def _invalid_period_response():
+    return ApiResponse({"message": "ends must be after starts"}, status=400)
+
+
+def _parse_moment(value):
+    # A bare date means midnight at its start
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.combine(day, time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+@require_http_methods(["GET"])
+def api_available_locations(request):
+    """
+    Lists the locations with at least "rooms" rooms (default 1) free
+    for the whole of the period from "starts" to "ends".
+
+    {
+        "locations": [
+            {
+                "name": location's name,
+                "href": URL to the location,
+                "room_count": rooms at the location,
+                "rooms_available": rooms free for the whole period,
+            },
+            ...
+        ]
+    }
+    """
+    try:
+        starts = _parse_moment(request.GET["starts"])
+        ends = _parse_moment(request.GET["ends"])
+        rooms = int(request.GET.get("rooms", 1))
+    except (KeyError, ValueError):
+        return ApiResponse(
+            {"message": "starts and ends dates and a rooms number needed"},
+            status=400,
+        )
+    if ends <= starts:
+        return _invalid_period_response()
+    if rooms < 1:
+        return ApiResponse({"message": "rooms must be at least 1"}, status=400)
+
+    available = []
+    for location in Location.objects.only("name", "room_count"):
+        booked = availability.availability.booked(location.id, starts, ends)
+        location.rooms_available = max(location.room_count - booked, 0)
+        if location.rooms_available >= rooms:
+            available.append(location)
+    return ApiResponse(
+        {"locations": available},
+        encoder=LocationAvailabilityEncoder,
+        safe=False,
+    )
+
+
+@require_http_methods(["GET"])
+def api_nearby_conferences(request):
+    """
+    Lists the conferences starting at or after "from" (default now)
+    at locations within "radius" miles (default 100) of "lat"/"lon",
+    soonest first.
+
+    {
+        "conferences": [
+            {
+                "name": conference's name,
+                "href": URL to the conference,
+                "starts": ..., "ends": ...,
+                "location": {"name": ..., "href": ...},
+                "distance_miles": distance to the location,
+            },
+            ...
+        ]
+    }
+    """
+    try:
+        latitude = float(request.GET["lat"])
+        longitude = float(request.GET["lon"])
+        radius = float(request.GET.get("radius", 100))
+        starts = (
+            _parse_moment(request.GET["from"])
+            if "from" in request.GET
+            else timezone.now()
+        )
+    except (KeyError, ValueError):
+        return ApiResponse(
+            {"message": "lat and lon numbers needed"},
+            status=400,
+        )
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or radius < 0:
+        return ApiResponse(
+            {"message": "lat, lon or radius out of range"},
+            status=400,
+        )
 
+    # Distances are only computed for the locations in the cells
+    # around the point
+    candidates = (
+        Location.objects.filter(
+            geo.prefix_filter(geo.cells_around(latitude, longitude, radius))
+        )
+        .values_list("id", "latitude", "longitude")
+        .order_by()
+    )
+    distances = {}
+    for location_id, location_lat, location_lon in candidates:
+        distance = geo.distance_miles(
+            latitude, longitude, location_lat, location_lon
+        )
+        if distance <= radius:
+            distances[location_id] = distance
 
+    conferences = list(
+        Conference.objects.filter(
+            location_id__in=distances, starts__gte=starts
+        )
+        .select_related("location")
+        .order_by("starts", "name")
+    )
+    for conference in conferences:
+        conference.distance_miles = distances[conference.location_id]
+    return ApiResponse(
+        {"conferences": conferences},
+        encoder=NearbyConferenceEncoder,
+        safe=False,
+    )
+
+
+@require_http_methods(["GET"])
+async def api_conference_live(request, id):
+    """
+    Streams the conference's registration and review activity as
+    Server-Sent Events (see events.live). Needs the ASGI server. The
+    snapshot and the events that change its counts have ids, and an
+    event's changes are in every snapshot with an id at or above it.
+
+    id: the rollup's last change id
+    event: snapshot
+    data: {"attendee_count": ..., "presentation_count": ...,
+           "presentations_by_status": {...}}
+
+    id: the change id
+    event: attendee-registered
+    data: {"attendee": {"name": ..., "href": ...}}
+
+    event: badge-created
+    data: {"attendee": {"name": ..., "href": ...}}
+
+    id: the change id
+    event: presentation-status-changed
+    data: {"presentation": {"title": ..., "href": ...},
+           "status": ..., "previous_status": ... or null}
+    """
+    if not isinstance(request, ASGIRequest):
+        return ApiResponse(
+            {"message": "Live updates are only served over ASGI"},
+            status=501,
+        )
+    try:
+        conference = await Conference.objects.aget(id=id)
+    except Conference.DoesNotExist:
+        return ApiResponse({"message": "Conference not found"}, status=404)
+    response = StreamingHttpResponse(
+        live.stream(conference), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stops nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@require_http_methods(["GET"])
+def api_show_conference_stats(request, id):
+    """
+    Returns the registration and presentation rollup for the
+    conference specified by the id parameter.
+
+    {
+        "conference": {"name": ..., "href": ...},
+        "attendee_count": number of attendees,
+        "presentation_count": number of presentations,
+        "registrations_by_day": {"2022-04-11": count, ...},
+        "presentations_by_status": {"SUBMITTED": count, ...},
+        "capacity": {
+            "max_attendees": ..., "max_presentations": ...,
+            "attendees": fraction of max_attendees used,
+            "presentations": fraction of max_presentations used,
+        },
+        "top_companies": [{"company_name": ..., "attendees": count}],
+        "updated": the date/time when the rollup last changed,
+    }
+    """
+    try:
+        conference = Conference.objects.select_related("stats").get(id=id)
+    except Conference.DoesNotExist:
+        return ApiResponse({"message": "Conference not found"}, status=404)
+
+    conference_stats = stats.get_stats(conference)
+    conference_stats.conference = conference
+    return ApiResponse(
+        conference_stats, encoder=ConferenceStatsEncoder, safe=False
+    )
+
+
+# Async versions of the read endpoints, used when settings.ASYNC_API_VIEWS
+# is on. They answer GET with the async ORM and hand every other method
+# to the sync view above. Relations the encoders touch are loaded up
+# front, since lazy loading is not allowed in an async context.
+
+
+@require_http_methods(["GET", "POST", "PUT", "DELETE"])
+async def api_list_locations_async(request, id=None):
+    if request.method != "GET":
+        return await sync_to_async(api_list_locations)(request, id=id)
+    snapshot = snapshots.serve(request, "locations")
+    if snapshot is not None:
+        return snapshot
+    locations = [location async for location in Location.objects.all()]
+    return ApiResponse(
+        {"locations": locations},
+        encoder=LocationListEncoder,
+        safe=False,
+    )
+
+
+@require_http_methods(["GET", "PUT", "PATCH", "DELETE"])
+async def api_show_location_async(request, id):
+    if request.method != "GET":
+        return await sync_to_async(api_show_location)(request, id)
+    try:
+        location = await Location.objects.select_related("state").aget(id=id)
+    except Location.DoesNotExist:
+        return ApiResponse({"message": "Location not found"}, status=404)
+    return updates.with_etag(
+        ApiResponse(location, encoder=LocationDetailEncoder, safe=False),
+        location,
+    )
+
+
+@require_http_methods(["GET", "POST"])
+async def api_list_conferences_async(request):
+    if request.method != "GET":
+        return await sync_to_async(api_list_conferences)(request)
+    snapshot = snapshots.serve(request, "conferences")
+    if snapshot is not None:
+        return snapshot
+    conferences = [conference async for conference in Conference.objects.all()]
+    return ApiResponse(
+        {"conferences": conferences},
+        encoder=ConferenceListEncoder,
+        safe=False,
+    )
+
+
+@require_http_methods(["GET", "PUT", "PATCH", "DELETE"])
+async def api_show_conference_async(request, id):
+    if request.method != "GET":
+        return await sync_to_async(api_show_conference)(request, id)
+    try:
+        conference = await Conference.objects.select_related("location").aget(
+            id=id
+        )
+    except Conference.DoesNotExist:
+        return ApiResponse({"message": "Conference not found"}, status=404)
+    return updates.with_etag(
+        ApiResponse(conference, encoder=ConferenceDetailEncoder, safe=False),
+        conference,
+    )
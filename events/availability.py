@@ -0,0 +1,188 @@
+"""
+Room availability for locations, from the conferences booked there.
+
+Each conference books Conference.rooms rooms at its location from
+starts to ends. For every location a BookingIndex cuts the timeline at
+each booking's start and end, adds up the rooms booked in every piece
+and keeps a max segment tree over the pieces. The most rooms booked at
+any moment of a range is then two binary searches and one tree query,
+O(log n) in the location's bookings.
+
+The indexes of all locations are built together on first use and
+kept in each process. A location's index is rebuilt after a change to
+one of its conferences in this process, and all of them after
+settings.AVAILABILITY_INDEX_MAX_AGE seconds to pick up changes made
+by other processes. Bookings are always checked against the database,
+in check_booking(), never against the index.
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import Conference, Location
+
+
+class Overbooked(Exception):
+    def __init__(self, booked, room_count):
+        super().__init__(f"{booked} rooms booked of {room_count}")
+        self.booked = booked
+        self.room_count = room_count
+
+
+class InvalidPeriod(Exception):
+    """A conference that ends before or when it starts."""
+
+
+class BookingIndex:
+    """Peak rooms booked over any time range, for one location."""
+
+    def __init__(self, bookings):
+        # bookings: (starts, ends, rooms) with starts and ends as
+        # timestamps; empty or inverted ranges book nothing
+        bookings = [b for b in bookings if b[0] < b[1]]
+        self.cuts = sorted({t for b in bookings for t in b[:2]})
+        pieces = max(len(self.cuts) - 1, 0)
+        changes = [0] * (pieces + 1)
+        for starts, ends, rooms in bookings:
+            changes[bisect_left(self.cuts, starts)] += rooms
+            changes[bisect_left(self.cuts, ends)] -= rooms
+
+        self.size = pieces
+        self.tree = [0] * (2 * pieces)
+        booked = 0
+        for piece in range(pieces):
+            booked += changes[piece]
+            self.tree[pieces + piece] = booked
+        for node in range(pieces - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def peak(self, starts, ends):
+        """Most rooms booked at any moment in [starts, ends)."""
+        if not self.size or starts >= ends:
+            return 0
+        first = max(bisect_right(self.cuts, starts) - 1, 0)
+        last = min(bisect_left(self.cuts, ends) - 1, self.size - 1)
+        if first > last:
+            return 0
+
+        peak = 0
+        low, high = first + self.size, last + self.size + 1
+        while low < high:
+            if low & 1:
+                peak = max(peak, self.tree[low])
+                low += 1
+            if high & 1:
+                high -= 1
+                peak = max(peak, self.tree[high])
+            low //= 2
+            high //= 2
+        return peak
+
+
+_EMPTY = BookingIndex([])
+
+
+def _booking(starts, ends, rooms):
+    return starts.timestamp(), ends.timestamp(), rooms
+
+
+class Availability:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = None
+        self._indexes = {}
+        # conference id -> location id, to find the location a changed
+        # conference used to be at
+        self._locations = {}
+        self._stale = set()
+
+    def _build(self):
+        bookings = defaultdict(list)
+        locations = {}
+        rows = Conference.objects.values_list(
+            "id", "location_id", "starts", "ends", "rooms"
+        ).order_by()
+        for conference_id, location_id, starts, ends, rooms in rows:
+            locations[conference_id] = location_id
+            bookings[location_id].append(_booking(starts, ends, rooms))
+        self._indexes = {
+            location_id: BookingIndex(location_bookings)
+            for location_id, location_bookings in bookings.items()
+        }
+        self._locations = locations
+        self._stale = set()
+        self._built = time.monotonic()
+
+    def _build_location(self, location_id):
+        rows = Conference.objects.filter(location_id=location_id).values_list(
+            "id", "starts", "ends", "rooms"
+        )
+        bookings = []
+        for conference_id, starts, ends, rooms in rows:
+            self._locations[conference_id] = location_id
+            bookings.append(_booking(starts, ends, rooms))
+        self._indexes[location_id] = BookingIndex(bookings)
+        self._stale.discard(location_id)
+
+    def index(self, location_id):
+        with self._lock:
+            if (
+                self._built is None
+                or time.monotonic() - self._built
+                > settings.AVAILABILITY_INDEX_MAX_AGE
+            ):
+                self._build()
+            if location_id in self._stale:
+                self._build_location(location_id)
+            return self._indexes.get(location_id, _EMPTY)
+
+    def booked(self, location_id, starts, ends):
+        """Most rooms booked at the location at any moment in the range."""
+        return self.index(location_id).peak(
+            starts.timestamp(), ends.timestamp()
+        )
+
+    def invalidate(self, conference_id, location_id):
+        with self._lock:
+            self._stale.add(location_id)
+            previous = self._locations.pop(conference_id, None)
+            if previous is not None:
+                self._stale.add(previous)
+
+
+availability = Availability()
+
+
+def check_booking(conference):
+    """
+    Raises Overbooked if the location of a just-saved conference has
+    fewer rooms than are booked at some moment of the conference, and
+    InvalidPeriod if the conference does not end after it starts,
+    since such a conference would book nothing.
+
+    Call it in the transaction that saved the conference, so the
+    save's write lock (or the row lock taken on the location) keeps
+    other bookings out until it commits.
+    """
+    # Request data may have set starts and ends as strings
+    conference.refresh_from_db(fields=["starts", "ends", "rooms"])
+    if conference.ends <= conference.starts:
+        raise InvalidPeriod
+    location = Location.objects.select_for_update().get(
+        pk=conference.location_id
+    )
+    overlapping = Conference.objects.filter(
+        location=location,
+        starts__lt=conference.ends,
+        ends__gt=conference.starts,
+    ).values_list("starts", "ends", "rooms")
+    index = BookingIndex(_booking(*row) for row in overlapping)
+    booked = index.peak(
+        conference.starts.timestamp(), conference.ends.timestamp()
+    )
+    if booked > location.room_count:
+        raise Overbooked(booked, location.room_count)
@@ -0,0 +1,112 @@
+"""
+Geohashes and distances for finding locations near a point.
+
+A geohash names a lat/lon cell, and every longer hash inside it starts
+with its hash, so the locations in a cell are one index range scan on
+Location.geohash. cells_around() picks the longest hash length whose
+cells are at least as big as the search box, which leaves at most four
+cells to scan, and only the locations in them get a distance computed.
+"""
+
+import math
+
+from django.db.models import Q
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+PRECISION = 9  # about 5 by 5 meters
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LATITUDE = 69.05
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            span, coordinate = lon_range, longitude
+        else:
+            span, coordinate = lat_range, latitude
+        middle = (span[0] + span[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            span[0] = middle
+        else:
+            span[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def _cell_size(precision):
+    # (height, width) in degrees of a cell with this hash length
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** (bits - bits // 2)
+
+
+def distance_miles(lat1, lon1, lat2, lon2):
+    """Great-circle distance by the haversine formula."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _wrap(longitude):
+    return (longitude + 180) % 360 - 180
+
+
+def cells_around(latitude, longitude, radius_miles):
+    """
+    Returns the geohash prefixes of the cells that cover every point
+    within radius_miles. An empty prefix means the whole world.
+    """
+    height = radius_miles / MILES_PER_DEGREE_LATITUDE
+    cos_latitude = math.cos(math.radians(min(abs(latitude) + height, 90)))
+    if cos_latitude < 1e-6:
+        return {""}
+    width = height / cos_latitude
+
+    precision = 0
+    while precision < PRECISION:
+        cell_height, cell_width = _cell_size(precision + 1)
+        if cell_height < 2 * height or cell_width < 2 * width:
+            break
+        precision += 1
+    if precision == 0:
+        return {""}
+
+    south = max(latitude - height, -90.0)
+    north = min(latitude + height, 90.0 - 1e-9)
+    west = _wrap(longitude - width)
+    east = _wrap(longitude + width)
+    return {
+        encode(corner_lat, corner_lon, precision)
+        for corner_lat in (south, north)
+        for corner_lon in (west, east)
+    }
+
+
+def prefix_filter(prefixes, field="geohash"):
+    """
+    Q object matching the hashes under any of the prefixes, as range
+    conditions so that the index on the field is used.
+    """
+    q = Q()
+    for prefix in prefixes:
+        if not prefix:
+            return Q(**{f"{field}__isnull": False})
+        # "~" sorts after every geohash character
+        q |= Q(**{f"{field}__gte": prefix, f"{field}__lt": prefix + "~"})
+    return q
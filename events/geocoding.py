@@ -0,0 +1,111 @@
+"""
+Coordinates for locations created or moved through the API.
+
+The nearby conferences search only finds locations that have a
+latitude and longitude. A location that is created, or whose city or
+state changes, without coordinates from the client is geocoded in a
+background thread once its transaction commits, so the request does
+not wait on the geocoding API. A place the API does not know leaves
+the location without coordinates; a lookup that fails leaves it as it
+was. The geocode_locations command fills in whatever is still missing.
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, router, transaction
+
+from .models import Location
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = set()
+_running = False
+
+
+def geocode(location):
+    """
+    Looks up and stores the location's coordinates. Returns whether
+    they were found.
+    """
+    # Imported here because it needs the API keys module
+    from .acls import get_coordinates
+
+    coordinates = get_coordinates(location.city, location.state.abbreviation)
+    if coordinates is None:
+        return False
+    location.latitude, location.longitude = coordinates
+    location.save(update_fields=["latitude", "longitude"])
+    return True
+
+
+def needs_geocoding(content, created=False):
+    """
+    Whether a create or an update with these values leaves the
+    location without coordinates that match its city and state.
+    """
+    if "latitude" in content or "longitude" in content:
+        return False
+    return created or "city" in content or "state" in content
+
+
+def _geocode_pending():
+    # The primary, which has the write that scheduled the lookup
+    db = router.db_for_write(Location)
+    while True:
+        with _lock:
+            if not _pending:
+                return
+            location_id = _pending.pop()
+        location = (
+            Location.objects.using(db)
+            .select_related("state")
+            .filter(id=location_id)
+            .first()
+        )
+        if location is None:
+            continue
+        try:
+            if not geocode(location):
+                logger.warning("No coordinates for location %s", location_id)
+                # Coordinates from before a move would put the location
+                # in the wrong searches
+                if location.latitude is not None:
+                    location.latitude = location.longitude = None
+                    location.save(update_fields=["latitude", "longitude"])
+        except Exception:
+            # Left for the geocode_locations command
+            logger.exception("Geocoding location %s failed", location_id)
+
+
+def _run():
+    global _running
+    try:
+        while True:
+            _geocode_pending()
+            with _lock:
+                if not _pending:
+                    _running = False
+                    return
+    finally:
+        connections.close_all()
+
+
+def _start():
+    global _running
+    with _lock:
+        if _running or not _pending:
+            return
+        _running = True
+    threading.Thread(target=_run, daemon=True).start()
+
+
+def schedule(location_id):
+    """Geocodes the location in the background once this commits."""
+    if not settings.GEOCODE_IN_BACKGROUND:
+        return
+    with _lock:
+        _pending.add(location_id)
+    transaction.on_commit(_start)
@@ -0,0 +1,159 @@
+"""
+Live conference activity for organizer dashboards, as Server-Sent
+Events.
+
+Each worker process has one Hub. A dashboard connected to the
+conference's live endpoint (served by the ASGI application) subscribes
+to it with an asyncio queue. The attendee and presentation signal
+handlers publish an event once its transaction commits. The event is
+formatted once and handed to each event loop with subscribers in a
+single call, which puts it on every queue. A thousand open dashboards
+cost one dispatch per event instead of a thousand polling queries.
+
+An event that changes the counts carries the change id the stats
+rollup gave it (see events.stats), and the snapshot a dashboard starts
+from carries the rollup's last change id. A dashboard subscribes
+before it reads the snapshot, so that no event is missed, and drops
+the events the snapshot already counts: those at or below its id.
+
+Only changes made by the same worker process reach its dashboards, so
+dashboards should be served by the workers that take the writes.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from common.json import DateEncoder
+
+from . import stats
+
+
+class Subscriber:
+    def __init__(self, conference_id, loop):
+        self.conference_id = conference_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+
+
+def _deliver(subscribers, change_id, message):
+    # Runs in the subscribers' event loop
+    for subscriber in subscribers:
+        try:
+            subscriber.queue.put_nowait((change_id, message))
+        except asyncio.QueueFull:
+            # Too slow to keep up; end its stream so it reconnects
+            # and starts again from a fresh snapshot
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+
+
+class Hub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, conference_id):
+        """Call from the event loop that will read the queue."""
+        subscriber = Subscriber(conference_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[conference_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers[subscriber.conference_id]
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.conference_id]
+
+    def subscriber_count(self, conference_id):
+        with self._lock:
+            return len(self._subscribers.get(conference_id, ()))
+
+    def publish(self, conference_id, event, data, change_id=None):
+        """Sends an event to a conference's subscribers; any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(conference_id, ()))
+        if not subscribers:
+            return
+        message = format_event(event, data, change_id)
+        by_loop = defaultdict(list)
+        for subscriber in subscribers:
+            by_loop[subscriber.loop].append(subscriber)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, group, change_id, message)
+            except RuntimeError:
+                # The loop has closed; its subscribers are gone
+                pass
+
+
+hub = Hub()
+
+
+def format_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, cls=DateEncoder)}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+def publish(conference_id, event, data, change_id=None):
+    """
+    Publishes the event once the current transaction commits. Pass the
+    change id of the rollup update the event reports, if any.
+    """
+    transaction.on_commit(
+        lambda: hub.publish(conference_id, event, data, change_id)
+    )
+
+
+def snapshot(conference):
+    """The counts a dashboard starts from, and their last change id."""
+    rollup = stats.get_stats(conference)
+    counts = {
+        "attendee_count": rollup.attendee_count,
+        "presentation_count": rollup.presentation_count,
+        "presentations_by_status": rollup.presentations_by_status,
+    }
+    return counts, rollup.last_change_id
+
+
+async def stream(conference):
+    """
+    Yields the SSE stream for one dashboard: a snapshot event, then
+    every event published for the conference, with a comment line as
+    a heartbeat when nothing happens for LIVE_HEARTBEAT_SECONDS.
+    """
+    # Subscribed before the snapshot is read, so no event is missed;
+    # the events the snapshot already counts are dropped below
+    subscriber = hub.subscribe(conference.id)
+    try:
+        counts, last_change_id = await sync_to_async(snapshot)(conference)
+        yield b"retry: 3000\n\n"
+        yield format_event("snapshot", counts, last_change_id)
+        while True:
+            try:
+                item = await asyncio.wait_for(
+                    subscriber.queue.get(), settings.LIVE_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield b": heartbeat\n\n"
+                continue
+            if item is None:
+                return
+            change_id, message = item
+            if change_id is not None and change_id <= last_change_id:
+                continue
+            yield message
+    finally:
+        hub.unsubscribe(subscriber)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from common.changes import tracked_models
+from common.models import Change
+
+
+class Command(BaseCommand):
+    help = (
+        "Adds change feed entries for rows of the tracked models that "
+        "have none, e.g. rows loaded before the feed existed or with "
+        "bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for model in tracked_models():
+            label = model._meta.label_lower
+            logged = Change.objects.filter(label=label).values("object_id")
+            missing = (
+                model.objects.exclude(pk__in=logged)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+                .iterator(chunk_size=batch_size)
+            )
+            batch = []
+            count = 0
+            for pk in missing:
+                batch.append(
+                    Change(label=label, object_id=pk, action=Change.UPSERT)
+                )
+                if len(batch) == batch_size:
+                    Change.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            Change.objects.bulk_create(batch)
+            count += len(batch)
+            self.stdout.write(f"{label}: added {count} change(s).")
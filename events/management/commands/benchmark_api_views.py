@@ -0,0 +1,153 @@
+import asyncio
+import json
+import time
+from importlib import import_module
+from types import ModuleType
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from django.urls import path
+
+from attendees import api_views as attendee_views
+from attendees.models import Attendee
+from events import api_views as event_views
+from events.models import Conference, Location
+from presentations import api_views as presentation_views
+from presentations.models import Presentation
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the sync and async versions of the API read views under "
+        "concurrent requests through Django's ASGI handler, middleware "
+        "included, the way an ASGI server would call them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=50)
+
+    def handle(self, *args, **options):
+        conference_id = _first_id(Conference)
+        location_id = _first_id(Location)
+        attendee_id = _first_id(Attendee)
+        presentation_id = _first_id(Presentation)
+        routes = [
+            (
+                "api_list_conferences",
+                "/api/conferences/",
+                {},
+                event_views.api_list_conferences,
+                event_views.api_list_conferences_async,
+            ),
+            (
+                "api_list_locations",
+                "/api/locations/",
+                {},
+                event_views.api_list_locations,
+                event_views.api_list_locations_async,
+            ),
+            (
+                "api_show_conference",
+                f"/api/conferences/{conference_id}/",
+                {"id": conference_id},
+                event_views.api_show_conference,
+                event_views.api_show_conference_async,
+            ),
+            (
+                "api_show_location",
+                f"/api/locations/{location_id}/",
+                {"id": location_id},
+                event_views.api_show_location,
+                event_views.api_show_location_async,
+            ),
+            (
+                "api_list_attendees",
+                f"/api/conferences/{conference_id}/attendees/",
+                {"conference_id": conference_id},
+                attendee_views.api_list_attendees,
+                attendee_views.api_list_attendees_async,
+            ),
+            (
+                "api_show_attendee",
+                f"/api/attendees/{attendee_id}/",
+                {"id": attendee_id},
+                attendee_views.api_show_attendee,
+                attendee_views.api_show_attendee_async,
+            ),
+            (
+                "api_list_presentations",
+                f"/api/conferences/{conference_id}/presentations/",
+                {"conference_id": conference_id},
+                presentation_views.api_list_presentations,
+                presentation_views.api_list_presentations_async,
+            ),
+            (
+                "api_show_presentation",
+                f"/api/presentations/{presentation_id}/",
+                {"id": presentation_id},
+                presentation_views.api_show_presentation,
+                presentation_views.api_show_presentation_async,
+            ),
+        ]
+
+        results = {}
+        for name, url, kwargs, sync_view, async_view in routes:
+            results[name] = {}
+            for mode, view in (("sync", sync_view), ("async", async_view)):
+                # The project's URLconf with this view in front, so the
+                # request goes through URL resolution and every
+                # middleware as usual
+                urlconf = ModuleType(f"benchmark_{name}_{mode}")
+                urlconf.urlpatterns = [
+                    path(url[1:], view, kwargs, name=name),
+                    *import_module(settings.ROOT_URLCONF).urlpatterns,
+                ]
+                # Each request is a client of its own (see _time_view),
+                # so the rate limits are checked but never hit
+                with override_settings(
+                    ROOT_URLCONF=urlconf,
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                    RATE_LIMIT_CLIENT_HEADER="HTTP_X_BENCHMARK_CLIENT",
+                ):
+                    results[name][mode] = asyncio.run(
+                        _time_view(
+                            url,
+                            options["requests"],
+                            options["concurrency"],
+                        )
+                    )
+        self.stdout.write(json.dumps(results, indent=2))
+
+
+def _first_id(model):
+    return model.objects.order_by("pk").values_list("pk", flat=True).first()
+
+
+async def _time_view(url, total, concurrency):
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one(number):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(
+                url, headers={"X-Benchmark-Client": f"client-{number}"}
+            )
+            latencies.append(time.perf_counter() - started)
+            status = str(response.status_code)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(number) for number in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests_per_second": round(total / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "statuses": statuses,
+    }
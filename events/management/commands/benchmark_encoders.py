@@ -0,0 +1,195 @@
+import json
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendees.api_views import AttendeeDetailEncoder, AttendeeListEncoder
+from attendees.models import Attendee
+from events.api_views import (
+    ConferenceDetailEncoder,
+    LocationDetailEncoder,
+    LocationListEncoder,
+)
+from events.models import Conference, Location, State
+from presentations.api_views import (
+    PresentationDetailEncoder,
+    PresentationListEncoder,
+)
+from presentations.models import Presentation, Status
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "encoders.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Times each API encoder on unsaved, in-memory model instances "
+        "and compares ns/object against a stored baseline. No database "
+        "access is needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1, 100, 100000],
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed slowdown against the baseline (0.25 = 25%%).",
+        )
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help="Store this run as the new baseline.",
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, encoder, make in _cases():
+            for size in options["sizes"]:
+                objects = [make(n) for n in range(size)]
+                key = f"{name}[{size}]"
+                results[key] = _ns_per_object(
+                    encoder, objects, options["repeat"]
+                )
+                self.stdout.write(f"{key}: {results[key]:.0f} ns/object")
+
+        baseline_path = Path(options["baseline"])
+        if options["update_baseline"] or not baseline_path.exists():
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2) + "\n")
+            self.stdout.write(f"Baseline written to {baseline_path}")
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        regressions = []
+        for key, value in results.items():
+            if key not in baseline:
+                continue
+            limit = baseline[key] * (1 + options["tolerance"])
+            if value > limit:
+                regressions.append(
+                    f"{key}: {value:.0f} ns/object, baseline "
+                    f"{baseline[key]:.0f} ns/object"
+                )
+        if regressions:
+            raise CommandError(
+                "Encoder regressions:\n  " + "\n  ".join(regressions)
+            )
+        self.stdout.write("No encoder regressions.")
+
+
+def _ns_per_object(encoder, objects, repeat):
+    # Small inputs are looped so each timing covers at least 10k objects
+    loops = max(1, 10000 // len(objects))
+    data = {"objects": objects}
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for _ in range(loops):
+            json.dumps(data, cls=encoder)
+        elapsed = time.perf_counter_ns() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / (loops * len(objects))
+
+
+def _cases():
+    now = timezone.now()
+    state = State(id=1, name="Illinois", abbreviation="IL")
+    location = Location(
+        id=1,
+        name="McCormick Place",
+        city="Chicago",
+        room_count=55,
+        created=now,
+        updated=now,
+        state=state,
+    )
+    conference = Conference(
+        id=1,
+        name="Benchmark Conference",
+        description="A conference that only exists in memory.",
+        starts=now,
+        ends=now + timedelta(days=2),
+        created=now,
+        updated=now,
+        max_presentations=100,
+        max_attendees=10000,
+        location=location,
+    )
+    status = Status(id=1, name="SUBMITTED")
+
+    def make_location(n):
+        return Location(
+            id=n + 1,
+            name=f"Hall {n}",
+            city="Chicago",
+            room_count=10,
+            created=now,
+            updated=now,
+            state=state,
+        )
+
+    def make_conference(n):
+        return Conference(
+            id=n + 1,
+            name=f"Conference {n}",
+            description="A conference that only exists in memory.",
+            starts=now,
+            ends=now,
+            created=now,
+            updated=now,
+            max_presentations=100,
+            max_attendees=10000,
+            location=location,
+        )
+
+    def make_attendee(n):
+        return Attendee(
+            id=n + 1,
+            name=f"Attendee {n}",
+            email=f"attendee{n}@example.com",
+            company_name="Example Inc.",
+            created=now,
+            conference=conference,
+        )
+
+    def make_presentation(n):
+        return Presentation(
+            id=n + 1,
+            presenter_name=f"Presenter {n}",
+            company_name="Example Inc.",
+            presenter_email=f"presenter{n}@example.com",
+            title=f"Talk {n}",
+            synopsis="A talk that only exists in memory.",
+            created=now,
+            status=status,
+            conference=conference,
+        )
+
+    return [
+        ("LocationListEncoder", LocationListEncoder, make_location),
+        ("LocationDetailEncoder", LocationDetailEncoder, make_location),
+        ("ConferenceDetailEncoder", ConferenceDetailEncoder, make_conference),
+        ("AttendeeListEncoder", AttendeeListEncoder, make_attendee),
+        ("AttendeeDetailEncoder", AttendeeDetailEncoder, make_attendee),
+        (
+            "PresentationListEncoder",
+            PresentationListEncoder,
+            make_presentation,
+        ),
+        (
+            "PresentationDetailEncoder",
+            PresentationDetailEncoder,
+            make_presentation,
+        ),
+    ]
@@ -0,0 +1,84 @@
+import gzip
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from common import formats
+from events.management.commands.benchmark_encoders import _cases
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the API response formats on lists of unsaved, "
+        "in-memory model instances: bytes (plain and gzipped), time to "
+        "render on the server and time to parse on a Python client. No "
+        "database access is needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        size = options["size"]
+        repeat = options["repeat"]
+        if formats.msgpack is None:
+            self.stdout.write("msgpack is not installed; skipping it.")
+        self.stdout.write(
+            f"{'format':<10} {'bytes':>11} {'gzipped':>9} "
+            f"{'render ms':>10} {'parse ms':>9}"
+        )
+        for name, encoder, make in _cases():
+            data = {"objects": [make(n) for n in range(size)]}
+            self.stdout.write(f"{name}[{size}]")
+            baseline = None
+            for media_type in formats.supported():
+                render = formats.RENDERERS[media_type]
+                body, render_time = _best(
+                    lambda: render(data, encoder()), repeat
+                )
+                _, parse_time = _best(
+                    lambda: PARSERS[media_type](body), repeat
+                )
+                if baseline is None:
+                    baseline = len(body)
+                self.stdout.write(
+                    f"{_LABELS[media_type]:<10} {len(body):>11,} "
+                    f"{len(gzip.compress(body, compresslevel=6)):>9,} "
+                    f"{render_time * 1000:>10.1f} {parse_time * 1000:>9.1f}"
+                    f"  ({len(body) / baseline:.0%} of JSON)"
+                )
+
+
+def _best(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def _parse_ndjson(body):
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def _parse_msgpack(body):
+    return formats.msgpack.unpackb(body, raw=False)
+
+
+PARSERS = {
+    formats.JSON: json.loads,
+    formats.COLUMNAR: json.loads,
+    formats.NDJSON: _parse_ndjson,
+    formats.MSGPACK: _parse_msgpack,
+}
+
+_LABELS = {
+    formats.JSON: "json",
+    formats.COLUMNAR: "columnar",
+    formats.NDJSON: "ndjson",
+    formats.MSGPACK: "msgpack",
+}
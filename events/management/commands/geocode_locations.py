@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from events.geocoding import geocode
+from events.models import Location
+
+
+class Command(BaseCommand):
+    help = (
+        "Looks up and stores the coordinates of locations that have "
+        "none, for the nearby conferences search."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Look up every location, not just those without coordinates.",
+        )
+
+    def handle(self, *args, **options):
+        locations = Location.objects.select_related("state").order_by("id")
+        if not options["all"]:
+            locations = locations.filter(latitude__isnull=True)
+
+        found = missing = 0
+        for location in locations:
+            if not geocode(location):
+                missing += 1
+                self.stderr.write(f"No coordinates for {location}")
+                continue
+            found += 1
+        self.stdout.write(
+            f"Geocoded {found} location(s); {missing} not found."
+        )
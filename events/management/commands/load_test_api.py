@@ -0,0 +1,197 @@
+import io
+import json
+import logging
+import random
+import resource
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db.models import Max, Min
+from django.test import override_settings
+
+from attendees.models import Attendee
+from events.models import Conference, Location
+from presentations.models import Presentation
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives GET requests at every API route through the WSGI "
+        "application and prints latency percentiles, requests/s and "
+        "peak RSS as JSON. Request log lines are silenced and rate "
+        "limits are off for the run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Requests per route.",
+        )
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--output",
+            help="Also write the JSON report to this file.",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        # Measure the views, not the rate limiter turning requests away
+        with override_settings(RATE_LIMIT_ENABLED=False):
+            application = get_wsgi_application()
+        routes = _routes(rng)
+
+        previous_disable = logging.root.manager.disable
+        logging.disable(logging.INFO)
+        try:
+            report = {
+                "routes": {
+                    name: _drive(
+                        application,
+                        paths,
+                        options["requests"],
+                        options["threads"],
+                    )
+                    for name, paths in routes.items()
+                },
+            }
+        finally:
+            logging.disable(previous_disable)
+
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":
+            max_rss *= 1024
+        report["peak_rss_bytes"] = max_rss
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as report_file:
+                report_file.write(output)
+        self.stdout.write(output)
+
+
+def _sample_ids(model, rng, count=50):
+    # Ids in the primary key range; gaps just show up as 404s
+    bounds = model.objects.aggregate(low=Min("pk"), high=Max("pk"))
+    if bounds["low"] is None:
+        return [1]
+    return [rng.randint(bounds["low"], bounds["high"]) for _ in range(count)]
+
+
+def _routes(rng):
+    conference_ids = _sample_ids(Conference, rng)
+    return {
+        "api_list_conferences": ["/api/conferences/"],
+        "api_show_conference": [
+            f"/api/conferences/{pk}/" for pk in conference_ids
+        ],
+        "api_show_conference_stats": [
+            f"/api/conferences/{pk}/stats/" for pk in conference_ids
+        ],
+        "api_list_locations": ["/api/locations/"],
+        "api_show_location": [
+            f"/api/locations/{pk}/" for pk in _sample_ids(Location, rng)
+        ],
+        "api_list_attendees": [
+            f"/api/conferences/{pk}/attendees/" for pk in conference_ids
+        ],
+        "api_show_attendee": [
+            f"/api/attendees/{pk}/" for pk in _sample_ids(Attendee, rng)
+        ],
+        "api_list_presentations": [
+            f"/api/conferences/{pk}/presentations/" for pk in conference_ids
+        ],
+        "api_show_presentation": [
+            f"/api/presentations/{pk}/"
+            for pk in _sample_ids(Presentation, rng)
+        ],
+    }
+
+
+def _environ(path):
+    host = next(
+        (h for h in settings.ALLOWED_HOSTS if h not in ("*", "")),
+        "localhost",
+    ).lstrip(".")
+    return {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": host,
+        "SERVER_PORT": "80",
+        "HTTP_HOST": host,
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(b""),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+
+
+def _drive(application, paths, total, threads):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def start_response(status, headers, exc_info=None):
+        code = status.split(" ", 1)[0]
+        with lock:
+            statuses[code] = statuses.get(code, 0) + 1
+
+    def worker():
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            environ = _environ(paths[n % len(paths)])
+            started = time.perf_counter()
+            body = application(environ, start_response)
+            try:
+                for _ in body:
+                    pass
+            finally:
+                if hasattr(body, "close"):
+                    body.close()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "statuses": statuses,
+        "requests_per_second": round(total / elapsed, 1),
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+    }
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = min(
+        len(sorted_values) - 1,
+        round(percent / 100 * (len(sorted_values) - 1)),
+    )
+    return round(sorted_values[index] * 1000, 3)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from events.purge import purge
+
+
+class Command(BaseCommand):
+    help = (
+        "Removes soft-deleted locations and conferences with everything "
+        "under them, in batches."
+    )
+
+    def handle(self, *args, **options):
+        purge()
+        self.stdout.write("Purge finished.")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from events.models import Conference
+from events.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recomputes the conference stats rollups from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "conference_ids",
+            nargs="*",
+            type=int,
+            help="Only rebuild these conferences (default: all).",
+        )
+
+    def handle(self, *args, **options):
+        conferences = Conference.objects.order_by("id")
+        if options["conference_ids"]:
+            conferences = conferences.filter(id__in=options["conference_ids"])
+        count = 0
+        for conference_id in conferences.values_list("id", flat=True):
+            rebuild(conference_id)
+            count += 1
+        self.stdout.write(f"Rebuilt stats for {count} conference(s).")
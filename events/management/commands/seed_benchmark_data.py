@@ -0,0 +1,170 @@
+import random
+from datetime import timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from attendees.models import Attendee, Badge
+from events import geo
+from events.models import Conference, Location, State
+from presentations.models import Presentation, Status
+
+STATES = [
+    ("California", "CA"),
+    ("Illinois", "IL"),
+    ("Nevada", "NV"),
+    ("New York", "NY"),
+    ("Texas", "TX"),
+    ("Washington", "WA"),
+]
+STATUSES = ["SUBMITTED", "APPROVED", "REJECTED"]
+CITIES = ["Austin", "Chicago", "Las Vegas", "New York", "Seattle", "Boston"]
+TOPICS = ["Python", "Cloud", "Data", "Security", "Frontend", "DevOps"]
+COMPANIES = [f"Company {n}" for n in range(500)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with a large generated data set for load "
+        "tests. Rows are added with bulk_create, so no signals fire; the "
+        "conference stats rollups are rebuilt on first read."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--locations", type=int, default=1000)
+        parser.add_argument("--conferences", type=int, default=10000)
+        parser.add_argument("--attendees", type=int, default=1000000)
+        parser.add_argument("--presentations", type=int, default=100000)
+        parser.add_argument(
+            "--badges",
+            type=float,
+            default=0.5,
+            help="Fraction of attendees that get a badge.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+
+        states = self._ensure_states()
+        statuses = self._ensure_statuses()
+
+        def location(n):
+            # Somewhere in the contiguous United States; bulk_create
+            # skips Location.save(), so the geohash is set here
+            latitude = rng.uniform(25.0, 49.0)
+            longitude = rng.uniform(-124.0, -67.0)
+            return Location(
+                name=f"Benchmark Hall {n}",
+                city=rng.choice(CITIES),
+                room_count=rng.randint(5, 200),
+                state=rng.choice(states),
+                latitude=latitude,
+                longitude=longitude,
+                geohash=geo.encode(latitude, longitude),
+            )
+
+        location_ids = self._create(
+            Location,
+            (location(n) for n in range(options["locations"])),
+            options["locations"],
+            batch_size,
+        )
+
+        now = timezone.now()
+
+        def conference(n):
+            starts = now + timedelta(days=rng.randint(-365, 730))
+            return Conference(
+                name=f"{rng.choice(TOPICS)} Conference {n}",
+                description="Generated for load tests.",
+                starts=starts,
+                ends=starts + timedelta(days=rng.randint(1, 4)),
+                max_presentations=rng.randint(10, 200),
+                max_attendees=rng.randint(100, 20000),
+                location_id=rng.choice(location_ids),
+            )
+
+        conference_ids = self._create(
+            Conference,
+            (conference(n) for n in range(options["conferences"])),
+            options["conferences"],
+            batch_size,
+        )
+
+        attendee_ids = self._create(
+            Attendee,
+            (
+                Attendee(
+                    name=f"Attendee {n}",
+                    email=f"attendee{n}@example.com",
+                    company_name=rng.choice(COMPANIES),
+                    conference_id=rng.choice(conference_ids),
+                )
+                for n in range(options["attendees"])
+            ),
+            options["attendees"],
+            batch_size,
+        )
+
+        badged = [
+            attendee_id
+            for attendee_id in attendee_ids
+            if rng.random() < options["badges"]
+        ]
+        self._create(
+            Badge,
+            (Badge(attendee_id=attendee_id) for attendee_id in badged),
+            len(badged),
+            batch_size,
+        )
+
+        self._create(
+            Presentation,
+            (
+                Presentation(
+                    presenter_name=f"Presenter {n}",
+                    presenter_email=f"presenter{n}@example.com",
+                    company_name=rng.choice(COMPANIES),
+                    title=f"{rng.choice(TOPICS)} talk {n}",
+                    synopsis="Generated for load tests.",
+                    status=rng.choice(statuses),
+                    conference_id=rng.choice(conference_ids),
+                )
+                for n in range(options["presentations"])
+            ),
+            options["presentations"],
+            batch_size,
+        )
+
+    def _ensure_states(self):
+        if not State.objects.exists():
+            State.objects.bulk_create(
+                State(name=name, abbreviation=abbreviation)
+                for name, abbreviation in STATES
+            )
+        return list(State.objects.all())
+
+    def _ensure_statuses(self):
+        for name in STATUSES:
+            Status.objects.get_or_create(name=name)
+        return list(Status.objects.filter(name__in=STATUSES))
+
+    def _create(self, model, objects, count, batch_size):
+        """
+        Inserts the objects in batches and returns the new primary keys.
+        """
+        ids = []
+        while True:
+            batch = list(islice(objects, batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                created = model.objects.bulk_create(batch)
+            ids.extend(obj.pk for obj in created)
+        self.stdout.write(f"Created {len(ids)} of {count} {model.__name__}")
+        return ids
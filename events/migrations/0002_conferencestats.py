@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConferenceStats",
+            fields=[
+                (
+                    "conference",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="events.conference",
+                    ),
+                ),
+                ("attendee_count", models.PositiveIntegerField(default=0)),
+                ("presentation_count", models.PositiveIntegerField(default=0)),
+                ("registrations_by_day", models.JSONField(default=dict)),
+                ("presentations_by_status", models.JSONField(default=dict)),
+                ("attendees_by_company", models.JSONField(default=dict)),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "conference stats",
+            },
+        ),
+    ]
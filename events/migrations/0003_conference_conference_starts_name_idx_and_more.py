@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0002_conferencestats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="conference",
+            index=models.Index(
+                fields=["starts", "name"], name="conference_starts_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="location",
+            index=models.Index(fields=["name"], name="location_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="state",
+            index=models.Index(
+                fields=["abbreviation"], name="state_abbreviation_idx"
+            ),
+        ),
+    ]
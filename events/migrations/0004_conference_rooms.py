@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0003_conference_conference_starts_name_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conference",
+            name="rooms",
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name="conference",
+            index=models.Index(
+                fields=["location", "starts"],
+                name="conference_location_starts_idx",
+            ),
+        ),
+    ]
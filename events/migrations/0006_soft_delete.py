@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0005_location_coordinates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conference",
+            name="deleted",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="location",
+            name="deleted",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
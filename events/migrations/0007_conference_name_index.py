@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-19 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0006_soft_delete"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="conference",
+            index=models.Index(fields=["name"], name="conference_name_idx"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0007_conference_name_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conferencestats",
+            name="last_change_id",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-19 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0008_conferencestats_last_change_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="location",
+            index=models.Index(fields=["city"], name="location_city_idx"),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-19 19:36
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0009_location_city_index"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="conference",
+            name="conference_name_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="location",
+            name="location_city_idx",
+        ),
+        migrations.AddIndex(
+            model_name="conference",
+            index=models.Index(
+                django.db.models.functions.text.Lower("name"),
+                name="conference_name_lower_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="location",
+            index=models.Index(
+                django.db.models.functions.text.Lower("name"),
+                name="location_name_lower_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="location",
+            index=models.Index(
+                django.db.models.functions.text.Lower("city"),
+                name="location_city_lower_idx",
+            ),
+        ),
+    ]
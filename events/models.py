@@ -1,6 +1,37 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.urls import reverse
 
+from . import geo
+
+
+class LiveManager(models.Manager):
+    """
+    Leaves out soft-deleted rows, which only wait for events.purge to
+    remove them. Use all_objects to see them.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted__isnull=True)
+
+
+class LiveConferenceManager(models.Manager):
+    """
+    Leaves out the rows under soft-deleted conferences, which only
+    wait for events.purge to remove them. conference is the path to
+    the row's conference. Use all_objects to see them.
+    """
+
+    def __init__(self, conference="conference"):
+        super().__init__()
+        self.conference = conference
+
+    def get_queryset(self):
+        return (
+            super()
+            .get_queryset()
+            .filter(**{f"{self.conference}__deleted__isnull": True})
+        )
 
 
 class State(models.Model):
@@ -15,11 +46,46 @@ class State(models.Model):
     name = models.CharField(max_length=20)
     abbreviation = models.CharField(max_length=2)
 
+    # abbreviation -> State, loaded on first use
+    _by_abbreviation = None
+
     def __str__(self):
         return f"{self.abbreviation}"
 
+    @classmethod
+    def get_by_abbreviation(cls, abbreviation):
+        """
+        Returns the State with the given abbreviation from an
+        in-process cache of the whole (small, static) table. Raises
+        State.DoesNotExist like objects.get() would.
+        """
+        cache = cls._by_abbreviation
+        if cache is None:
+            cache = cls.load_cache()
+        try:
+            return cache[abbreviation]
+        except KeyError:
+            # Possibly added by another process since the cache was loaded
+            return cls.objects.get(abbreviation=abbreviation)
+
+    @classmethod
+    def load_cache(cls):
+        cls._by_abbreviation = {
+            state.abbreviation: state for state in cls.objects.all()
+        }
+        return cls._by_abbreviation
+
+    @classmethod
+    def clear_cache(cls):
+        cls._by_abbreviation = None
+
     class Meta:
         ordering = ("abbreviation",)  # Default ordering for State
+        indexes = [
+            models.Index(
+                fields=["abbreviation"], name="state_abbreviation_idx"
+            ),
+        ]
 
 
 class Location(models.Model):
@@ -33,6 +99,12 @@ class Location(models.Model):
     room_count = models.PositiveSmallIntegerField()
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Kept in step with latitude and longitude by save(); see events.geo
+    geohash = models.CharField(max_length=12, null=True, blank=True)
+    # Set by a soft delete; see events.purge
+    deleted = models.DateTimeField(null=True, blank=True)
 
     state = models.ForeignKey(
         State,
@@ -40,14 +112,51 @@ class Location(models.Model):
         on_delete=models.PROTECT,
     )
 
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    # Fields clients may change through the API (see common.updates);
+    # latitude and longitude only together, so the geohash can be
+    # computed
+    api_writable_fields = {
+        "name",
+        "city",
+        "room_count",
+        "state",
+        "latitude",
+        "longitude",
+    }
+
     def get_api_url(self):
         return reverse("api_show_location", kwargs={"id": self.id})
 
+    @staticmethod
+    def geohash_for(latitude, longitude):
+        if latitude is None or longitude is None:
+            return None
+        return geo.encode(latitude, longitude)
+
+    def save(self, *args, **kwargs):
+        self.geohash = self.geohash_for(self.latitude, self.longitude)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and (
+            "latitude" in update_fields or "longitude" in update_fields
+        ):
+            kwargs["update_fields"] = {*update_fields, "geohash"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
     class Meta:
         ordering = ("name",)  # Default ordering for Location
+        indexes = [
+            models.Index(fields=["name"], name="location_name_idx"),
+            models.Index(fields=["geohash"], name="location_geohash_idx"),
+            # Admin searches match these by prefix, ignoring case
+            models.Index(Lower("name"), name="location_name_lower_idx"),
+            models.Index(Lower("city"), name="location_city_lower_idx"),
+        ]
 
 
 class Conference(models.Model):
@@ -66,6 +175,11 @@ class Conference(models.Model):
     updated = models.DateTimeField(auto_now=True)
     max_presentations = models.PositiveSmallIntegerField()
     max_attendees = models.PositiveIntegerField()
+    # Rooms booked at the location from starts to ends (see
+    # events.availability)
+    rooms = models.PositiveSmallIntegerField(default=1)
+    # Set by a soft delete; see events.purge
+    deleted = models.DateTimeField(null=True, blank=True)
 
     location = models.ForeignKey(
         Location,
@@ -73,6 +187,21 @@ class Conference(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    # Fields clients may change through the API (see common.updates)
+    api_writable_fields = {
+        "name",
+        "description",
+        "starts",
+        "ends",
+        "max_presentations",
+        "max_attendees",
+        "rooms",
+        "location",
+    }
+
     def get_api_url(self):
         return reverse("api_show_conference", kwargs={"id": self.id})
 
@@ -81,5 +210,44 @@ class Conference(models.Model):
 
     class Meta:
         ordering = ("starts", "name")  # Default ordering for Conference
+        indexes = [
+            models.Index(
+                fields=["starts", "name"], name="conference_starts_name_idx"
+            ),
+            models.Index(
+                fields=["location", "starts"],
+                name="conference_location_starts_idx",
+            ),
+            # Admin searches match names by prefix, ignoring case
+            models.Index(Lower("name"), name="conference_name_lower_idx"),
+        ]
+
+
+class ConferenceStats(models.Model):
+    """
+    The ConferenceStats model is a rollup of the attendee and
+    presentation numbers for a single conference. It is kept up
+    to date by signal handlers (see events.stats) so that the
+    stats endpoint never has to aggregate over the raw tables.
+    """
 
+    conference = models.OneToOneField(
+        Conference,
+        related_name="stats",
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    attendee_count = models.PositiveIntegerField(default=0)
+    presentation_count = models.PositiveIntegerField(default=0)
+    registrations_by_day = models.JSONField(default=dict)
+    presentations_by_status = models.JSONField(default=dict)
+    attendees_by_company = models.JSONField(default=dict)
+    # Counts the changes to the counters; see events.live
+    last_change_id = models.PositiveBigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
 
+    def __str__(self):
+        return f"Stats for {self.conference_id}"
+
+    class Meta:
+        verbose_name_plural = "conference stats"
@@ -0,0 +1,192 @@
+"""
+Soft deletes for locations and conferences, and the purge that
+removes them for real.
+
+Deleting a location through the API used to cascade in one
+transaction: Django loads every conference, attendee, badge and
+presentation under it to run their signals, then deletes them, which
+holds the database's write lock for minutes on a big venue. Now the
+API only marks the location and its conferences deleted, two UPDATEs,
+and the default managers hide them, and the attendees, badges and
+presentations under them, from then on.
+
+The purge runs in a background thread once the soft delete commits.
+It removes the dependents of each deleted conference with plain
+DELETE statements of at most settings.PURGE_BATCH_SIZE rows, one
+transaction per batch with a pause in between, so writers are only
+held up for a batch at a time. Signals are not sent for purged rows;
+the change feed gets its tombstones from here, and the stats rollups
+go with their conferences. The purge_deleted command finishes a purge
+that was cut short, e.g. by a restart.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from attendees.models import Attendee, Badge
+from common import changes
+from presentations.models import Presentation
+
+from . import availability, snapshots
+from .models import Conference, ConferenceStats, Location
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_running = False
+_again = False
+
+
+def _after_soft_delete(location_ids, conference_ids):
+    changes.record_deleted(Location, location_ids)
+    changes.record_deleted(Conference, conference_ids)
+    snapshots.invalidate("locations")
+    snapshots.invalidate("conferences")
+    transaction.on_commit(schedule)
+
+
+def soft_delete_location(location_id):
+    """
+    Hides the location and its conferences and schedules their purge.
+    Returns whether there was a location to delete.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if not Location.objects.filter(id=location_id).update(deleted=now):
+            return False
+        conferences = Conference.objects.filter(location_id=location_id)
+        conference_ids = list(conferences.values_list("id", flat=True))
+        conferences.update(deleted=now)
+        for conference_id in conference_ids:
+            availability.availability.invalidate(conference_id, location_id)
+        _after_soft_delete([location_id], conference_ids)
+    return True
+
+
+def soft_delete_conference(conference_id):
+    """
+    Hides the conference and schedules its purge. Returns whether
+    there was a conference to delete.
+    """
+    with transaction.atomic():
+        conferences = Conference.objects.filter(id=conference_id)
+        if not conferences.update(deleted=timezone.now()):
+            return False
+        location_id = Conference.all_objects.values_list(
+            "location_id", flat=True
+        ).get(id=conference_id)
+        availability.availability.invalidate(conference_id, location_id)
+        _after_soft_delete([], [conference_id])
+    return True
+
+
+def _delete_batches(model, queryset, before_delete=None):
+    # Deletes the queryset's rows a batch at a time and returns how
+    # many there were
+    db = router.db_for_write(model)
+    queryset = queryset.using(db).order_by()
+    deleted = 0
+    while True:
+        ids = list(
+            queryset.values_list("pk", flat=True)[: settings.PURGE_BATCH_SIZE]
+        )
+        if not ids:
+            return deleted
+        with transaction.atomic(using=db):
+            if before_delete is not None:
+                before_delete(ids)
+            model.all_objects.filter(pk__in=ids)._raw_delete(db)
+            changes.record_deleted(model, ids)
+        deleted += len(ids)
+        time.sleep(settings.PURGE_BATCH_PAUSE_SECONDS)
+
+
+def _delete_badges(attendee_ids):
+    db = router.db_for_write(Badge)
+    Badge.all_objects.filter(attendee_id__in=attendee_ids)._raw_delete(db)
+    changes.record_deleted(Badge, attendee_ids)
+
+
+def purge_conference(conference_id):
+    """Removes a soft-deleted conference and everything under it."""
+    attendees = _delete_batches(
+        Attendee,
+        Attendee.all_objects.filter(conference_id=conference_id),
+        before_delete=_delete_badges,
+    )
+    presentations = _delete_batches(
+        Presentation,
+        Presentation.all_objects.filter(conference_id=conference_id),
+    )
+    db = router.db_for_write(Conference)
+    with transaction.atomic(using=db):
+        ConferenceStats.objects.filter(
+            conference_id=conference_id
+        )._raw_delete(db)
+        Conference.all_objects.filter(
+            id=conference_id, deleted__isnull=False
+        )._raw_delete(db)
+    logger.info(
+        "Purged conference %s with %s attendees and %s presentations",
+        conference_id,
+        attendees,
+        presentations,
+    )
+
+
+def purge():
+    """Removes every soft-deleted conference and location."""
+    db = router.db_for_write(Conference)
+    conference_ids = Conference.all_objects.using(db).filter(
+        deleted__isnull=False
+    )
+    for conference_id in list(conference_ids.values_list("id", flat=True)):
+        purge_conference(conference_id)
+    # A location waits for the next purge if one of its conferences
+    # could not be purged
+    locations = Location.all_objects.using(db).filter(
+        deleted__isnull=False, conferences__isnull=True
+    )
+    location_ids = list(locations.values_list("id", flat=True))
+    if location_ids:
+        Location.all_objects.filter(id__in=location_ids)._raw_delete(db)
+        logger.info("Purged locations %s", location_ids)
+
+
+def _run():
+    global _running, _again
+    try:
+        while True:
+            try:
+                purge()
+            except Exception:
+                # Left for the next purge or the purge_deleted command
+                logger.exception("Purge failed")
+            with _lock:
+                if not _again:
+                    _running = False
+                    return
+                _again = False
+    finally:
+        connections.close_all()
+
+
+def schedule():
+    """
+    Starts a purge in a background thread, or has the running one go
+    round again once it finishes.
+    """
+    global _running, _again
+    if not settings.PURGE_IN_BACKGROUND:
+        return
+    with _lock:
+        if _running:
+            _again = True
+            return
+        _running = True
+    threading.Thread(target=_run, daemon=True).start()
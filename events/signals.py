@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import availability, snapshots
+from .models import Conference, ConferenceStats, Location, State
+
+
+@receiver(post_save, sender=Conference)
+def create_conference_stats(sender, instance, created, raw, **kwargs):
+    # A new conference starts with an empty rollup. Fixture loads may
+    # save attendees before their conference, so those are left for
+    # the stats endpoint to build on first read.
+    if created and not raw:
+        ConferenceStats.objects.get_or_create(conference=instance)
+
+
+@receiver(post_save, sender=State)
+@receiver(post_delete, sender=State)
+def clear_state_cache(sender, **kwargs):
+    State.clear_cache()
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_location_snapshot(sender, **kwargs):
+    snapshots.invalidate("locations")
+
+
+@receiver(post_save, sender=Conference)
+@receiver(post_delete, sender=Conference)
+def invalidate_conference_snapshot(sender, **kwargs):
+    snapshots.invalidate("conferences")
+
+
+@receiver(post_save, sender=Conference)
+@receiver(post_delete, sender=Conference)
+def invalidate_availability(sender, instance, **kwargs):
+    availability.availability.invalidate(instance.id, instance.location_id)
@@ -0,0 +1,169 @@
+"""
+Precompressed snapshots of the full location and conference lists.
+
+Each list is written to settings.SNAPSHOT_DIR as plain, gzip and (when
+the brotli package is installed) brotli files. The list views serve
+the file matching the request's Accept-Encoding with FileResponse,
+which the server can send with sendfile, so a steady-state request
+runs no query and compresses nothing.
+
+A change to a listed model deletes that list's files once the
+transaction commits and schedules a rebuild. Changes that arrive
+before the rebuild runs share it. Until the files are back, the views
+answer from the database as usual.
+"""
+
+import gzip
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.http import FileResponse
+
+from common import formats, routers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+_pending = {}
+_lock = threading.Lock()
+
+
+def _snapshots():
+    # Imported here because api_views imports this module
+    from .api_views import ConferenceListEncoder, LocationListEncoder
+    from .models import Conference, Location
+
+    return {
+        "locations": (
+            LocationListEncoder,
+            lambda: {"locations": Location.objects.all()},
+        ),
+        "conferences": (
+            ConferenceListEncoder,
+            lambda: {"conferences": Conference.objects.all()},
+        ),
+    }
+
+
+def _path(name, suffix=""):
+    return Path(settings.SNAPSHOT_DIR) / f"{name}.json{suffix}"
+
+
+def _write(path, data):
+    # Readers only ever see a complete file
+    temporary = path.with_name(
+        f".{path.name}.{os.getpid()}.{threading.get_ident()}"
+    )
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+def build(name):
+    """Writes the plain and compressed snapshot files for a list."""
+    encoder, data = _snapshots()[name]
+    # Rebuilds follow writes; a replica may not have them yet. Pinned
+    # rather than using("default") so the encoders' lazy loads of
+    # related rows read from the primary as well
+    token = routers.pin_to_primary()
+    try:
+        body = encoder().encode(data()).encode()
+    finally:
+        routers.unpin(token)
+    Path(settings.SNAPSHOT_DIR).mkdir(parents=True, exist_ok=True)
+    if brotli is not None:
+        _write(_path(name, ".br"), brotli.compress(body))
+    _write(_path(name, ".gz"), gzip.compress(body, compresslevel=9, mtime=0))
+    # The plain file goes last; serve() checks for it
+    _write(_path(name), body)
+
+
+def _build_scheduled(name):
+    with _lock:
+        _pending.pop(name, None)
+    try:
+        build(name)
+    finally:
+        connections.close_all()
+
+
+def schedule(name):
+    """
+    Rebuilds the snapshot after settings.SNAPSHOT_DEBOUNCE_SECONDS,
+    unless a rebuild is already waiting to run.
+    """
+    with _lock:
+        if name in _pending:
+            return
+        timer = threading.Timer(
+            settings.SNAPSHOT_DEBOUNCE_SECONDS, _build_scheduled, [name]
+        )
+        timer.daemon = True
+        _pending[name] = timer
+    timer.start()
+
+
+def _invalidate_now(name):
+    for suffix in ["", *ENCODINGS.values()]:
+        _path(name, suffix).unlink(missing_ok=True)
+    schedule(name)
+
+
+def invalidate(name):
+    """Drops the snapshot once the current transaction commits."""
+    if settings.SNAPSHOTS_ENABLED:
+        transaction.on_commit(lambda: _invalidate_now(name))
+
+
+def _accepted(request):
+    accepted = set()
+    for item in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if params in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.lower())
+    return accepted
+
+
+def serve(request, name):
+    """
+    Returns a FileResponse for the snapshot in the best encoding the
+    client accepts, or None when the snapshot has not been built.
+    """
+    if not settings.SNAPSHOTS_ENABLED:
+        return None
+    # The snapshots only hold JSON
+    if formats.negotiate(request) != formats.JSON:
+        return None
+    if not _path(name).exists():
+        schedule(name)
+        return None
+    accepted = _accepted(request)
+    candidates = [
+        (coding, _path(name, suffix))
+        for coding, suffix in ENCODINGS.items()
+        if coding in accepted or "*" in accepted
+    ]
+    candidates.append((None, _path(name)))
+    for coding, path in candidates:
+        try:
+            snapshot = open(path, "rb")
+        except FileNotFoundError:
+            continue
+        response = FileResponse(snapshot, content_type="application/json")
+        # Set from the file's name; the list is shown, not downloaded
+        del response["Content-Disposition"]
+        if coding:
+            response["Content-Encoding"] = coding
+        response["Vary"] = "Accept, Accept-Encoding"
+        return response
+    return None
@@ -0,0 +1,193 @@
+"""
+Per-conference rollups behind the conference stats endpoint.
+
+The counters on ConferenceStats are adjusted by the attendee and
+presentation signal handlers, one row update per change. rebuild()
+recomputes a rollup from the raw tables, and is used for conferences
+that do not have a rollup yet and by the rebuild_conference_stats
+management command.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from common import metrics
+
+from .models import ConferenceStats
+
+TOP_COMPANIES = 10
+
+
+def _bump(counts, key, delta):
+    value = counts.get(key, 0) + delta
+    if value > 0:
+        counts[key] = value
+    else:
+        counts.pop(key, None)
+
+
+def _registration_day(created):
+    return timezone.localdate(created).isoformat()
+
+
+def _update_counts(conference_id, **deltas):
+    """
+    Applies the counter changes with a single UPDATE, which also
+    gives them the rollup's next change id, and returns the rollup,
+    locked for the rest of the transaction. Returns None when the
+    conference has no rollup.
+
+    Writing before reading matters on SQLite: a transaction that reads
+    first and then writes fails with "database is locked" instead of
+    waiting when another writer gets in between.
+    """
+    rollups = ConferenceStats.objects.filter(conference_id=conference_id)
+    changes = {
+        name: Greatest(F(name) + delta, 0) for name, delta in deltas.items()
+    }
+    changes["last_change_id"] = F("last_change_id") + 1
+    if not rollups.update(updated=timezone.now(), **changes):
+        return None
+    return rollups.select_for_update().get()
+
+
+def record_attendee(conference_id, created, company_name, delta):
+    """
+    Adds (delta=1) or removes (delta=-1) one attendee from the
+    rollup of the given conference and returns the change id.
+
+    Conferences without a rollup are skipped, and None is returned;
+    their rollup is built from scratch the first time it is read.
+    """
+    with transaction.atomic():
+        stats = _update_counts(conference_id, attendee_count=delta)
+        if stats is None:
+            return None
+        _bump(stats.registrations_by_day, _registration_day(created), delta)
+        if company_name:
+            _bump(stats.attendees_by_company, company_name, delta)
+        stats.save(
+            update_fields=["registrations_by_day", "attendees_by_company"]
+        )
+    return stats.last_change_id
+
+
+def record_presentation(conference_id, status_name, delta):
+    """
+    Adds (delta=1) or removes (delta=-1) one presentation with the
+    given status name from the rollup of the given conference and
+    returns the change id, or None without a rollup.
+    """
+    with transaction.atomic():
+        stats = _update_counts(conference_id, presentation_count=delta)
+        if stats is None:
+            return None
+        _bump(stats.presentations_by_status, status_name, delta)
+        stats.save(update_fields=["presentations_by_status"])
+    return stats.last_change_id
+
+
+def rebuild(conference_id):
+    """
+    Recomputes the rollup for a conference from the Attendee and
+    Presentation tables and returns it.
+
+    The rollup row is written first, which locks it (and, on SQLite,
+    the database) until the transaction ends, so no counter update can
+    commit between the aggregates being read and being written.
+    """
+    # Imported here because both apps depend on events
+    from attendees.models import Attendee
+    from presentations.models import Presentation
+
+    rollups = ConferenceStats.objects.filter(conference_id=conference_id)
+    with transaction.atomic():
+        if not rollups.update(updated=timezone.now()):
+            try:
+                with transaction.atomic():
+                    ConferenceStats.objects.create(conference_id=conference_id)
+            except IntegrityError:
+                # Someone else built it first; wait for their lock
+                rollups.update(updated=timezone.now())
+
+        attendees = Attendee.objects.filter(conference_id=conference_id)
+        presentations = Presentation.objects.filter(
+            conference_id=conference_id
+        )
+        by_day = (
+            attendees.annotate(day=TruncDate("created"))
+            .values("day")
+            .annotate(count=Count("pk"))
+            .order_by()
+        )
+        by_company = (
+            attendees.exclude(company_name__isnull=True)
+            .exclude(company_name="")
+            .values("company_name")
+            .annotate(count=Count("pk"))
+            .order_by()
+        )
+        by_status = (
+            presentations.values("status__name")
+            .annotate(count=Count("pk"))
+            .order_by()
+        )
+
+        values = {
+            "registrations_by_day": {
+                row["day"].isoformat(): row["count"] for row in by_day
+            },
+            "attendees_by_company": {
+                row["company_name"]: row["count"] for row in by_company
+            },
+            "presentations_by_status": {
+                row["status__name"]: row["count"] for row in by_status
+            },
+        }
+        values["attendee_count"] = sum(values["registrations_by_day"].values())
+        values["presentation_count"] = sum(
+            values["presentations_by_status"].values()
+        )
+        values["updated"] = timezone.now()
+        rollups.update(**values)
+        return rollups.get()
+
+
+def get_stats(conference):
+    """
+    Returns the rollup for a conference, building it if the
+    conference does not have one yet.
+    """
+    try:
+        stats = conference.stats
+    except ConferenceStats.DoesNotExist:
+        _count_lookup("miss")
+        return rebuild(conference.id)
+    _count_lookup("hit")
+    return stats
+
+
+def _count_lookup(result):
+    metrics.inc(
+        "cache_requests_total",
+        {"cache": "conference_stats", "result": result},
+    )
+
+
+def top_companies(stats, limit=TOP_COMPANIES):
+    companies = sorted(
+        stats.attendees_by_company.items(),
+        key=lambda item: (-item[1], item[0]),
+    )
+    return [
+        {"company_name": name, "attendees": count}
+        for name, count in companies[:limit]
+    ]
+
+
+def utilization(count, capacity):
+    if not capacity:
+        return None
+    return round(count / capacity, 4)
@@ -0,0 +1,515 @@
+import math
+import random
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from attendees.models import Attendee, Badge
+from presentations.models import Presentation, Status
+
+from . import geo, purge
+from .availability import BookingIndex
+from .models import Conference, Location, State
+
+
+def _peak_by_brute_force(bookings, starts, ends):
+    # Bookings only change at their own ends, so the peak is at the
+    # start of the range or at one of those moments inside it
+    moments = {starts} | {
+        t for b in bookings for t in b[:2] if starts < t < ends
+    }
+    return max(
+        sum(rooms for s, e, rooms in bookings if s <= moment < e)
+        for moment in moments
+    )
+
+
+class BookingIndexTests(SimpleTestCase):
+    def test_peak_of_overlapping_bookings(self):
+        index = BookingIndex([(0, 10, 2), (5, 15, 3), (8, 9, 4), (20, 30, 1)])
+
+        self.assertEqual(index.peak(0, 5), 2)
+        self.assertEqual(index.peak(0, 30), 9)
+        self.assertEqual(index.peak(9, 20), 5)
+        self.assertEqual(index.peak(15, 20), 0)
+        self.assertEqual(index.peak(25, 26), 1)
+
+    def test_ranges_that_only_touch_do_not_overlap(self):
+        index = BookingIndex([(0, 10, 2), (10, 20, 3)])
+
+        self.assertEqual(index.peak(0, 10), 2)
+        self.assertEqual(index.peak(10, 20), 3)
+        self.assertEqual(index.peak(9, 11), 3)
+
+    def test_queries_outside_the_bookings(self):
+        index = BookingIndex([(10, 20, 2)])
+
+        self.assertEqual(index.peak(0, 10), 0)
+        self.assertEqual(index.peak(20, 30), 0)
+        self.assertEqual(index.peak(0, 100), 2)
+        self.assertEqual(index.peak(12, 13), 2)
+
+    def test_empty_and_inverted_ranges_book_nothing(self):
+        index = BookingIndex([(10, 10, 5), (20, 10, 5), (0, 5, 1)])
+
+        self.assertEqual(index.peak(0, 30), 1)
+        self.assertEqual(index.peak(10, 20), 0)
+        self.assertEqual(BookingIndex([]).peak(0, 10), 0)
+        # As are inverted queries
+        self.assertEqual(index.peak(5, 0), 0)
+
+    def test_matches_brute_force(self):
+        generator = random.Random(41)
+        for _ in range(200):
+            bookings = []
+            for _ in range(generator.randint(1, 12)):
+                starts = generator.randint(0, 50)
+                ends = starts + generator.randint(1, 20)
+                bookings.append((starts, ends, generator.randint(1, 5)))
+            index = BookingIndex(bookings)
+            for _ in range(20):
+                starts = generator.randint(-5, 70)
+                ends = starts + generator.randint(1, 30)
+                self.assertEqual(
+                    index.peak(starts, ends),
+                    _peak_by_brute_force(bookings, starts, ends),
+                    (bookings, starts, ends),
+                )
+
+
+def _point_at(latitude, longitude, bearing, miles):
+    # The point the distance away along the great circle
+    phi1, lambda1 = math.radians(latitude), math.radians(longitude)
+    delta = miles / geo.EARTH_RADIUS_MILES
+    phi2 = math.asin(
+        math.sin(phi1) * math.cos(delta)
+        + math.cos(phi1) * math.sin(delta) * math.cos(bearing)
+    )
+    lambda2 = lambda1 + math.atan2(
+        math.sin(bearing) * math.sin(delta) * math.cos(phi1),
+        math.cos(delta) - math.sin(phi1) * math.sin(phi2),
+    )
+    return math.degrees(phi2), (math.degrees(lambda2) + 180) % 360 - 180
+
+
+class GeohashTests(SimpleTestCase):
+    def assertCovered(self, latitude, longitude, radius, points=200):
+        prefixes = geo.cells_around(latitude, longitude, radius)
+        self.assertLessEqual(len(prefixes), 4)
+        generator = random.Random(f"{latitude},{longitude},{radius}")
+        for n in range(points):
+            # Half the points on the circle itself
+            miles = radius if n % 2 else generator.uniform(0, radius)
+            point = _point_at(
+                latitude,
+                longitude,
+                generator.uniform(0, 2 * math.pi),
+                miles,
+            )
+            if geo.distance_miles(latitude, longitude, *point) > radius:
+                continue
+            geohash = geo.encode(*point)
+            self.assertTrue(
+                any(geohash.startswith(prefix) for prefix in prefixes),
+                (latitude, longitude, radius, point, geohash, prefixes),
+            )
+
+    def test_encode(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(geo.encode(42.6, -5.6, 5), "ezs42")
+        self.assertEqual(len(geo.encode(0, 0)), geo.PRECISION)
+
+    def test_longer_hashes_start_with_shorter_ones(self):
+        generator = random.Random(42)
+        for _ in range(100):
+            latitude = generator.uniform(-90, 90)
+            longitude = generator.uniform(-180, 180)
+            full = geo.encode(latitude, longitude)
+            for precision in range(1, geo.PRECISION):
+                self.assertEqual(
+                    geo.encode(latitude, longitude, precision),
+                    full[:precision],
+                )
+
+    def test_cells_cover_the_circle(self):
+        generator = random.Random(42)
+        for _ in range(50):
+            self.assertCovered(
+                generator.uniform(-80, 80),
+                generator.uniform(-180, 180),
+                generator.choice([0.5, 5, 50, 100, 500]),
+            )
+
+    def test_cells_cover_the_circle_at_cell_edges(self):
+        for precision in range(1, 6):
+            height, width = geo._cell_size(precision)
+            # A corner where four cells meet, and the middle of an edge
+            corner = (2 * height, -3 * width)
+            edge = (2 * height, -2.5 * width)
+            for latitude, longitude in (corner, edge):
+                for radius in (0.5, 10, 100):
+                    self.assertCovered(latitude, longitude, radius)
+
+    def test_cells_cover_the_circle_across_the_antimeridian(self):
+        self.assertCovered(10.0, 179.99, 50)
+        self.assertCovered(-10.0, -179.99, 50)
+
+    def test_near_the_poles(self):
+        self.assertCovered(89.9, 45.0, 50)
+        self.assertCovered(-89.5, -120.0, 100)
+        self.assertEqual(geo.cells_around(90.0, 0.0, 10), {""})
+
+    def test_huge_radius_covers_the_world(self):
+        self.assertEqual(geo.cells_around(10.0, 10.0, 20000), {""})
+
+
+class GeohashPrefixFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(name="Illinois", abbreviation="IL")
+        # Just either side of the meridian, in different top-level cells
+        for name, latitude, longitude in [
+            ("west", 51.4779, -0.0001),
+            ("east", 51.4779, 0.0001),
+            ("far", 40.7, -74.0),
+            ("nowhere", None, None),
+        ]:
+            Location.objects.create(
+                name=name,
+                city="Greenwich",
+                room_count=1,
+                state=state,
+                latitude=latitude,
+                longitude=longitude,
+            )
+
+    def names(self, prefixes):
+        return set(
+            Location.objects.filter(geo.prefix_filter(prefixes)).values_list(
+                "name", flat=True
+            )
+        )
+
+    def test_cells_across_an_edge(self):
+        prefixes = geo.cells_around(51.4779, 0.0, 1)
+
+        self.assertGreater(len(prefixes), 1)
+        self.assertEqual(self.names(prefixes), {"west", "east"})
+
+    def test_prefix_matches_only_its_cell(self):
+        west = Location.objects.get(name="west").geohash
+
+        self.assertEqual(self.names({west}), {"west"})
+        self.assertEqual(self.names({west[:1]}), {"west"})
+
+    def test_empty_prefix_matches_every_hashed_location(self):
+        self.assertEqual(self.names({""}), {"west", "east", "far"})
+
+
+@override_settings(
+    SNAPSHOTS_ENABLED=False,
+    RATE_LIMIT_ENABLED=False,
+    DATABASE_REPLICAS=[],
+    GEOCODE_IN_BACKGROUND=False,
+)
+class PatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(name="Illinois", abbreviation="IL")
+        cls.location = Location.objects.create(
+            name="Hall", city="Chicago", room_count=10, state=state
+        )
+        cls.url = f"/api/locations/{cls.location.id}/"
+
+    def patch(self, content, **headers):
+        return self.client.patch(
+            self.url, content, content_type="application/json", headers=headers
+        )
+
+    def etag(self):
+        return self.client.get(self.url)["ETag"]
+
+    def assertUnchanged(self):
+        self.location.refresh_from_db()
+        self.assertEqual(self.location.name, "Hall")
+
+    def location_queries(self, queries, statement):
+        return [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith(statement)
+            and '"events_location"' in query["sql"]
+        ]
+
+    def test_patch_with_current_etag(self):
+        etag = self.etag()
+
+        response = self.patch({"name": "Ballroom"}, if_match=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Ballroom")
+        self.assertEqual(response.json()["city"], "Chicago")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response["ETag"], self.etag())
+
+    def test_patch_with_stale_etag(self):
+        etag = self.etag()
+        self.patch({"room_count": 12})
+
+        response = self.patch({"name": "Ballroom"}, if_match=etag)
+
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(
+            response.json(), {"message": "The resource has changed"}
+        )
+        self.assertUnchanged()
+
+    def test_patch_with_only_weak_etags(self):
+        response = self.patch(
+            {"name": "Ballroom"}, if_match=f"W/{self.etag()}"
+        )
+
+        self.assertEqual(response.status_code, 412)
+        self.assertUnchanged()
+
+    def test_patch_with_any_etag(self):
+        response = self.patch({"name": "Ballroom"}, if_match="*")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Ballroom")
+
+    def test_if_match_can_be_required(self):
+        with override_settings(PATCH_REQUIRE_IF_MATCH=True):
+            response = self.patch({"name": "Ballroom"})
+
+        self.assertEqual(response.status_code, 428)
+        self.assertUnchanged()
+
+    def test_patch_reads_the_row_from_the_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch({"name": "Ballroom"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.location_queries(queries, "SELECT"), [])
+        [update] = self.location_queries(queries, "UPDATE")
+        self.assertIn("RETURNING", update)
+
+
+@override_settings(
+    SNAPSHOTS_ENABLED=False,
+    RATE_LIMIT_ENABLED=False,
+    DATABASE_REPLICAS=[],
+    GEOCODE_IN_BACKGROUND=False,
+)
+class PatchWithoutReturningTests(PatchTests):
+    """The same PATCH requests on a database whose UPDATE returns no rows."""
+
+    def setUp(self):
+        patcher = mock.patch(
+            "common.updates._returns_updated_rows", return_value=False
+        )
+        self.returns_updated_rows = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_patch_with_current_etag(self):
+        super().test_patch_with_current_etag()
+
+        self.assertTrue(self.returns_updated_rows.called)
+
+    def test_patch_reads_the_row_from_the_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch({"name": "Ballroom"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Ballroom")
+        [update] = self.location_queries(queries, "UPDATE")
+        self.assertNotIn("RETURNING", update)
+        self.assertEqual(len(self.location_queries(queries, "SELECT")), 1)
+
+    def test_missing_location(self):
+        response = self.client.patch(
+            "/api/locations/0/",
+            {"name": "Ballroom"},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    SNAPSHOTS_ENABLED=False,
+    RATE_LIMIT_ENABLED=False,
+    DATABASE_REPLICAS=[],
+)
+class ConferencePeriodTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(name="Illinois", abbreviation="IL")
+        cls.location = Location.objects.create(
+            name="Hall", city="Chicago", room_count=10, state=state
+        )
+        cls.starts = timezone.now().replace(microsecond=0)
+        cls.conference = Conference.objects.create(
+            name="Conference",
+            description="",
+            starts=cls.starts,
+            ends=cls.starts + timedelta(days=1),
+            max_presentations=100,
+            max_attendees=1000,
+            location=cls.location,
+        )
+
+    def assertInvalidPeriod(self, response):
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"message": "ends must be after starts"}
+        )
+
+    def assertUnchanged(self):
+        self.conference.refresh_from_db()
+        self.assertEqual(
+            self.conference.ends - self.conference.starts, timedelta(days=1)
+        )
+
+    def test_create_with_ends_before_starts(self):
+        response = self.client.post(
+            "/api/conferences/",
+            {
+                "name": "Backwards",
+                "description": "",
+                "starts": (self.starts + timedelta(days=1)).isoformat(),
+                "ends": self.starts.isoformat(),
+                "max_presentations": 10,
+                "max_attendees": 10,
+                "location": self.location.id,
+            },
+            content_type="application/json",
+        )
+
+        self.assertInvalidPeriod(response)
+        self.assertFalse(Conference.objects.filter(name="Backwards").exists())
+
+    def test_put_with_ends_at_starts(self):
+        response = self.client.put(
+            f"/api/conferences/{self.conference.id}/",
+            {"ends": self.starts.isoformat()},
+            content_type="application/json",
+        )
+
+        self.assertInvalidPeriod(response)
+        self.assertUnchanged()
+
+    def test_patch_with_starts_after_ends(self):
+        response = self.client.patch(
+            f"/api/conferences/{self.conference.id}/",
+            {"starts": (self.starts + timedelta(days=2)).isoformat()},
+            content_type="application/json",
+        )
+
+        self.assertInvalidPeriod(response)
+        self.assertUnchanged()
+
+    def test_patch_with_a_valid_period(self):
+        response = self.client.patch(
+            f"/api/conferences/{self.conference.id}/",
+            {"ends": (self.starts + timedelta(days=3)).isoformat()},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_available_locations_needs_a_room(self):
+        response = self.client.get(
+            "/api/locations/available/",
+            {
+                "starts": self.starts.date().isoformat(),
+                "ends": (self.starts + timedelta(days=1)).date().isoformat(),
+                "rooms": 0,
+            },
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    SNAPSHOTS_ENABLED=False,
+    RATE_LIMIT_ENABLED=False,
+    DATABASE_REPLICAS=[],
+    PURGE_IN_BACKGROUND=False,
+    PURGE_BATCH_PAUSE_SECONDS=0,
+)
+class SoftDeleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(name="Illinois", abbreviation="IL")
+        cls.location = Location.objects.create(
+            name="Hall", city="Chicago", room_count=10, state=state
+        )
+        starts = timezone.now()
+        cls.conference = Conference.objects.create(
+            name="Conference",
+            description="",
+            starts=starts,
+            ends=starts + timedelta(days=1),
+            max_presentations=100,
+            max_attendees=1000,
+            location=cls.location,
+        )
+        cls.attendee = Attendee.objects.create(
+            email="a@example.com", name="A", conference=cls.conference
+        )
+        cls.attendee.create_badge()
+        cls.presentation = Presentation.objects.create(
+            presenter_name="P",
+            presenter_email="p@example.com",
+            title="Talk",
+            synopsis="",
+            status=Status.objects.get_or_create(name="SUBMITTED")[0],
+            conference=cls.conference,
+        )
+
+    def assertHidden(self):
+        self.assertFalse(Attendee.objects.exists())
+        self.assertFalse(Badge.objects.exists())
+        self.assertFalse(Presentation.objects.exists())
+        for url in [
+            f"/api/attendees/{self.attendee.id}/",
+            f"/api/presentations/{self.presentation.id}/",
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_deleting_a_conference_hides_what_is_under_it(self):
+        purge.soft_delete_conference(self.conference.id)
+
+        self.assertHidden()
+        # Still there for the purge
+        self.assertTrue(Attendee.all_objects.exists())
+        self.assertTrue(Badge.all_objects.exists())
+        self.assertTrue(Presentation.all_objects.exists())
+
+    def test_deleting_a_location_hides_what_is_under_it(self):
+        purge.soft_delete_location(self.location.id)
+
+        self.assertHidden()
+
+    def test_purge_removes_what_is_under_it(self):
+        purge.soft_delete_conference(self.conference.id)
+
+        purge.purge()
+
+        self.assertFalse(Attendee.all_objects.exists())
+        self.assertFalse(Badge.all_objects.exists())
+        self.assertFalse(Presentation.all_objects.exists())
+        self.assertFalse(Conference.all_objects.exists())
+
+    def test_live_conferences_are_unaffected(self):
+        self.assertEqual(
+            self.client.get(f"/api/attendees/{self.attendee.id}/").status_code,
+            200,
+        )
+        self.assertEqual(Badge.objects.count(), 1)
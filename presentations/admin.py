@@ -1,11 +1,19 @@
 from django.contrib import admin
 
+from common.admin_tools import EstimatedCountPaginator, PrefixSearchMixin
+
 from .models import Presentation, Status
 
 
 @admin.register(Presentation)
-class PresentationAdmin(admin.ModelAdmin):
-    pass
+class PresentationAdmin(PrefixSearchMixin, admin.ModelAdmin):
+    list_display = ("title", "presenter_name", "status", "conference")
+    list_filter = ("status",)
+    list_select_related = ("status", "conference")
+    autocomplete_fields = ("conference",)
+    search_fields = ("^title", "^presenter_email")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Status)
@@ -1,6 +1,16 @@
+from django.conf import settings
 from django.urls import path
 
-from .api_views import api_list_presentations, api_show_presentation
+from .api_views import (
+    api_list_presentations,
+    api_list_presentations_async,
+    api_show_presentation,
+    api_show_presentation_async,
+)
+
+if settings.ASYNC_API_VIEWS:
+    api_list_presentations = api_list_presentations_async
+    api_show_presentation = api_show_presentation_async
 
 
 urlpatterns = [
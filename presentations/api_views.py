@@ -1,13 +1,13 @@
-from django.http import JsonResponse
-
-from .models import Presentation
+from .models import Presentation, Status
 from events.models import Conference
 
 from django.views.decorators.http import require_http_methods
 import json
+from asgiref.sync import sync_to_async
+from common import batch, updates
+from common.formats import ApiResponse
 from common.json import ModelEncoder
 from django.urls import reverse
-from django.core import serializers
 
 
 class PresentationListEncoder(ModelEncoder):
@@ -15,16 +15,23 @@ class PresentationListEncoder(ModelEncoder):
     properties = ["title", "status"]
 
     def default(self, o):
+        # The status is shown by its name
+        if isinstance(o, Status):
+            return o.name
+
         # First, use the parent class's default method to get the basic data
         data = super().default(o)
 
         # Then, add any custom data specific to Presentation
         if isinstance(o, Presentation):
-            data["href"] = reverse('api_list_presentations', kwargs={'conference_id': o.conference_id})
+            data["href"] = reverse(
+                "api_list_presentations",
+                kwargs={"conference_id": o.conference_id},
+            )
 
         return data
-    
-    
+
+
 class PresentationDetailEncoder(ModelEncoder):
     model = Presentation
     properties = [
@@ -39,14 +46,17 @@ class PresentationDetailEncoder(ModelEncoder):
     def default(self, o):
         if isinstance(o, self.model):
             serialized_data = super().default(o)
-            
+
             # Add the 'href' property to the serialized data
-            serialized_data["href"] = reverse('api_list_presentations', kwargs={'conference_id': o.conference_id})
-            
+            serialized_data["href"] = reverse(
+                "api_list_presentations",
+                kwargs={"conference_id": o.conference_id},
+            )
+
             # You can also include more properties here as needed
             return serialized_data
         return super().default(o)
-    
+
 
 # def api_list_presentations(request, conference_id):
 #     """
@@ -70,20 +80,21 @@ class PresentationDetailEncoder(ModelEncoder):
 #         ]
 #     }
 #     """
-    
+
+
+@batch.shared_lookup(Presentation, "conference_id", select_related=["status"])
 @require_http_methods(["GET", "POST"])
 def api_list_presentations(request, conference_id):
     if request.method == "GET":
-        presentations = Presentation.objects.filter(conference=conference_id)
-
-        # Serialize the queryset of presentations using Django serializers
-        serialized_presentations = serializers.serialize("json", presentations)
-        
-        # Wrap the serialized presentations inside a dictionary
-        response_data = {"presentations": serialized_presentations}
-        
-        return JsonResponse(
-            response_data,
+        presentations = batch.filter_objects(
+            Presentation,
+            select_related=["status"],
+            conference_id=conference_id,
+        )
+        # Instances, so the response can be rendered in any format
+        return ApiResponse(
+            {"presentations": list(presentations)},
+            encoder=PresentationListEncoder,
             safe=False,
         )
 
@@ -92,7 +103,7 @@ def api_list_presentations(request, conference_id):
         try:
             conference = Conference.objects.get(id=conference_id)
         except Conference.DoesNotExist:
-            return JsonResponse(
+            return ApiResponse(
                 {"message": "Invalid conference id"},
                 status=400,
             )
@@ -101,14 +112,15 @@ def api_list_presentations(request, conference_id):
         content["conference"] = conference
         # Create a new presentation
         presentation = Presentation.create(**content)
-        
+
         # Serialize the newly created presentation using PresentationDetailEncoder
-        return JsonResponse(
+        return ApiResponse(
             presentation,
             encoder=PresentationDetailEncoder,
             safe=False,
         )
-    
+
+
 # def api_show_presentation(request, id):
 #     """
 #     Returns the details for the Presentation model specified
@@ -136,24 +148,92 @@ def api_list_presentations(request, conference_id):
 #     """
 
 
+def _patch_presentation(request, id):
+    try:
+        content = updates.read_body(request, Presentation)
+        presentation = updates.patch(request, Presentation, id, content)
+    except updates.PatchError as e:
+        return e.response()
+    return updates.with_etag(
+        ApiResponse(
+            presentation, encoder=PresentationDetailEncoder, safe=False
+        ),
+        presentation,
+    )
+
+
+@batch.shared_lookup(Presentation, "id")
+@require_http_methods(["GET", "PUT", "PATCH", "DELETE"])
+def api_show_presentation(request, id):
+    if request.method == "PATCH":
+        # One UPDATE, without loading the presentation first
+        return _patch_presentation(request, id)
 
-@require_http_methods(["GET", "PUT", "DELETE"])
-def api_show_presentation(request, id):   
     try:
-        presentation = Presentation.objects.get(id=id)   
+        presentation = batch.get_object(Presentation, id=id)
     except Presentation.DoesNotExist:
-        return JsonResponse({"message": "Presentation not found"}, status=404)
+        return ApiResponse({"message": "Presentation not found"}, status=404)
 
     if request.method == "GET":
-        return JsonResponse(presentation, encoder=PresentationDetailEncoder, safe=False)
+        return updates.with_etag(
+            ApiResponse(
+                presentation, encoder=PresentationDetailEncoder, safe=False
+            ),
+            presentation,
+        )
 
     elif request.method == "PUT":
         content = json.loads(request.body)
+        try:
+            updates.check_writable(Presentation, content)
+        except updates.PatchError as e:
+            return e.response()
         for key, value in content.items():
             setattr(presentation, key, value)
         presentation.save()
-        return JsonResponse(presentation, encoder=PresentationDetailEncoder, safe=False)
+        return ApiResponse(
+            presentation, encoder=PresentationDetailEncoder, safe=False
+        )
 
     elif request.method == "DELETE":
         presentation.delete()
-        return JsonResponse({"deleted": True})
\ No newline at end of file
+        return ApiResponse({"deleted": True})
+
+
+# Async versions of the read endpoints, used when settings.ASYNC_API_VIEWS
+# is on. Writes are handed to the sync views above.
+
+
+@require_http_methods(["GET", "POST"])
+async def api_list_presentations_async(request, conference_id):
+    if request.method != "GET":
+        return await sync_to_async(api_list_presentations)(
+            request, conference_id
+        )
+    presentations = [
+        presentation
+        async for presentation in Presentation.objects.filter(
+            conference=conference_id
+        ).select_related("status")
+    ]
+    return ApiResponse(
+        {"presentations": presentations},
+        encoder=PresentationListEncoder,
+        safe=False,
+    )
+
+
+@require_http_methods(["GET", "PUT", "PATCH", "DELETE"])
+async def api_show_presentation_async(request, id):
+    if request.method != "GET":
+        return await sync_to_async(api_show_presentation)(request, id)
+    try:
+        presentation = await Presentation.objects.aget(id=id)
+    except Presentation.DoesNotExist:
+        return ApiResponse({"message": "Presentation not found"}, status=404)
+    return updates.with_etag(
+        ApiResponse(
+            presentation, encoder=PresentationDetailEncoder, safe=False
+        ),
+        presentation,
+    )
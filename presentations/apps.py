@@ -2,5 +2,9 @@ from django.apps import AppConfig
 
 
 class PresentationsConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'presentations'
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "presentations"
+
+    def ready(self):
+        # Connect the signal handlers
+        from . import signals  # noqa: F401
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0003_conference_conference_starts_name_idx_and_more"),
+        ("presentations", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="presentation",
+            index=models.Index(
+                fields=["conference", "title"],
+                name="presentation_conf_title_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="presentation",
+            index=models.Index(
+                fields=["title"], name="presentation_title_idx"
+            ),
+        ),
+    ]
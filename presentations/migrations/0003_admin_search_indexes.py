@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0005_location_coordinates"),
+        (
+            "presentations",
+            "0002_presentation_presentation_conf_title_idx_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="presentation",
+            index=models.Index(
+                fields=["presenter_email"], name="presentation_email_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-19 19:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def start_from_created(apps, schema_editor):
+    # Nothing records when existing rows last changed
+    model = apps.get_model("presentations", "presentation")
+    model.objects.update(updated=models.F("created"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("presentations", "0003_admin_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="presentation",
+            name="updated",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(start_from_created, migrations.RunPython.noop),
+    ]
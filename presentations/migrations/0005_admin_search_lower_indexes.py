@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-19 19:36
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0010_admin_search_lower_indexes"),
+        ("presentations", "0004_presentation_updated"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="presentation",
+            name="presentation_email_idx",
+        ),
+        migrations.AddIndex(
+            model_name="presentation",
+            index=models.Index(
+                django.db.models.functions.text.Lower("title"),
+                name="presentation_title_lower_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="presentation",
+            index=models.Index(
+                django.db.models.functions.text.Lower("presenter_email"),
+                name="presentation_email_lower_idx",
+            ),
+        ),
+    ]
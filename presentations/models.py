@@ -1,7 +1,9 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.urls import reverse
 from django.core.exceptions import ObjectDoesNotExist
 
+from events.models import LiveConferenceManager
 
 
 class Status(models.Model):
@@ -15,9 +17,37 @@ class Status(models.Model):
 
     name = models.CharField(max_length=10)
 
+    # name -> Status, loaded on first use
+    _by_name = None
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def get_by_name(cls, name):
+        """
+        Returns the Status with the given name from an in-process
+        cache of the whole (small, static) table. Raises
+        Status.DoesNotExist like objects.get() would.
+        """
+        cache = cls._by_name
+        if cache is None:
+            cache = cls.load_cache()
+        try:
+            return cache[name]
+        except KeyError:
+            # Possibly added by another process since the cache was loaded
+            return cls.objects.get(name=name)
+
+    @classmethod
+    def load_cache(cls):
+        cls._by_name = {status.name: status for status in cls.objects.all()}
+        return cls._by_name
+
+    @classmethod
+    def clear_cache(cls):
+        cls._by_name = None
+
     class Meta:
         ordering = ("id",)  # Default ordering for Status
         verbose_name_plural = "statuses"  # Fix the pluralization
@@ -36,6 +66,7 @@ class Presentation(models.Model):
     title = models.CharField(max_length=200)
     synopsis = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
 
     status = models.ForeignKey(
         Status,
@@ -49,24 +80,36 @@ class Presentation(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = LiveConferenceManager()
+    all_objects = models.Manager()
+
+    # Fields clients may change through the API (see common.updates).
+    # The status changes through approve() and reject().
+    api_writable_fields = {
+        "presenter_name",
+        "company_name",
+        "presenter_email",
+        "title",
+        "synopsis",
+    }
+
     def approve(self):
-        status=Status.obejct.get(name="APPROVED")
-        self.status=status
+        status = Status.get_by_name("APPROVED")
+        self.status = status
         self.save()
 
     def reject(self):
-        status=Status.objects.get(name="REJECTED")
-        self.status=status
+        status = Status.get_by_name("REJECTED")
+        self.status = status
         self.save()
 
     @classmethod
     def create(cls, **kwargs):
-        kwargs["status"] = Status.objects.get(name="SUBMITTED")
+        kwargs["status"] = Status.get_by_name("SUBMITTED")
         presentation = cls(**kwargs)
         presentation.save()
         return presentation
 
-        
     def get_api_url(self):
         return reverse("api_show_presentation", kwargs={"id": self.id})
 
@@ -75,4 +118,16 @@ class Presentation(models.Model):
 
     class Meta:
         ordering = ("title",)  # Default ordering for presentation
-
+        indexes = [
+            # Covers the per-conference list, which is sorted by title
+            models.Index(
+                fields=["conference", "title"],
+                name="presentation_conf_title_idx",
+            ),
+            models.Index(fields=["title"], name="presentation_title_idx"),
+            # Admin searches match these by prefix, ignoring case
+            models.Index(Lower("title"), name="presentation_title_lower_idx"),
+            models.Index(
+                Lower("presenter_email"), name="presentation_email_lower_idx"
+            ),
+        ]
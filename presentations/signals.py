@@ -0,0 +1,85 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from events import live, stats
+
+from .models import Presentation, Status
+
+# The fields the stats rollup counts presentations by
+STATS_FIELDS = {"conference", "status"}
+
+
+def _changes_stats(update_fields):
+    return update_fields is None or not STATS_FIELDS.isdisjoint(update_fields)
+
+
+@receiver(pre_save, sender=Presentation)
+def remember_previous_presentation(sender, instance, update_fields, **kwargs):
+    # Keep the stored values so a status change can be moved in the rollup
+    instance._previous = None
+    instance._change_id = None
+    if instance.pk is not None and _changes_stats(update_fields):
+        instance._previous = (
+            Presentation.objects.filter(pk=instance.pk)
+            .values("conference_id", "status_id", "status__name")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Presentation)
+def update_stats_for_presentation(
+    sender, instance, created, update_fields, **kwargs
+):
+    if not _changes_stats(update_fields):
+        return
+    previous = getattr(instance, "_previous", None)
+    if previous is not None and (
+        previous["conference_id"] == instance.conference_id
+        and previous["status_id"] == instance.status_id
+    ):
+        # Counted the same way as before; no need to move it
+        return
+    if previous is not None:
+        stats.record_presentation(
+            previous["conference_id"], previous["status__name"], -1
+        )
+    # For the live event, which is published by the next handler
+    instance._change_id = stats.record_presentation(
+        instance.conference_id, instance.status.name, 1
+    )
+
+
+@receiver(post_save, sender=Presentation)
+def publish_status_change(
+    sender, instance, created, raw, update_fields, **kwargs
+):
+    if raw or (update_fields is not None and "status" not in update_fields):
+        return
+    previous = getattr(instance, "_previous", None)
+    previous_status = previous["status__name"] if previous else None
+    if previous_status == instance.status.name:
+        return
+    live.publish(
+        instance.conference_id,
+        "presentation-status-changed",
+        {
+            "presentation": {
+                "title": instance.title,
+                "href": instance.get_api_url(),
+            },
+            "status": instance.status.name,
+            "previous_status": previous_status,
+        },
+        change_id=getattr(instance, "_change_id", None),
+    )
+
+
+@receiver(post_delete, sender=Presentation)
+def remove_presentation_from_stats(sender, instance, **kwargs):
+    stats.record_presentation(instance.conference_id, instance.status.name, -1)
+
+
+@receiver(post_save, sender=Status)
+@receiver(post_delete, sender=Status)
+def clear_status_cache(sender, **kwargs):
+    Status.clear_cache()